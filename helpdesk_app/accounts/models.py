@@ -46,6 +46,15 @@ class User(AbstractUser):
     @property
     def is_customer(self):
         return self.user_type == self.UserType.CUSTOMER
+    
+    @property
+    def is_support_staff(self):
+        """Staff members, admins and agents, i.e. anyone answering tickets"""
+        return (
+            self.is_staff
+            or self.user_type in (self.UserType.ADMIN, self.UserType.AGENT)
+            or hasattr(self, 'agent_profile')
+        )
 
 
 class AgentProfile(models.Model):
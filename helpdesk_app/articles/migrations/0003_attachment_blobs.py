@@ -0,0 +1,20 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_attachment_blobs'),
+        ('articles', '0002_article_category_closure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='articleattachment',
+            name='blob',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.blob', verbose_name='Blob'),
+        ),
+    ]
@@ -4,11 +4,17 @@ from django.utils.translation import gettext_lazy as _
 from django.utils.text import slugify
 from django.urls import reverse
 
+from core.blobs import BlobAttachmentMixin
+from core.tree import TreeNodeMixin
 
-class ArticleCategory(models.Model):
+
+class ArticleCategory(TreeNodeMixin, models.Model):
     """
     Categories for organizing knowledge base articles.
     """
+    closure_model = 'articles.ArticleCategoryClosure'
+    tree_fields = ('slug',)
+
     name = models.CharField(_('Name'), max_length=100)
     slug = models.SlugField(_('Slug'), max_length=100, unique=True)
     description = models.TextField(_('Description'), blank=True)
@@ -40,6 +46,29 @@ class ArticleCategory(models.Model):
         return reverse('articles:article-category-detail', kwargs={'slug': self.slug})
 
 
+class ArticleCategoryClosure(models.Model):
+    """
+    One row per (ancestor, descendant) pair of the article category tree,
+    the category itself included at depth 0; maintained by core.tree.
+    """
+    ancestor = models.ForeignKey(ArticleCategory, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(ArticleCategory, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveIntegerField(_('Depth'))
+
+    class Meta:
+        verbose_name = _('Article category path')
+        verbose_name_plural = _('Article category paths')
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='unique_article_category_path'),
+        ]
+        indexes = [
+            models.Index(fields=['descendant', 'depth'], name='article_category_ancestors_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} > {self.descendant_id} ({self.depth})"
+
+
 class Article(models.Model):
     """
     Knowledge base articles for the helpdesk.
@@ -113,7 +142,7 @@ class Article(models.Model):
     def get_absolute_url(self):
         return reverse('articles:article-detail', kwargs={'slug': self.slug})
 
-class ArticleAttachment(models.Model):
+class ArticleAttachment(BlobAttachmentMixin, models.Model):
     """
     Files attached to articles.
     """
@@ -124,6 +153,15 @@ class ArticleAttachment(models.Model):
         verbose_name=_('Article')
     )
     file = models.FileField(_('File'), upload_to='article_attachments/%Y/%m/')
+    blob = models.ForeignKey(
+        'core.Blob',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='+',
+        verbose_name=_('Blob')
+    )
     title = models.CharField(_('Title'), max_length=255)
     description = models.CharField(_('Description'), max_length=255, blank=True)
     uploaded_by = models.ForeignKey(
@@ -0,0 +1,7 @@
+from core.blobs import register_blob_references
+from core.tree import register_tree
+
+from .models import ArticleAttachment, ArticleCategory
+
+register_tree(ArticleCategory)
+register_blob_references(ArticleAttachment)
@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from articles.models import Article, ArticleCategory
+
+User = get_user_model()
+
+
+class ArticleCategoryTreeTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='kbauthor', password='password123')
+        cls.network = ArticleCategory.objects.create(name='Network')
+        cls.vpn = ArticleCategory.objects.create(name='VPN', parent=cls.network)
+        cls.clients = ArticleCategory.objects.create(name='VPN clients', parent=cls.vpn)
+        cls.article = Article.objects.create(
+            title='Installing the VPN client',
+            content='Download the client',
+            author=cls.author,
+            status=Article.Status.PUBLISHED,
+        )
+        cls.article.categories.add(cls.clients, cls.vpn)
+
+    def test_descendants_and_breadcrumbs(self):
+        self.assertEqual(set(self.network.get_descendants()), {self.vpn, self.clients})
+        self.assertEqual(
+            [node['slug'] for node in self.clients.breadcrumbs()],
+            ['network', 'vpn', 'vpn-clients']
+        )
+
+    def test_category_page_lists_subcategory_articles(self):
+        response = self.client.get(reverse('articles:article-category-detail', args=['network']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['articles']), [self.article])
+
+        response = self.client.get(reverse('articles:article-category-detail', args=['vpn-clients']))
+        self.assertContains(response, reverse('articles:article-category-detail', args=['network']))
+
+    def test_deleting_a_category_deletes_its_subtree(self):
+        self.vpn.delete()
+        self.assertEqual(list(ArticleCategory.objects.all()), [self.network])
+        self.assertFalse(self.network.get_descendants().exists())
@@ -10,11 +10,11 @@ from django.db.models import Q
 from django.http import JsonResponse
 from django.utils.safestring import mark_safe
 import os
-import uuid
 import bleach
 import markdown
 
 from .models import Article, ArticleCategory, ArticleTag, ArticleAttachment, ArticleFeedback
+from core.blobs import acquire_blob, store_blob
 from .forms import ArticleForm, ArticleFeedbackForm
 
 
@@ -32,7 +32,8 @@ class ArticleListView(ListView):
         category_slug = self.kwargs.get('category_slug')
         if category_slug:
             category = get_object_or_404(ArticleCategory, slug=category_slug)
-            queryset = queryset.filter(categories=category)
+            # Articles of the category and of its subcategories
+            queryset = queryset.filter(categories__in=category.descendant_ids()).distinct()
         
         # Filter by tag if provided
         tag_slug = self.kwargs.get('tag_slug')
@@ -304,13 +305,14 @@ class CategoryArticleListView(ListView):
     def get_queryset(self):
         self.category = get_object_or_404(ArticleCategory, slug=self.kwargs['slug'])
         return Article.objects.filter(
-            categories=self.category,
+            categories__in=self.category.descendant_ids(),
             status=Article.Status.PUBLISHED
-        )
+        ).distinct()
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['category'] = self.category
+        context['breadcrumbs'] = self.category.breadcrumbs()[:-1]
         
         # Process articles to include excerpts
         articles_with_excerpts = []
@@ -393,28 +395,10 @@ def upload_file(request):
             'error': f'Unsupported file type. Allowed types: {", ".join(allowed_extensions)}'
         })
     
-    # Create a unique filename to avoid collisions
-    unique_filename = f"{uuid.uuid4().hex}{file_extension}"
-    
-    # Determine upload directory based on file type
-    if file_extension in ['.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.txt']:
-        upload_dir = 'article_attachments/documents'
-    else:
-        upload_dir = 'article_attachments/images'
-    
-    # Full path relative to MEDIA_ROOT
-    from django.conf import settings
-    relative_path = os.path.join(upload_dir, unique_filename)
-    full_path = os.path.join(settings.MEDIA_ROOT, relative_path)
-    
-    # Create directory if it doesn't exist
-    os.makedirs(os.path.dirname(full_path), exist_ok=True)
-    
-    # Save the file
+    # Stored once per distinct content; the reference taken here is the
+    # article content's, which embeds the URL
     try:
-        with open(full_path, 'wb+') as destination:
-            for chunk in uploaded_file.chunks():
-                destination.write(chunk)
+        blob = store_blob(uploaded_file)
     except Exception as e:
         return JsonResponse({'success': False, 'error': f'Error saving file: {str(e)}'})
     
@@ -430,7 +414,8 @@ def upload_file(request):
                 pass
         
         attachment = ArticleAttachment(
-            file=relative_path,
+            file=blob.file.name,
+            blob=blob,
             title=uploaded_file.name,
             uploaded_by=request.user
         )
@@ -439,13 +424,15 @@ def upload_file(request):
             attachment.article = article
             
         attachment.save()
+        # The attachment holds its own reference
+        acquire_blob(blob.sha256)
     except Exception as e:
         # If we can't save to the database, we can still return the URL
-        # The file is already saved on disk
+        # The file is already stored
         pass
     
     # Generate the URL to the uploaded file
-    url = f"{settings.MEDIA_URL}{relative_path}"
+    url = blob.file.url
     
     # Return success response with file URL
     return JsonResponse({
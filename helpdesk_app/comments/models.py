@@ -4,6 +4,8 @@ from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.utils.translation import gettext_lazy as _
 
+from core.blobs import BlobAttachmentMixin
+
 
 class Comment(models.Model):
     """
@@ -53,7 +55,7 @@ class Comment(models.Model):
         return f"{self.author} on {self.content_object}"
 
 
-class CommentAttachment(models.Model):
+class CommentAttachment(BlobAttachmentMixin, models.Model):
     """
     Files attached to comments.
     """
@@ -64,6 +66,15 @@ class CommentAttachment(models.Model):
         verbose_name=_('Comment')
     )
     file = models.FileField(_('File'), upload_to='comment_attachments/%Y/%m/')
+    blob = models.ForeignKey(
+        'core.Blob',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='+',
+        verbose_name=_('Blob')
+    )
     uploaded_at = models.DateTimeField(_('Uploaded at'), auto_now_add=True)
     description = models.CharField(_('Description'), max_length=255, blank=True)
     
@@ -71,12 +71,12 @@ def add_comment(request, model_name, object_id):
         # If agent comments and ticket is 'waiting', change to 'in_progress'
         if (request.user.is_staff or hasattr(request.user, 'agent_profile')) and ticket.status == Ticket.Status.WAITING:
             ticket.status = Ticket.Status.IN_PROGRESS
-            ticket.save()
+            ticket.save(changed_by=request.user)
             
         # If customer comments and ticket is 'resolved', reopen it
         elif not (request.user.is_staff or hasattr(request.user, 'agent_profile')) and ticket.status == Ticket.Status.RESOLVED:
             ticket.status = Ticket.Status.OPEN
-            ticket.save()
+            ticket.save(changed_by=request.user)
     
     messages.success(request, _("Comment added successfully."))
     return redirect(request.META.get('HTTP_REFERER', '/'))
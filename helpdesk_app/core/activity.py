@@ -0,0 +1,75 @@
+"""
+Writing and reading the ActivityEvent stream.
+"""
+from .models import ActivityEvent
+from .pagination import keyset_page
+
+FEED_PAGE_SIZE = 10
+
+# History fields with a dedicated verb
+HISTORY_VERBS = {
+    'status': ActivityEvent.Verb.STATUS_CHANGED,
+    'assigned_to': ActivityEvent.Verb.ASSIGNED,
+}
+
+
+def build_event(ticket, actor, verb, description='', is_internal=False, created_at=None):
+    """
+    Unsaved event for `ticket`, so bulk operations can insert many events
+    with a single bulk_create
+    """
+    event = ActivityEvent(
+        ticket=ticket,
+        ticket_title=ticket.title[:255],
+        ticket_owner_id=ticket.created_by_id,
+        branch=ticket.branch,
+        actor=actor,
+        actor_name=(actor.get_full_name() or actor.username) if actor else '',
+        verb=verb,
+        description=description[:255],
+        is_internal=is_internal,
+    )
+    if created_at:
+        event.created_at = created_at
+    return event
+
+
+def build_history_event(history):
+    """Event describing a TicketHistory entry"""
+    verb = HISTORY_VERBS.get(history.field_changed, ActivityEvent.Verb.UPDATED)
+    if history.old_value:
+        description = f"{history.field_changed.replace('_', ' ').capitalize()} changed from '{history.old_value}' to '{history.new_value}'"
+    else:
+        description = f"{history.field_changed.replace('_', ' ').capitalize()} set to '{history.new_value}'"
+    return build_event(history.ticket, history.user, verb, description, created_at=history.timestamp)
+
+
+def build_comment_event(ticket, comment):
+    """Event describing a comment on a ticket"""
+    text = comment.text[:100] + ('...' if len(comment.text) > 100 else '')
+    return build_event(
+        ticket,
+        comment.author,
+        ActivityEvent.Verb.COMMENTED,
+        text,
+        is_internal=comment.is_internal,
+        created_at=comment.created_at,
+    )
+
+
+def feed_for(user):
+    """
+    Events visible to `user`: everything for staff; for customers, public
+    activity by others on their own tickets
+    """
+    if user.is_staff or user.user_type == 'agent':
+        return ActivityEvent.objects.all()
+    return ActivityEvent.objects.filter(
+        ticket_owner=user,
+        is_internal=False,
+    ).exclude(actor=user)
+
+
+def feed_page(user, cursor=None, page_size=FEED_PAGE_SIZE):
+    """One page of the activity feed of `user` as (events, next_cursor)"""
+    return keyset_page(feed_for(user), cursor=cursor, page_size=page_size)
@@ -0,0 +1,202 @@
+"""
+Content-addressed attachment storage.
+
+Uploads are hashed (SHA-256) by the upload handlers while they stream in,
+and each distinct content is stored once, as a Blob under
+blobs/<2 hex>/<2 hex>/<digest><extension>. Attachments point to their
+blob; attaching a content that is already stored only increments its
+reference count, and deleting an attachment decrements it. Blobs nobody
+references any more are deleted, with their file and previews, by
+purge_unused_blobs after a grace period.
+"""
+import hashlib
+import os
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.utils import timezone
+
+# Unused blobs are kept this long, in case the same content comes back
+BLOB_GRACE_PERIOD = timedelta(days=1)
+
+
+class HashingUploadMixin:
+    """Upload handler computing the SHA-256 of the file as its chunks arrive"""
+
+    def new_file(self, *args, **kwargs):
+        # Before super(): the memory handler stops the other handlers with an exception
+        self.sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        # An inactive memory handler passes the chunks on to the next handler
+        if getattr(self, 'activated', True):
+            self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.sha256.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def file_digest(file):
+    """SHA-256 of `file`, computed by the upload handlers or read now"""
+    digest = getattr(file, 'sha256', None)
+    if digest:
+        return digest
+    sha256 = hashlib.sha256()
+    for chunk in file.chunks():
+        sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def blob_name(digest, filename):
+    extension = os.path.splitext(filename or '')[1].lower()[:10]
+    return f'blobs/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+def acquire_blob(digest, count=1):
+    """Add `count` references to the blob `digest`; None when it is not stored"""
+    from .models import Blob
+
+    if Blob.objects.filter(sha256=digest).update(ref_count=F('ref_count') + count):
+        return Blob.objects.get(sha256=digest)
+    return None
+
+
+def release_blob(blob_id, count=1):
+    from .models import Blob
+
+    Blob.objects.filter(pk=blob_id, ref_count__gte=count).update(
+        ref_count=F('ref_count') - count, released_at=timezone.now()
+    )
+
+
+def store_blob(file):
+    """
+    The blob holding the content of `file`, with one more reference. The
+    content is only written to storage when it is not stored yet.
+    """
+    from .models import Blob
+    from .previews import previewable, schedule_previews
+
+    digest = file_digest(file)
+    blob = acquire_blob(digest)
+    if blob is not None:
+        return blob
+
+    name = default_storage.save(blob_name(digest, file.name), file)
+    try:
+        with transaction.atomic():
+            blob = Blob.objects.create(
+                sha256=digest,
+                file=name,
+                size=file.size,
+                ref_count=1,
+                preview_status=Blob.PreviewStatus.PENDING if previewable(name) else Blob.PreviewStatus.NONE,
+            )
+    except IntegrityError:
+        # The same content was stored concurrently: keep that copy
+        default_storage.delete(name)
+        return acquire_blob(digest)
+    transaction.on_commit(lambda: schedule_previews(blob))
+    return blob
+
+
+def purge_unused_blobs(grace_period=BLOB_GRACE_PERIOD):
+    """Delete the blobs unused for `grace_period` and their files; returns their number"""
+    from .models import Blob
+    from .previews import delete_previews
+
+    cutoff = timezone.now() - grace_period
+    purged = 0
+    for blob in Blob.objects.filter(ref_count=0, released_at__lt=cutoff).iterator():
+        # Conditional: a concurrent upload may have acquired it meanwhile
+        deleted, _ = Blob.objects.filter(pk=blob.pk, ref_count=0).delete()
+        if deleted:
+            default_storage.delete(blob.file.name)
+            delete_previews(blob)
+            purged += 1
+    purge_orphaned_files(cutoff)
+    return purged
+
+
+def purge_orphaned_files(cutoff):
+    """Delete the files under blobs/ written before `cutoff` that no blob holds"""
+    from .models import Blob
+
+    directories = ['blobs']
+    while directories:
+        directory = directories.pop()
+        try:
+            subdirectories, names = default_storage.listdir(directory)
+        except FileNotFoundError:
+            continue
+        directories.extend(f'{directory}/{subdirectory}' for subdirectory in subdirectories)
+        names = [f'{directory}/{name}' for name in names]
+        held = set(Blob.objects.filter(file__in=names).values_list('file', flat=True))
+        for name in names:
+            if name not in held and default_storage.get_modified_time(name) < cutoff:
+                default_storage.delete(name)
+
+
+class BlobAttachmentMixin:
+    """
+    Attachment model whose `file` is stored as a shared Blob: a new upload
+    is stored (or found) on save and `blob` points to it, while `file`
+    names the blob's file so that URLs and downloads keep working.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_blob_id = instance.__dict__.get('blob_id')
+        return instance
+
+    def store_file(self):
+        """Store a new upload as a blob; called by save, and before bulk_create"""
+        if self.file and not self.file._committed:
+            blob = store_blob(self.file)
+            previous = getattr(self, '_loaded_blob_id', None)
+            if previous and previous != blob.pk:
+                release_blob(previous)
+            self.blob = blob
+            self._loaded_blob_id = blob.pk
+            self.file = blob.file.name
+
+    @property
+    def preview_status(self):
+        """Generation state of the thumbnail and preview of the file"""
+        from .models import Blob
+
+        return self.blob.preview_status if self.blob_id else Blob.PreviewStatus.NONE
+
+    def save(self, *args, **kwargs):
+        self.store_file()
+        super().save(*args, **kwargs)
+
+
+def register_blob_references(*models):
+    """Release the blob of an attachment of one of `models` when it is deleted"""
+    def attachment_deleted(sender, instance, **kwargs):
+        if instance.blob_id:
+            release_blob(instance.blob_id)
+
+    for model in models:
+        post_delete.connect(
+            attachment_deleted, sender=model, weak=False, dispatch_uid=f'blob-references-{model._meta.label_lower}'
+        )
@@ -0,0 +1,116 @@
+"""
+Cache helpers shared by every worker process.
+
+Keys live in versioned namespaces: a model change bumps the version of its
+namespace, and every key built for the old version is simply never read
+again (it expires on its own). Hot keys are read through get_or_compute,
+which refreshes a value shortly before it expires and lets only one
+process recompute a missing value while the others wait for it.
+"""
+import math
+import random
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+# How long a recompute lock is held at most, in seconds
+LOCK_TIMEOUT = 30
+
+# Interval between checks while another process computes a value
+WAIT_INTERVAL = 0.05
+
+
+def _version_key(namespace):
+    return f'ns:{namespace}'
+
+
+def namespace_version(namespace):
+    """Current version of a namespace"""
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock so an evicted counter never reuses an old version
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump(namespace):
+    """Invalidate every key of a namespace"""
+    key = _version_key(namespace)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # The counter does not exist (yet or anymore)
+        cache.add(key, int(time.time() * 1000), timeout=None)
+
+
+def make_key(namespace, *parts):
+    """Cache key in the current version of `namespace`"""
+    return ':'.join([namespace, f'v{namespace_version(namespace)}', *(str(part) for part in parts)])
+
+
+def get_or_compute(key, compute, timeout, beta=1.0):
+    """
+    Return the cached value of `key`, computing and caching it on a miss.
+
+    A value is recomputed before it expires with a probability that grows
+    as expiry approaches and with the time the value took to compute
+    (probabilistic early expiration), so hot keys rarely expire at all.
+    When a value is missing, one process takes a lock and computes it
+    while the others wait for the result instead of piling on the database.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        value, cost, expires_at = entry
+        if time.time() - cost * beta * math.log(random.random() or 1e-12) < expires_at:
+            return value
+        # Refresh early, unless another process is already doing it
+        if not cache.add(f'{key}:lock', 1, timeout=LOCK_TIMEOUT):
+            return value
+        try:
+            return _compute_and_set(key, compute, timeout)
+        finally:
+            cache.delete(f'{key}:lock')
+
+    if cache.add(f'{key}:lock', 1, timeout=LOCK_TIMEOUT):
+        try:
+            return _compute_and_set(key, compute, timeout)
+        finally:
+            cache.delete(f'{key}:lock')
+
+    # Another process is computing the value, wait for it
+    deadline = time.time() + LOCK_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+        if cache.get(f'{key}:lock') is None:
+            break
+    # The other process failed or is too slow, compute without the lock
+    return _compute_and_set(key, compute, timeout)
+
+
+def _compute_and_set(key, compute, timeout):
+    start = time.time()
+    value = compute()
+    cost = time.time() - start
+    cache.set(key, (value, cost, time.time() + timeout), timeout)
+    return value
+
+
+def register_namespace(namespace, *models):
+    """Bump `namespace` whenever an instance of one of `models` is saved or deleted"""
+    def invalidate(sender, **kwargs):
+        bump(namespace)
+        # Again once committed: a value recomputed from the old rows in the
+        # meantime would otherwise be cached under the new version
+        transaction.on_commit(lambda: bump(namespace))
+
+    for model in models:
+        uid = f'cache-namespace-{namespace}-{model._meta.label_lower}'
+        post_save.connect(invalidate, sender=model, weak=False, dispatch_uid=uid)
+        post_delete.connect(invalidate, sender=model, weak=False, dispatch_uid=f'{uid}-delete')
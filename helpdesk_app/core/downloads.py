@@ -0,0 +1,168 @@
+"""
+Permission-checked media downloads.
+
+Every media URL is answered by a view that checks the user may see one of
+the tickets, comments or articles the file is attached to. The transfer
+itself is handed back to nginx with X-Accel-Redirect (an internal location
+serving MEDIA_ROOT, with ranges and conditional requests), so that no
+worker streams files. Without nginx (MEDIA_ACCEL_REDIRECT off) the file is
+served by Django, with single byte ranges and If-Modified-Since.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Media of any signed-in user
+MEMBER_MEDIA_PREFIXES = ('profile_pictures/',)
+
+
+def can_see_ticket(user, ticket):
+    from tickets.filters import can_see_all_tickets
+
+    return user.is_authenticated and (can_see_all_tickets(user) or ticket.created_by_id == user.pk)
+
+
+def can_see_article(user, article):
+    from articles.models import Article
+
+    return (
+        article.status == Article.Status.PUBLISHED
+        or user.is_staff
+        or (user.is_authenticated and article.author_id == user.pk)
+    )
+
+
+def can_see_comment(user, comment):
+    from articles.models import Article
+    from tickets.filters import can_see_all_tickets
+    from tickets.models import Ticket
+
+    if comment.is_internal and not (user.is_authenticated and can_see_all_tickets(user)):
+        return False
+    target = comment.content_object
+    if isinstance(target, Ticket):
+        return can_see_ticket(user, target)
+    if isinstance(target, Article):
+        return can_see_article(user, target)
+    return user.is_staff
+
+
+def can_download(user, name):
+    """Whether `user` may download the media file `name`"""
+    from articles.models import Article, ArticleAttachment
+    from comments.models import CommentAttachment
+    from tickets.models import TicketAttachment
+
+    from .models import Blob
+    from .previews import digest_from_preview_name
+
+    if name.startswith(MEMBER_MEDIA_PREFIXES):
+        return user.is_authenticated
+
+    # Thumbnails and previews follow the file they were made from
+    digest = digest_from_preview_name(name)
+    if digest:
+        blob = Blob.objects.filter(sha256=digest).only('pk', 'file').first()
+        if blob is None:
+            return False
+        name = blob.file.name
+    else:
+        # Deduplicated files are found through their blob, older ones by name
+        blob = Blob.objects.filter(file=name).only('pk').first()
+    attached = {'blob': blob} if blob else {'file': name}
+    if any(can_see_ticket(user, attachment.ticket)
+           for attachment in TicketAttachment.objects.filter(**attached).select_related('ticket')):
+        return True
+    if any(can_see_comment(user, attachment.comment)
+           for attachment in CommentAttachment.objects.filter(**attached).select_related('comment')):
+        return True
+    if any(can_see_article(user, attachment.article)
+           for attachment in ArticleAttachment.objects.filter(**attached).select_related('article')):
+        return True
+    # Uploads embedded in a published article body, with or without an attachment row
+    return blob is not None and Article.objects.filter(
+        status=Article.Status.PUBLISHED, content__contains=default_storage.url(name)
+    ).exists()
+
+
+def parse_range(header, size):
+    """
+    (start, end) of a single byte range header, inclusive; None to send the
+    whole file; ValueError when the range cannot be satisfied
+    """
+    match = re.fullmatch(r'bytes=(\d*)-(\d*)', (header or '').strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if start == '':
+        # Suffix range: the last `end` bytes
+        start, end = max(size - int(end), 0), size - 1
+        if size == 0:
+            raise ValueError(header)
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve_media(request, name):
+    """Response sending the media file `name`, by nginx or by Django"""
+    path = default_storage.path(name)
+    stat = os.stat(path)
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+        return HttpResponseNotModified()
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    if getattr(settings, 'MEDIA_ACCEL_REDIRECT', False):
+        # nginx serves the internal location, ranges included
+        prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = quote(prefix + name)
+    else:
+        last_modified = http_date(stat.st_mtime)
+        if_range = request.META.get('HTTP_IF_RANGE')
+        try:
+            byte_range = None if if_range and if_range != last_modified else parse_range(
+                request.META.get('HTTP_RANGE'), stat.st_size
+            )
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+        if byte_range is None:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _read_range(path, start, end - start + 1), status=206, content_type=content_type
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = str(end - start + 1)
+        response['Accept-Ranges'] = 'bytes'
+
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    # Access depends on the user: shared caches must not keep it
+    patch_cache_control(response, private=True, max_age=getattr(settings, 'MEDIA_MAX_AGE', 3600))
+    return response
@@ -0,0 +1,66 @@
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from comments.models import Comment
+from core.activity import build_comment_event, build_event, build_history_event
+from core.models import ActivityEvent
+from tickets.models import Ticket, TicketHistory
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the activity event stream from tickets, ticket history and comments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            default=500,
+            type=int,
+            help='Number of rows processed per batch'
+        )
+
+    def batches(self, queryset, batch_size):
+        """Iterate a queryset in primary key order, one list per batch"""
+        last_id = 0
+        while True:
+            rows = list(queryset.filter(pk__gt=last_id).order_by('pk')[:batch_size])
+            if not rows:
+                return
+            last_id = rows[-1].pk
+            yield rows
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ticket_type = ContentType.objects.get_for_model(Ticket)
+
+        with transaction.atomic():
+            ActivityEvent.objects.all().delete()
+            total = 0
+
+            tickets = Ticket.objects.select_related('created_by')
+            for batch in self.batches(tickets, batch_size):
+                events = [
+                    build_event(ticket, ticket.created_by, ActivityEvent.Verb.CREATED, 'Ticket created',
+                                created_at=ticket.created_at)
+                    for ticket in batch
+                ]
+                total += len(ActivityEvent.objects.bulk_create(events))
+
+            history = TicketHistory.objects.select_related('ticket', 'user')
+            for batch in self.batches(history, batch_size):
+                total += len(ActivityEvent.objects.bulk_create([build_history_event(row) for row in batch]))
+
+            comments = Comment.objects.filter(content_type=ticket_type).select_related('author')
+            for batch in self.batches(comments, batch_size):
+                # Tickets of the batch in one query rather than one per comment
+                ticket_map = Ticket.objects.in_bulk({comment.object_id for comment in batch})
+                events = [
+                    build_comment_event(ticket_map[comment.object_id], comment)
+                    for comment in batch
+                    if comment.object_id in ticket_map
+                ]
+                total += len(ActivityEvent.objects.bulk_create(events))
+
+            self.stdout.write(f'Created {total} activity events')
+
+        self.stdout.write(self.style.SUCCESS('Activity stream rebuilt'))
@@ -0,0 +1,147 @@
+import hashlib
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Replace
+
+from articles.models import Article, ArticleAttachment
+from comments.models import CommentAttachment
+from core.blobs import purge_unused_blobs
+from core.models import Blob
+from core.previews import previewable, schedule_previews
+from tickets.models import TicketAttachment
+
+ATTACHMENT_MODELS = (TicketAttachment, CommentAttachment, ArticleAttachment)
+
+
+def hash_file(name):
+    """(SHA-256, size) of a stored file, None when it is missing"""
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        with default_storage.open(name, 'rb') as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b''):
+                sha256.update(chunk)
+                size += len(chunk)
+    except FileNotFoundError:
+        return None
+    return sha256.hexdigest(), size
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves existing attachments to the deduplicated blob store: files are hashed in parallel, '
+        'the first file of each content becomes its blob and the copies are deleted'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            default=min(8, os.cpu_count() or 1) * 2,
+            type=int,
+            help='Number of files hashed at the same time'
+        )
+        parser.add_argument(
+            '--batch-size',
+            default=200,
+            type=int,
+            help='Number of attachments linked per transaction'
+        )
+        parser.add_argument(
+            '--purge',
+            action='store_true',
+            help='Also delete the blobs unused for more than the grace period'
+        )
+
+    def handle(self, *args, **options):
+        self.freed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for model in ATTACHMENT_MODELS:
+                self.dedup(model, executor, options['batch_size'])
+
+        if options['purge']:
+            self.stdout.write(f'Purged {purge_unused_blobs()} unused blobs')
+        self.stdout.write(self.style.SUCCESS(
+            f'Attachments deduplicated, {self.freed / (1024 * 1024):.1f} MB freed'
+        ))
+
+    def dedup(self, model, executor, batch_size):
+        last_id = 0
+        linked = missing = 0
+        while True:
+            attachments = list(
+                model.objects.filter(pk__gt=last_id, blob__isnull=True).order_by('pk').only('pk', 'file')[:batch_size]
+            )
+            if not attachments:
+                break
+            last_id = attachments[-1].pk
+            hashes = list(executor.map(hash_file, [attachment.file.name for attachment in attachments]))
+            found = [(attachment, digest) for attachment, digest in zip(attachments, hashes) if digest]
+            missing += len(attachments) - len(found)
+            linked += self.link(model, found)
+            self.stdout.write(f'{model._meta.verbose_name_plural}: {linked} linked...')
+        if missing:
+            self.stdout.write(self.style.WARNING(f'{model._meta.verbose_name_plural}: {missing} files missing'))
+
+    def link(self, model, found):
+        """Point a batch of attachments to their blobs, in one transaction"""
+        if not found:
+            return 0
+        with transaction.atomic():
+            # New contents are adopted in place: their first file becomes the blob
+            Blob.objects.bulk_create(
+                [
+                    Blob(
+                        sha256=sha256,
+                        file=attachment.file.name,
+                        size=size,
+                        preview_status=(
+                            Blob.PreviewStatus.PENDING if previewable(attachment.file.name) else Blob.PreviewStatus.NONE
+                        ),
+                    )
+                    for attachment, (sha256, size) in found
+                ],
+                ignore_conflicts=True,
+            )
+            blobs = Blob.objects.in_bulk({sha256 for _, (sha256, _) in found}, field_name='sha256')
+            # Only the blobs inserted above hold a file of this batch; the others had their previews queued already
+            adopted = {attachment.file.name for attachment, _ in found}
+            for blob in blobs.values():
+                if blob.file.name in adopted:
+                    schedule_previews(blob)
+            for sha256, count in Counter(sha256 for _, (sha256, _) in found).items():
+                Blob.objects.filter(pk=blobs[sha256].pk).update(ref_count=F('ref_count') + count)
+
+            copies = {}
+            for attachment, (sha256, size) in found:
+                blob = blobs[sha256]
+                if attachment.file.name != blob.file.name:
+                    copies[attachment.file.name] = (blob.file, size)
+                attachment.blob = blob
+                attachment.file = blob.file.name
+            model.objects.bulk_update([attachment for attachment, _ in found], ['blob', 'file'])
+
+            if model is ArticleAttachment:
+                # Article bodies embed the URL of their uploads
+                for name, (file, size) in copies.items():
+                    Article.objects.filter(content__contains=default_storage.url(name)).update(
+                        content=Replace('content', Value(default_storage.url(name)), Value(file.url))
+                    )
+
+            # A copy may still be the file of another attachment not linked yet
+            in_use = set()
+            for other in ATTACHMENT_MODELS:
+                in_use.update(other.objects.filter(file__in=list(copies)).values_list('file', flat=True))
+            copies = {name: value for name, value in copies.items() if name not in in_use}
+            transaction.on_commit(lambda: self.delete_copies(copies))
+        return len(found)
+
+    def delete_copies(self, copies):
+        for name, (file, size) in copies.items():
+            default_storage.delete(name)
+            self.freed += size
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from articles.models import ArticleCategory
+from core.cache import bump
+from core.tree import closure_model, rebuild_closure
+from tickets.models import Category
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the closure tables of the ticket and article category trees from the parent links'
+
+    def handle(self, *args, **options):
+        for model in (Category, ArticleCategory):
+            rebuild_closure(model)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: {closure_model(model).objects.count()} paths'
+            )
+        # Cached trees and breadcrumbs
+        bump('reference')
+        self.stdout.write(self.style.SUCCESS('Category trees rebuilt'))
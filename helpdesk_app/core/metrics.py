@@ -0,0 +1,261 @@
+from datetime import timedelta
+
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from accounts.models import User
+from tickets.models import Ticket, TicketDailyStats
+
+OPEN_STATUSES = [
+    Ticket.Status.NEW,
+    Ticket.Status.OPEN,
+    Ticket.Status.IN_PROGRESS,
+    Ticket.Status.WAITING,
+]
+
+
+def duration_between(end, start):
+    """Duration expression for `end - start` usable inside aggregates"""
+    return ExpressionWrapper(F(end) - F(start), output_field=DurationField())
+
+
+def to_hours(value):
+    """Convert an aggregated duration to hours (0 when there is no data)"""
+    if value is None:
+        return 0
+    if isinstance(value, timedelta):
+        return value.total_seconds() / 3600
+    # Some backends return the raw number of microseconds
+    return float(value) / 3600000000
+
+
+def compliance_percent(total, overdue):
+    """SLA compliance as a rounded percentage, 100 when nothing is tracked"""
+    if not total:
+        return 100
+    return round(((total - overdue) / total) * 100)
+
+
+class DashboardMetrics:
+    """
+    Computes every staff dashboard widget with a fixed number of grouped
+    aggregate queries, whatever the number of tickets, agents or branches.
+    Historical figures are read from the TicketDailyStats rollup.
+    """
+
+    def __init__(self, now=None):
+        self.now = now or timezone.now()
+        self.today_start = self.now.replace(hour=0, minute=0, second=0, microsecond=0)
+        self.week_ago = self.now - timedelta(days=7)
+        self.month_ago = self.now - timedelta(days=30)
+
+    def summary(self):
+        """Quick stat cards: resolved this week and open SLA breaches"""
+        return Ticket.objects.aggregate(
+            resolved_this_week=Count('id', filter=Q(
+                status=Ticket.Status.RESOLVED,
+                resolved_at__gte=self.week_ago,
+            )),
+            sla_breaches=Count('id', filter=Q(
+                due_date__lt=self.now,
+            ) & ~Q(status__in=[Ticket.Status.RESOLVED, Ticket.Status.CLOSED])),
+        )
+
+    def avg_response_time(self):
+        """Average hours between creation and first staff reply for last month's tickets"""
+        result = Ticket.objects.filter(
+            created_at__gte=self.month_ago,
+            first_response_at__isnull=False,
+        ).aggregate(
+            avg=Avg(duration_between('first_response_at', 'created_at'))
+        )
+        return to_hours(result['avg'])
+
+    def status_counts(self):
+        """Number of tickets per status, with zeros for empty statuses"""
+        counts = {status: 0 for status, _label in Ticket.Status.choices}
+        rows = Ticket.objects.order_by().values('status').annotate(count=Count('id'))
+        for row in rows:
+            counts[row['status']] = row['count']
+        return counts
+
+    def tickets_by_category(self):
+        return list(
+            Ticket.objects.order_by().values('category__name')
+            .annotate(count=Count('id')).order_by('-count')
+        )
+
+    def weekly_trends(self):
+        """Created and resolved ticket counts for each of the last seven days"""
+        today = timezone.localdate(self.now)
+        days = [today - timedelta(days=i) for i in range(6, -1, -1)]
+
+        rows = {
+            row['date']: row
+            for row in TicketDailyStats.objects.filter(date__gte=days[0], date__lte=today)
+            .order_by().values('date').annotate(
+                created=Sum('created_count'),
+                resolved=Sum('resolved_count'),
+            )
+        }
+
+        return {
+            'labels': [day.strftime('%a') for day in days],
+            'created': [rows.get(day, {}).get('created', 0) for day in days],
+            'resolved': [rows.get(day, {}).get('resolved', 0) for day in days],
+        }
+
+    def agent_performance(self):
+        """Per-agent assigned/resolved counts and average response/resolution hours"""
+        resolved = Q(assigned_tickets__status=Ticket.Status.RESOLVED)
+        agents = User.objects.filter(user_type=User.UserType.AGENT).annotate(
+            assigned=Count('assigned_tickets'),
+            resolved=Count('assigned_tickets', filter=resolved),
+            avg_resolution=Avg(
+                duration_between('assigned_tickets__resolved_at', 'assigned_tickets__created_at'),
+                filter=resolved & Q(assigned_tickets__resolved_at__isnull=False),
+            ),
+        )
+
+        # Response time is credited to the agent who replied first
+        response_times = dict(
+            Ticket.objects.filter(
+                first_responder__isnull=False,
+                created_at__gte=self.month_ago,
+            ).order_by().values('first_responder').annotate(
+                avg=Avg(duration_between('first_response_at', 'created_at'))
+            ).values_list('first_responder', 'avg')
+        )
+
+        performance = [
+            {
+                'name': agent.get_full_name() or agent.username,
+                'assigned': agent.assigned,
+                'resolved': agent.resolved,
+                'avg_response': to_hours(response_times.get(agent.pk)),
+                'avg_resolution': to_hours(agent.avg_resolution),
+            }
+            for agent in agents
+        ]
+        return sorted(performance, key=lambda x: x['resolved'], reverse=True)
+
+    @cached_property
+    def _branch_priority_rows(self):
+        """
+        Per (branch, priority) figures shared by the branch and SLA tables:
+        SLA history comes from the daily rollup; open and resolved tickets
+        are counted live, by their current status, because they become
+        overdue or get closed without the rollup seeing it.
+        """
+        month_start = timezone.localdate(self.month_ago)
+        recent = Q(date__gte=month_start)
+        rows = {}
+        for row in TicketDailyStats.objects.filter(recent).order_by().values('branch', 'priority').annotate(
+            sla_total=Sum('due_count'),
+            sla_overdue=Sum('breached_count'),
+        ):
+            rows[(row['branch'], row['priority'])] = {
+                'open': 0,
+                'resolved': 0,
+                'timed': 0,
+                'resolution_seconds': 0,
+                'sla_total': row['sla_total'] or 0,
+                'sla_overdue': row['sla_overdue'] or 0,
+            }
+
+        # Open tickets past due and not yet counted as breached by the rollup
+        is_open = Q(status__in=OPEN_STATUSES)
+        resolved = Q(status=Ticket.Status.RESOLVED)
+        timed = resolved & Q(resolved_at__isnull=False)
+        live = Ticket.objects.filter(is_open | resolved).order_by().values(
+            'branch', 'priority'
+        ).annotate(
+            open=Count('id', filter=is_open),
+            resolved=Count('id', filter=resolved),
+            timed=Count('id', filter=timed),
+            resolution=Sum(duration_between('resolved_at', 'created_at'), filter=timed),
+            overdue=Count('id', filter=is_open & Q(
+                created_at__gte=self.month_ago,
+                due_date__lt=self.now,
+                sla_breach=False,
+                resolved_at__isnull=True,
+                closed_at__isnull=True,
+            )),
+        )
+        for row in live:
+            figures = rows.setdefault((row['branch'], row['priority']), {
+                'open': 0, 'resolved': 0, 'timed': 0, 'resolution_seconds': 0, 'sla_total': 0, 'sla_overdue': 0,
+            })
+            figures['open'] = row['open']
+            figures['resolved'] = row['resolved']
+            figures['timed'] = row['timed']
+            figures['resolution_seconds'] = to_hours(row['resolution']) * 3600
+            figures['sla_overdue'] += row['overdue']
+        return rows
+
+    def _totals_by(self, index):
+        """Sum the (branch, priority) figures over one of the two dimensions"""
+        totals = {}
+        for key, figures in self._branch_priority_rows.items():
+            total = totals.setdefault(key[index], dict.fromkeys(figures, 0))
+            for name, value in figures.items():
+                total[name] += value
+        return totals
+
+    def branch_performance(self):
+        """Open/resolved counts, resolution time and SLA compliance per branch"""
+        rows = self._totals_by(0)
+
+        performance = []
+        for branch_code, branch_name in Ticket.Branch.choices:
+            row = rows.get(branch_code, {})
+            timed = row.get('timed', 0)
+            performance.append({
+                'name': branch_name,
+                'open': row.get('open', 0),
+                'resolved': row.get('resolved', 0),
+                'avg_resolution': row.get('resolution_seconds', 0) / 3600 / timed if timed else 0,
+                'sla_compliance': compliance_percent(row.get('sla_total', 0), row.get('sla_overdue', 0)),
+            })
+        return sorted(performance, key=lambda x: x['sla_compliance'], reverse=True)
+
+    def sla_compliance_by_priority(self):
+        rows = self._totals_by(1)
+        return {
+            priority: compliance_percent(
+                rows.get(priority, {}).get('sla_total', 0),
+                rows.get(priority, {}).get('sla_overdue', 0),
+            )
+            for priority, _label in Ticket.Priority.choices
+        }
+
+    def critical_issues(self, limit=5):
+        return list(
+            Ticket.objects.filter(
+                priority=Ticket.Priority.CRITICAL,
+                status__in=OPEN_STATUSES,
+            ).select_related('assigned_to').order_by('-created_at')[:limit]
+        )
+
+    def as_context(self):
+        """All widgets in the shape expected by the dashboard template"""
+        status_counts = self.status_counts()
+        summary = self.summary()
+        trends = self.weekly_trends()
+
+        return {
+            'open_tickets_count': sum(status_counts[status] for status in OPEN_STATUSES),
+            'tickets_resolved_this_week': summary['resolved_this_week'],
+            'sla_breaches': summary['sla_breaches'],
+            'avg_response_time': self.avg_response_time(),
+            'ticket_counts': status_counts,
+            'tickets_by_category': self.tickets_by_category(),
+            'weekly_labels': trends['labels'],
+            'weekly_created': trends['created'],
+            'weekly_resolved': trends['resolved'],
+            'agent_performance': self.agent_performance(),
+            'branch_performance': self.branch_performance(),
+            'sla_compliance': self.sla_compliance_by_priority(),
+            'critical_issues': self.critical_issues(),
+        }
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:28
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0003_ticket_daily_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticket_title', models.CharField(max_length=255, verbose_name='Ticket title')),
+                ('branch', models.CharField(blank=True, max_length=64, verbose_name='Branch')),
+                ('actor_name', models.CharField(blank=True, max_length=255, verbose_name='Actor name')),
+                ('verb', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('status_changed', 'Status Changed'), ('assigned', 'Assigned'), ('commented', 'Commented')], max_length=20, verbose_name='Verb')),
+                ('description', models.CharField(blank=True, max_length=255, verbose_name='Description')),
+                ('is_internal', models.BooleanField(default=False, verbose_name='Internal')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Created At')),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='activity_events', to=settings.AUTH_USER_MODEL, verbose_name='Actor')),
+                ('ticket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_events', to='tickets.ticket', verbose_name='Ticket')),
+                ('ticket_owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Ticket owner')),
+            ],
+            options={
+                'verbose_name': 'Activity Event',
+                'verbose_name_plural': 'Activity Events',
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['-created_at', '-id'], name='core_activi_created_266fa7_idx'), models.Index(fields=['ticket_owner', '-created_at', '-id'], name='core_activi_ticket__8515f3_idx')],
+            },
+        ),
+    ]
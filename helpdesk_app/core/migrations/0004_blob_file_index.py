@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-18 10:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_attachment_blobs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='blob',
+            name='file',
+            field=models.FileField(db_index=True, max_length=255, upload_to='', verbose_name='File'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.10 on 2026-10-18 10:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_blob_file_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blob',
+            name='preview',
+            field=models.FileField(blank=True, max_length=255, upload_to='', verbose_name='Preview'),
+        ),
+        migrations.AddField(
+            model_name='blob',
+            name='preview_status',
+            field=models.CharField(choices=[('none', 'No preview'), ('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='none', max_length=10, verbose_name='Preview status'),
+        ),
+        migrations.AddField(
+            model_name='blob',
+            name='thumbnail',
+            field=models.FileField(blank=True, max_length=255, upload_to='', verbose_name='Thumbnail'),
+        ),
+        migrations.AddIndex(
+            model_name='blob',
+            index=models.Index(condition=models.Q(('preview_status', 'pending')), fields=['created_at'], name='blob_preview_pending_idx'),
+        ),
+    ]
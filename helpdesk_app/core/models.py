@@ -1,6 +1,7 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
+from django.utils import timezone
 
 
 class EmailLog(models.Model):
@@ -118,4 +119,106 @@ class EmailSetting(models.Model):
         verbose_name_plural = _('Email Settings')
     
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+
+class ActivityEvent(models.Model):
+    """
+    Append-only stream of ticket activity shown in the dashboard feeds.
+    Ticket title, owner, branch and actor name are copied at write time so
+    a feed page is read with a single indexed range scan.
+    """
+    class Verb(models.TextChoices):
+        CREATED = 'created', _('Created')
+        UPDATED = 'updated', _('Updated')
+        STATUS_CHANGED = 'status_changed', _('Status Changed')
+        ASSIGNED = 'assigned', _('Assigned')
+        COMMENTED = 'commented', _('Commented')
+    
+    ticket = models.ForeignKey(
+        'tickets.Ticket',
+        on_delete=models.CASCADE,
+        related_name='activity_events',
+        verbose_name=_('Ticket')
+    )
+    ticket_title = models.CharField(_('Ticket title'), max_length=255)
+    ticket_owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        verbose_name=_('Ticket owner'),
+        null=True,
+        blank=True
+    )
+    branch = models.CharField(_('Branch'), max_length=64, blank=True)
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name='activity_events',
+        verbose_name=_('Actor'),
+        null=True,
+        blank=True
+    )
+    actor_name = models.CharField(_('Actor name'), max_length=255, blank=True)
+    verb = models.CharField(_('Verb'), max_length=20, choices=Verb.choices)
+    description = models.CharField(_('Description'), max_length=255, blank=True)
+    is_internal = models.BooleanField(_('Internal'), default=False)
+    created_at = models.DateTimeField(_('Created At'), default=timezone.now)
+    
+    class Meta:
+        verbose_name = _('Activity Event')
+        verbose_name_plural = _('Activity Events')
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['ticket_owner', '-created_at', '-id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.actor_name} {self.get_verb_display()} #{self.ticket_id}"
+
+
+
+class Blob(models.Model):
+    """
+    Attachment content stored once, addressed by its SHA-256 digest and
+    shared by every attachment with the same content (see core.blobs)
+    """
+    class PreviewStatus(models.TextChoices):
+        NONE = 'none', _('No preview')
+        PENDING = 'pending', _('Pending')
+        READY = 'ready', _('Ready')
+        FAILED = 'failed', _('Failed')
+
+    sha256 = models.CharField(_('SHA-256'), max_length=64, unique=True)
+    # Indexed: downloads find the blob of a media path
+    file = models.FileField(_('File'), max_length=255, db_index=True)
+    size = models.BigIntegerField(_('Size'))
+    # Attachments (or embedded uses) pointing to this blob
+    ref_count = models.PositiveIntegerField(_('References'), default=0)
+    created_at = models.DateTimeField(_('Created at'), auto_now_add=True)
+    released_at = models.DateTimeField(_('Last released at'), null=True, blank=True)
+    # WebP thumbnail and larger preview of images and of the first page of PDFs (core.previews)
+    preview_status = models.CharField(
+        _('Preview status'),
+        max_length=10,
+        choices=PreviewStatus.choices,
+        default=PreviewStatus.NONE
+    )
+    thumbnail = models.FileField(_('Thumbnail'), max_length=255, blank=True)
+    preview = models.FileField(_('Preview'), max_length=255, blank=True)
+
+    class Meta:
+        verbose_name = _('Blob')
+        verbose_name_plural = _('Blobs')
+        indexes = [
+            # Unused blobs waiting to be purged
+            models.Index(fields=['released_at'], name='blob_unused_idx', condition=models.Q(ref_count=0)),
+            # Previews still to generate
+            models.Index(
+                fields=['created_at'], name='blob_preview_pending_idx', condition=models.Q(preview_status='pending')
+            ),
+        ]
+
+    def __str__(self):
+        return self.sha256
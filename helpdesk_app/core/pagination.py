@@ -0,0 +1,150 @@
+"""
+Keyset ("load more") pagination.
+
+Instead of OFFSET, each page continues after the ordering values of the
+last row of the previous page, so fetching any page is a single range
+scan on an index matching the ordering.
+"""
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connection
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    raw = json.dumps([str(value) for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _to_python(model, name, value):
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        # Annotations used for ordering, such as search ranks, are numeric scores
+        return float(value)
+    return field.to_python(value)
+
+
+def decode_cursor(cursor, model, ordering):
+    """Turn a cursor back into Python values of the ordering fields"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if len(values) != len(ordering):
+            raise InvalidCursor(cursor)
+        return [_to_python(model, field.lstrip('-'), value) for field, value in zip(ordering, values)]
+    except (ValueError, TypeError, ValidationError):
+        raise InvalidCursor(cursor)
+
+
+def after(ordering, values):
+    """
+    Q selecting the rows that come after `values` in `ordering`, e.g. for
+    ('-created_at', '-id'): created_at < x OR (created_at = x AND id < y)
+    """
+    query = Q()
+    for i, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition = Q(**{f'{name}__{lookup}': values[i]})
+        for previous, value in zip(ordering[:i], values[:i]):
+            condition &= Q(**{previous.lstrip('-'): value})
+        query |= condition
+    return query
+
+
+class KeysetPage:
+    """One page of rows with the cursors of its neighbouring pages (None at the ends)"""
+
+    def __init__(self, items, next_cursor=None, previous_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def _cursor_of(row, ordering):
+    return encode_cursor(getattr(row, field.lstrip('-')) for field in ordering)
+
+
+def paginate(queryset, after_cursor=None, before_cursor=None, page_size=20, ordering=('-created_at', '-id')):
+    """
+    Return the KeysetPage that follows `after_cursor`, or precedes
+    `before_cursor`, or the first page. The last field of `ordering` must
+    be unique so that rows sharing the other values are not skipped.
+    Raises InvalidCursor for a malformed cursor.
+    """
+    ordering = list(ordering)
+    model = queryset.model
+
+    if before_cursor:
+        # Walk backwards with the reversed ordering, then restore the order
+        reverse = [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+        values = decode_cursor(before_cursor, model, ordering)
+        rows = list(queryset.order_by(*reverse).filter(after(reverse, values))[:page_size + 1])
+        has_previous = len(rows) > page_size
+        items = rows[:page_size][::-1]
+        if not items:
+            return KeysetPage(items)
+        return KeysetPage(
+            items,
+            next_cursor=_cursor_of(items[-1], ordering),
+            previous_cursor=_cursor_of(items[0], ordering) if has_previous else None,
+        )
+
+    queryset = queryset.order_by(*ordering)
+    if after_cursor:
+        queryset = queryset.filter(after(ordering, decode_cursor(after_cursor, model, ordering)))
+
+    # One extra row tells whether there is a next page
+    rows = list(queryset[:page_size + 1])
+    items = rows[:page_size]
+    return KeysetPage(
+        items,
+        next_cursor=_cursor_of(items[-1], ordering) if len(rows) > page_size else None,
+        previous_cursor=_cursor_of(items[0], ordering) if after_cursor and items else None,
+    )
+
+
+def keyset_page(queryset, cursor=None, page_size=20, ordering=('-created_at', '-id')):
+    """
+    Return one "load more" page of `queryset` as (items, next_cursor).
+    `next_cursor` is None on the last page.
+    """
+    page = paginate(queryset, after_cursor=cursor, page_size=page_size, ordering=ordering)
+    return page.items, page.next_cursor
+
+
+def estimate_count(queryset, exact_limit=1000):
+    """
+    Number of rows of `queryset` as (count, is_exact) without a full COUNT:
+    rows are counted exactly up to `exact_limit`; above that PostgreSQL's
+    planner estimate is used, other databases report the limit itself.
+    """
+    count = queryset.order_by()[:exact_limit + 1].count()
+    if count <= exact_limit:
+        return count, True
+
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return max(int(plan[0]['Plan']['Plan Rows']), count), False
+    return exact_limit, False
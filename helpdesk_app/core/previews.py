@@ -0,0 +1,145 @@
+"""
+Attachment thumbnails and previews.
+
+Images and the first page of PDFs get a small WebP thumbnail, shown in the
+ticket page, and a larger WebP preview. They are generated by a Celery
+task once the upload is committed, and stored next to the blobs under
+previews/<2 hex>/<2 hex>/<digest>-<kind>.webp: like the file, they are
+computed once per content whatever the number of attachments. The state
+of the generation is kept on the blob (Blob.preview_status).
+"""
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.bmp', '.gif', '.jpeg', '.jpg', '.png', '.tif', '.tiff', '.webp')
+PDF_EXTENSIONS = ('.pdf',)
+
+# Larger images are not decoded (decompression bombs)
+MAX_IMAGE_PIXELS = 50_000_000
+PDF_RENDER_TIMEOUT = 60
+
+
+def previewable(name):
+    return os.path.splitext(name or '')[1].lower() in IMAGE_EXTENSIONS + PDF_EXTENSIONS
+
+
+def preview_name(digest, kind):
+    return f'previews/{digest[:2]}/{digest[2:4]}/{digest}-{kind}.webp'
+
+
+def digest_from_preview_name(name):
+    """SHA-256 of the blob a preview file belongs to, None for other names"""
+    if not name.startswith('previews/'):
+        return None
+    return os.path.basename(name).split('-', 1)[0]
+
+
+def preview_sizes():
+    return {
+        'thumbnail': getattr(settings, 'PREVIEW_THUMBNAIL_SIZE', 320),
+        'preview': getattr(settings, 'PREVIEW_SIZE', 1280),
+    }
+
+
+def render_pdf_page(name, size):
+    """First page of the stored PDF `name` as an image, rendered by poppler"""
+    pdftoppm = shutil.which('pdftoppm')
+    if pdftoppm is None:
+        raise RuntimeError('pdftoppm (poppler-utils) is not installed')
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'source.pdf')
+        with default_storage.open(name, 'rb') as file, open(source, 'wb') as copy:
+            shutil.copyfileobj(file, copy)
+        output = os.path.join(directory, 'page')
+        subprocess.run(
+            [pdftoppm, '-png', '-singlefile', '-f', '1', '-l', '1', '-scale-to', str(size), source, output],
+            check=True,
+            capture_output=True,
+            timeout=PDF_RENDER_TIMEOUT,
+        )
+        with Image.open(output + '.png') as image:
+            image.load()
+            return image
+
+
+def open_image(name, size):
+    """The stored image `name`, decoded at no more than about `size` pixels"""
+    with default_storage.open(name, 'rb') as file:
+        image = Image.open(file)
+        if image.width * image.height > MAX_IMAGE_PIXELS:
+            raise ValueError(f'{name} is too large to preview ({image.width}x{image.height})')
+        # JPEG can decode at 1/2, 1/4 or 1/8 of its size directly
+        image.draft('RGB', (size, size))
+        image.load()
+    return ImageOps.exif_transpose(image)
+
+
+def webp(image, size):
+    image = image.copy()
+    image.thumbnail((size, size), Image.LANCZOS)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+    output = BytesIO()
+    image.save(output, 'WEBP', quality=80, method=4)
+    return output.getvalue()
+
+
+def generate_previews(blob_id):
+    """
+    Generate the thumbnail and preview of a blob whose generation is
+    pending; returns the new status, None when there was nothing to do
+    """
+    from .models import Blob
+
+    blob = Blob.objects.filter(pk=blob_id, preview_status=Blob.PreviewStatus.PENDING).first()
+    if blob is None:
+        return None
+
+    sizes = preview_sizes()
+    largest = max(sizes.values())
+    try:
+        if blob.file.name.lower().endswith(PDF_EXTENSIONS):
+            image = render_pdf_page(blob.file.name, largest)
+        else:
+            image = open_image(blob.file.name, largest)
+        names = {}
+        for kind, size in sizes.items():
+            name = preview_name(blob.sha256, kind)
+            default_storage.delete(name)
+            names[kind] = default_storage.save(name, ContentFile(webp(image, size)))
+    except Exception:
+        logger.warning('No preview for blob %s (%s)', blob.pk, blob.file.name, exc_info=True)
+        Blob.objects.filter(pk=blob.pk).update(preview_status=Blob.PreviewStatus.FAILED)
+        return Blob.PreviewStatus.FAILED
+
+    Blob.objects.filter(pk=blob.pk).update(
+        preview_status=Blob.PreviewStatus.READY, thumbnail=names['thumbnail'], preview=names['preview']
+    )
+    return Blob.PreviewStatus.READY
+
+
+def schedule_previews(blob):
+    """Queue the generation for a pending blob, once the transaction storing it commits"""
+    from .models import Blob
+    from .tasks import generate_blob_previews
+
+    if blob.preview_status == Blob.PreviewStatus.PENDING:
+        transaction.on_commit(lambda: generate_blob_previews.delay(blob.pk))
+
+
+def delete_previews(blob):
+    for file in (blob.thumbnail, blob.preview):
+        if file:
+            default_storage.delete(file.name)
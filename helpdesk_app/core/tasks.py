@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from celery import shared_task
+from django.utils import timezone
+
+from .blobs import purge_unused_blobs
+from .previews import generate_previews
+
+
+@shared_task(ignore_result=True)
+def generate_blob_previews(blob_id):
+    generate_previews(blob_id)
+
+
+@shared_task(ignore_result=True)
+def queue_pending_previews(limit=500):
+    """Queue again the previews still pending, e.g. after a worker restart"""
+    from .models import Blob
+
+    # Recent blobs have their task queued already
+    pending = Blob.objects.filter(
+        preview_status=Blob.PreviewStatus.PENDING, created_at__lt=timezone.now() - timedelta(minutes=10)
+    ).order_by('created_at')
+    for blob_id in pending.values_list('pk', flat=True)[:limit]:
+        generate_blob_previews.delay(blob_id)
+
+
+@shared_task(ignore_result=True)
+def purge_blobs():
+    purge_unused_blobs()
@@ -0,0 +1,127 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from comments.models import Comment
+from core.activity import feed_page
+from core.models import ActivityEvent
+from core.pagination import InvalidCursor, keyset_page
+from tickets.models import Ticket, TicketHistory
+
+User = get_user_model()
+
+
+class ActivityEventTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(
+            username='customer',
+            email='customer@example.com',
+            password='password123',
+            first_name='Jane',
+            last_name='Doe',
+            user_type='customer'
+        )
+        cls.agent = User.objects.create_user(
+            username='agent',
+            email='agent@example.com',
+            password='password123',
+            user_type='agent'
+        )
+        cls.ticket = Ticket.objects.create(
+            title='VPN access',
+            description='Cannot connect to the VPN',
+            branch=Ticket.Branch.DOUALA,
+            created_by=cls.customer,
+        )
+        cls.ticket_type = ContentType.objects.get_for_model(Ticket)
+
+    def comment(self, author, text, is_internal=False):
+        return Comment.objects.create(
+            content_type=self.ticket_type,
+            object_id=self.ticket.pk,
+            author=author,
+            text=text,
+            is_internal=is_internal,
+        )
+
+    def test_events_are_recorded(self):
+        TicketHistory.objects.create(
+            ticket=self.ticket,
+            user=self.agent,
+            field_changed='status',
+            old_value='New',
+            new_value='Open'
+        )
+        self.comment(self.agent, 'Working on it')
+
+        verbs = list(ActivityEvent.objects.values_list('verb', flat=True))
+        self.assertEqual(verbs, [
+            ActivityEvent.Verb.COMMENTED,
+            ActivityEvent.Verb.STATUS_CHANGED,
+            ActivityEvent.Verb.CREATED,
+        ])
+        event = ActivityEvent.objects.get(verb=ActivityEvent.Verb.CREATED)
+        self.assertEqual(event.ticket_title, 'VPN access')
+        self.assertEqual(event.ticket_owner, self.customer)
+        self.assertEqual(event.branch, Ticket.Branch.DOUALA)
+        self.assertEqual(event.actor_name, 'Jane Doe')
+
+    def test_customer_feed_hides_internal_and_own_activity(self):
+        self.comment(self.customer, 'Any news?')
+        self.comment(self.agent, 'Escalating to network team', is_internal=True)
+        self.comment(self.agent, 'We are on it')
+
+        events, next_cursor = feed_page(self.customer)
+        self.assertEqual([event.description for event in events], ['We are on it'])
+        self.assertIsNone(next_cursor)
+
+        events, _next = feed_page(self.agent)
+        self.assertEqual(len(events), 4)
+
+    def test_keyset_pagination(self):
+        """Pages do not overlap, even for events sharing the same timestamp"""
+        now = timezone.now()
+        for i in range(5):
+            self.comment(self.agent, f'Reply {i}')
+        ActivityEvent.objects.update(created_at=now)
+
+        seen = []
+        cursor = None
+        while True:
+            with self.assertNumQueries(1):
+                events, cursor = keyset_page(ActivityEvent.objects.all(), cursor=cursor, page_size=2)
+            seen.extend(event.pk for event in events)
+            if cursor is None:
+                break
+
+        self.assertEqual(seen, list(ActivityEvent.objects.order_by('-created_at', '-id').values_list('pk', flat=True)))
+        with self.assertRaises(InvalidCursor):
+            keyset_page(ActivityEvent.objects.all(), cursor='not-a-cursor')
+
+    def test_load_more_endpoint(self):
+        for i in range(12):
+            self.comment(self.agent, f'Reply {i}')
+        self.client.force_login(self.customer)
+
+        first = self.client.get(reverse('core:activity-feed')).json()
+        self.assertIn('Reply 11', first['html'])
+        second = self.client.get(reverse('core:activity-feed'), {'cursor': first['next_cursor']}).json()
+        self.assertIn('Reply 0', second['html'])
+        self.assertIsNone(second['next_cursor'])
+
+        response = self.client.get(reverse('core:activity-feed'), {'cursor': 'bad'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_backfill_command(self):
+        self.comment(self.agent, 'Working on it')
+        ActivityEvent.objects.all().delete()
+
+        call_command('backfill_activity_events', stdout=StringIO())
+
+        self.assertEqual(ActivityEvent.objects.count(), 2)
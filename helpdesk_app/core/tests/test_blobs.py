@@ -0,0 +1,146 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.blobs import purge_unused_blobs
+from core.models import Blob
+from tickets.models import Ticket, TicketAttachment
+
+User = get_user_model()
+
+SCREENSHOT = b'\x89PNG same screenshot' * 100
+
+
+class BlobStoreTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(
+            username='blobcustomer',
+            email='blobcustomer@example.com',
+            password='password123',
+            user_type='customer'
+        )
+        cls.ticket = Ticket.objects.create(title='Screen', description='Flickers', created_by=cls.customer)
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.media_root = media_root
+
+    def stored_files(self):
+        return [os.path.join(root, name) for root, dirs, files in os.walk(self.media_root) for name in files]
+
+    def test_repeated_uploads_are_stored_once(self):
+        self.client.force_login(self.customer)
+        self.client.post(reverse('tickets:ticket-create'), {
+            'title': 'Error again',
+            'description': 'Same screenshot as before',
+            'file': [SimpleUploadedFile('error.png', SCREENSHOT), SimpleUploadedFile('error-2.png', SCREENSHOT)],
+        })
+        attachment = TicketAttachment(ticket=self.ticket, uploaded_by=self.customer, description='again.png')
+        attachment.file = SimpleUploadedFile('again.png', SCREENSHOT)
+        attachment.save()
+
+        blob = Blob.objects.get()
+        self.assertEqual(blob.sha256, hashlib.sha256(SCREENSHOT).hexdigest())
+        self.assertEqual(blob.ref_count, 3)
+        self.assertEqual(set(TicketAttachment.objects.values_list('blob', 'file')), {(blob.pk, blob.file.name)})
+        self.assertEqual(len(self.stored_files()), 1)
+
+    def test_unused_blobs_are_purged(self):
+        attachments = []
+        for name in ('one.png', 'two.png'):
+            attachment = TicketAttachment(ticket=self.ticket, uploaded_by=self.customer, description=name)
+            attachment.file = SimpleUploadedFile(name, SCREENSHOT)
+            attachment.save()
+            attachments.append(attachment)
+
+        attachments[0].delete()
+        self.assertEqual(Blob.objects.get().ref_count, 1)
+        self.ticket.delete()
+        blob = Blob.objects.get()
+        self.assertEqual(blob.ref_count, 0)
+
+        # Kept during the grace period, in case the content comes back
+        self.assertEqual(purge_unused_blobs(), 0)
+        Blob.objects.update(released_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(purge_unused_blobs(), 1)
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(default_storage.exists(blob.file.name))
+
+    def test_files_of_rolled_back_uploads_are_purged(self):
+        kept = TicketAttachment(ticket=self.ticket, uploaded_by=self.customer, description='kept.png')
+        kept.file = SimpleUploadedFile('kept.png', SCREENSHOT)
+        kept.save()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            attachment = TicketAttachment(ticket=self.ticket, uploaded_by=self.customer, description='lost.log')
+            attachment.file = SimpleUploadedFile('lost.log', b'rolled back')
+            attachment.save()
+            raise RuntimeError
+        self.assertFalse(Blob.objects.filter(sha256=hashlib.sha256(b'rolled back').hexdigest()).exists())
+        self.assertEqual(len(self.stored_files()), 2)
+
+        # Kept during the grace period: its transaction may still be running
+        purge_unused_blobs()
+        self.assertEqual(len(self.stored_files()), 2)
+        two_days_ago = (timezone.now() - timedelta(days=2)).timestamp()
+        for path in self.stored_files():
+            os.utime(path, (two_days_ago, two_days_ago))
+        purge_unused_blobs()
+        self.assertEqual(self.stored_files(), [os.path.join(self.media_root, kept.blob.file.name)])
+
+    def test_dedup_command(self):
+        # Attachments stored before the blob store, one file each
+        TicketAttachment.objects.bulk_create([
+            TicketAttachment(
+                ticket=self.ticket, uploaded_by=self.customer, file=ContentFile(content, name=name), description=name
+            )
+            for name, content in (('a.log', b'error log'), ('b.log', b'error log'), ('c.log', b'other log'))
+        ])
+        self.assertEqual(len(self.stored_files()), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('dedup_attachments', workers=2, batch_size=2, stdout=StringIO())
+
+        self.assertEqual(sorted(Blob.objects.values_list('ref_count', flat=True)), [1, 2])
+        self.assertFalse(TicketAttachment.objects.filter(blob__isnull=True).exists())
+        self.assertEqual(len(self.stored_files()), 2)
+        for attachment in TicketAttachment.objects.select_related('blob'):
+            self.assertEqual(attachment.file.name, attachment.blob.file.name)
+            self.assertEqual(attachment.file.read(), b'other log' if attachment.description == 'c.log' else b'error log')
+
+    def test_dedup_command_queues_previews_of_new_blobs_only(self):
+        # Its previews are already queued
+        uploaded = TicketAttachment(ticket=self.ticket, uploaded_by=self.customer, description='error.png')
+        uploaded.file = SimpleUploadedFile('error.png', SCREENSHOT)
+        uploaded.save()
+        TicketAttachment.objects.bulk_create([
+            TicketAttachment(
+                ticket=self.ticket, uploaded_by=self.customer, file=ContentFile(content, name=name), description=name
+            )
+            for name, content in (('old.png', SCREENSHOT), ('new.png', b'\x89PNG other screenshot'))
+        ])
+
+        with mock.patch('core.tasks.generate_blob_previews.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command('dedup_attachments', workers=2, stdout=StringIO())
+
+        new = Blob.objects.get(sha256=hashlib.sha256(b'\x89PNG other screenshot').hexdigest())
+        delay.assert_called_once_with(new.pk)
@@ -0,0 +1,80 @@
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core import cache as cache_utils
+from tickets.models import Category
+
+User = get_user_model()
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'cache-tests'}}
+
+
+@override_settings(CACHES=LOCMEM)
+class GetOrComputeTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_value_is_computed_once(self):
+        compute = mock.Mock(return_value=42)
+        self.assertEqual(cache_utils.get_or_compute('answer', compute, 60), 42)
+        self.assertEqual(cache_utils.get_or_compute('answer', compute, 60), 42)
+        self.assertEqual(compute.call_count, 1)
+
+    @mock.patch('core.cache.random.random', return_value=0.5)
+    def test_early_refresh_close_to_expiry(self, _random):
+        """A value about to expire is recomputed before it actually expires"""
+        cache.set('answer', (1, 10.0, time.time() + 0.5), 60)
+        self.assertEqual(cache_utils.get_or_compute('answer', lambda: 2, 60), 2)
+
+        # Far from expiry the cached value is kept
+        cache.set('answer', (1, 0.01, time.time() + 60), 60)
+        self.assertEqual(cache_utils.get_or_compute('answer', lambda: 3, 60), 1)
+
+    @mock.patch('core.cache.random.random', return_value=0.5)
+    def test_early_refresh_is_single_flight(self, _random):
+        """While one process refreshes, the others keep serving the cached value"""
+        cache.set('answer', (1, 10.0, time.time() + 0.5), 60)
+        cache.add('answer:lock', 1)
+        self.assertEqual(cache_utils.get_or_compute('answer', lambda: 2, 60), 1)
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def slow_compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache_utils.get_or_compute('hot', slow_compute, 60)))
+            for _i in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ['value'] * 5)
+        self.assertEqual(len(calls), 1)
+
+
+@override_settings(CACHES=LOCMEM)
+class NamespaceTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_changes_keys(self):
+        key = cache_utils.make_key('reports', 'weekly')
+        cache_utils.bump('reports')
+        self.assertNotEqual(cache_utils.make_key('reports', 'weekly'), key)
+
+    def test_model_change_bumps_namespace(self):
+        key = cache_utils.make_key('reference', 'categories')
+        Category.objects.create(name='Hardware')
+        self.assertNotEqual(cache_utils.make_key('reference', 'categories'), key)
@@ -0,0 +1,74 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from tickets.models import Ticket
+
+User = get_user_model()
+
+
+class DashboardWidgetViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(
+            username='customer',
+            email='customer@example.com',
+            password='password123',
+            user_type='customer'
+        )
+        cls.agent = User.objects.create_user(
+            username='agent',
+            email='agent@example.com',
+            password='password123',
+            user_type='agent'
+        )
+        Ticket.objects.create(
+            title='Network down',
+            description='No connection on the second floor',
+            branch=Ticket.Branch.SIEGE,
+            priority=Ticket.Priority.CRITICAL,
+            created_by=cls.customer,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.agent)
+
+    def widget_url(self, name):
+        return reverse('core:dashboard-widget', kwargs={'name': name})
+
+    def test_dashboard_page_lists_widget_endpoints(self):
+        response = self.client.get(reverse('core:dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('summary', response.context['dashboard_widgets'])
+        self.assertContains(response, self.widget_url('critical_issues'))
+
+    def test_widget_returns_json_with_etag(self):
+        response = self.client.get(self.widget_url('summary'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertEqual(json.loads(response.content)['open_tickets_count'], 1)
+
+        html = json.loads(self.client.get(self.widget_url('critical_issues')).content)['html']
+        self.assertIn('Network down', html)
+
+    def test_unchanged_widget_returns_304(self):
+        etag = self.client.get(self.widget_url('ticket_status'))['ETag']
+        response = self.client.get(self.widget_url('ticket_status'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_widget_access(self):
+        self.assertEqual(self.client.get(self.widget_url('unknown')).status_code, 404)
+
+        self.client.force_login(self.customer)
+        self.assertEqual(self.client.get(self.widget_url('summary')).status_code, 403)
+
+    def test_customer_dashboard_renders_activity_inline(self):
+        self.client.force_login(self.customer)
+        response = self.client.get(reverse('core:dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('dashboard_widgets', response.context)
+        self.assertContains(response, 'data-activity-list')
@@ -0,0 +1,111 @@
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from comments.models import Comment, CommentAttachment
+from tickets.models import Ticket, TicketAttachment
+
+User = get_user_model()
+
+CONTENT = bytes(range(256)) * 4
+
+
+class ProtectedMediaTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(
+            username='mediacustomer',
+            email='mediacustomer@example.com',
+            password='password123',
+            user_type='customer'
+        )
+        cls.other = User.objects.create_user(
+            username='mediaother',
+            email='mediaother@example.com',
+            password='password123',
+            user_type='customer'
+        )
+        cls.agent = User.objects.create_user(
+            username='mediaagent',
+            email='mediaagent@example.com',
+            password='password123',
+            user_type='agent',
+            is_staff=True
+        )
+        cls.ticket = Ticket.objects.create(title='Logs', description='See attached', created_by=cls.customer)
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media_root, MEDIA_ACCEL_REDIRECT=False)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.attachment = TicketAttachment(ticket=self.ticket, uploaded_by=self.customer, description='trace.bin')
+        self.attachment.file = SimpleUploadedFile('trace.bin', CONTENT)
+        self.attachment.save()
+        self.url = self.attachment.file.url
+
+    def get(self, url, **headers):
+        response = self.client.get(url, **headers)
+        if response.streaming:
+            response.content_bytes = b''.join(response.streaming_content)
+            response.close()
+        return response
+
+    def test_access_follows_the_ticket(self):
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+        for user in (self.customer, self.agent):
+            self.client.force_login(user)
+            response = self.get(self.url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content_bytes, CONTENT)
+            self.assertIn('private', response['Cache-Control'])
+
+    def test_internal_comment_attachments(self):
+        comment = Comment.objects.create(
+            content_type=ContentType.objects.get_for_model(Ticket),
+            object_id=self.ticket.pk,
+            author=self.agent,
+            text='Internal analysis',
+            is_internal=True,
+        )
+        attachment = CommentAttachment(comment=comment, description='analysis.txt')
+        attachment.file = SimpleUploadedFile('analysis.txt', b'internal notes')
+        attachment.save()
+
+        self.client.force_login(self.customer)
+        self.assertEqual(self.client.get(attachment.file.url).status_code, 404)
+        self.client.force_login(self.agent)
+        self.assertEqual(self.get(attachment.file.url).status_code, 200)
+
+    def test_ranges_and_conditional_requests(self):
+        self.client.force_login(self.customer)
+        response = self.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(CONTENT)}')
+        self.assertEqual(response.content_bytes, CONTENT[10:20])
+
+        response = self.get(self.url, HTTP_RANGE='bytes=-6')
+        self.assertEqual(response.content_bytes, CONTENT[-6:])
+
+        self.assertEqual(self.get(self.url, HTTP_RANGE=f'bytes={len(CONTENT)}-').status_code, 416)
+
+        last_modified = self.get(self.url)['Last-Modified']
+        self.assertEqual(self.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT=True)
+    def test_transfer_is_left_to_nginx(self):
+        self.client.force_login(self.customer)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.attachment.file.name}')
+        self.assertEqual(response.content, b'')
@@ -0,0 +1,125 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from comments.models import Comment
+from core.metrics import DashboardMetrics
+from tickets.models import Ticket
+from tickets.stats import rebuild_all
+
+User = get_user_model()
+
+
+class DashboardMetricsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(
+            username='customer',
+            email='customer@example.com',
+            password='password123',
+            user_type='customer'
+        )
+        cls.agent = User.objects.create_user(
+            username='agent',
+            email='agent@example.com',
+            password='password123',
+            first_name='Agent',
+            last_name='Smith',
+            user_type='agent'
+        )
+        cls.ticket_type = ContentType.objects.get_for_model(Ticket)
+
+    def create_tickets(self, count, branch=Ticket.Branch.SIEGE):
+        """Create resolved tickets that each received one agent reply"""
+        now = timezone.now()
+        for i in range(count):
+            ticket = Ticket.objects.create(
+                title=f'Ticket {i}',
+                description='Printer is broken',
+                branch=branch,
+                priority=Ticket.Priority.HIGH,
+                status=Ticket.Status.RESOLVED,
+                created_by=self.customer,
+                assigned_to=self.agent,
+            )
+            Comment.objects.create(
+                content_type=self.ticket_type,
+                object_id=ticket.pk,
+                author=self.agent,
+                text='Looking into it',
+            )
+            Ticket.objects.filter(pk=ticket.pk).update(
+                created_at=now - timedelta(hours=4),
+                first_response_at=now - timedelta(hours=2),
+                resolved_at=now,
+            )
+        rebuild_all()
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            DashboardMetrics().as_context()
+        return len(queries)
+
+    def test_query_count_is_constant(self):
+        """The number of queries does not grow with the number of tickets"""
+        self.create_tickets(2)
+        small = self.count_queries()
+
+        self.create_tickets(20, branch=Ticket.Branch.DOUALA)
+        large = self.count_queries()
+
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 12)
+
+    def test_response_and_resolution_times(self):
+        """Averages are reported in hours"""
+        self.create_tickets(3)
+        metrics = DashboardMetrics()
+
+        self.assertAlmostEqual(metrics.avg_response_time(), 2, places=1)
+
+        agent_row = metrics.agent_performance()[0]
+        self.assertEqual(agent_row['name'], 'Agent Smith')
+        self.assertEqual(agent_row['assigned'], 3)
+        self.assertEqual(agent_row['resolved'], 3)
+        self.assertAlmostEqual(agent_row['avg_response'], 2, places=1)
+        self.assertAlmostEqual(agent_row['avg_resolution'], 4, places=1)
+
+    def test_status_and_branch_counts(self):
+        """Empty statuses and branches are reported with zero values"""
+        self.create_tickets(2, branch=Ticket.Branch.BUEA)
+        metrics = DashboardMetrics()
+
+        counts = metrics.status_counts()
+        self.assertEqual(counts[Ticket.Status.RESOLVED], 2)
+        self.assertEqual(counts[Ticket.Status.NEW], 0)
+
+        branches = {row['name']: row for row in metrics.branch_performance()}
+        self.assertEqual(len(branches), len(Ticket.Branch.choices))
+        self.assertEqual(branches[Ticket.Branch.BUEA.label]['resolved'], 2)
+        self.assertEqual(branches[Ticket.Branch.DOUALA.label]['resolved'], 0)
+        self.assertEqual(branches[Ticket.Branch.DOUALA.label]['sla_compliance'], 100)
+
+    def test_branch_resolved_counts_current_status(self):
+        """Like the agent table, a branch counts its tickets still resolved, not the closed ones"""
+        self.create_tickets(3, branch=Ticket.Branch.BUEA)
+        Ticket.objects.filter(pk=Ticket.objects.order_by('pk').values('pk')[:1]).update(
+            status=Ticket.Status.CLOSED, closed_at=timezone.now()
+        )
+
+        branch = {row['name']: row for row in DashboardMetrics().branch_performance()}[Ticket.Branch.BUEA.label]
+        self.assertEqual(branch['resolved'], 2)
+        self.assertAlmostEqual(branch['avg_resolution'], 4, places=1)
+
+    def test_weekly_trends(self):
+        self.create_tickets(2)
+        trends = DashboardMetrics().weekly_trends()
+
+        self.assertEqual(len(trends['labels']), 7)
+        self.assertEqual(sum(trends['created']), 2)
+        self.assertEqual(sum(trends['resolved']), 2)
@@ -0,0 +1,79 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from core.models import Blob
+from tickets.models import Ticket, TicketAttachment
+
+User = get_user_model()
+
+
+def png(width, height):
+    output = BytesIO()
+    Image.new('RGB', (width, height), (200, 30, 30)).save(output, 'PNG')
+    return output.getvalue()
+
+
+@override_settings(PREVIEW_THUMBNAIL_SIZE=32, PREVIEW_SIZE=64)
+class AttachmentPreviewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(
+            username='previewcustomer',
+            email='previewcustomer@example.com',
+            password='password123',
+            user_type='customer'
+        )
+        cls.other = User.objects.create_user(
+            username='previewother',
+            email='previewother@example.com',
+            password='password123',
+            user_type='customer'
+        )
+        cls.ticket = Ticket.objects.create(title='Screen', description='Flickers', created_by=cls.customer)
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media_root, MEDIA_ACCEL_REDIRECT=False)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def attach(self, name, content):
+        attachment = TicketAttachment(ticket=self.ticket, uploaded_by=self.customer, description=name)
+        attachment.file = SimpleUploadedFile(name, content)
+        with self.captureOnCommitCallbacks(execute=True):
+            attachment.save()
+        return TicketAttachment.objects.select_related('blob').get(pk=attachment.pk)
+
+    def test_image_thumbnails(self):
+        attachment = self.attach('screen.png', png(200, 100))
+        blob = attachment.blob
+        self.assertEqual(attachment.preview_status, Blob.PreviewStatus.READY)
+
+        with default_storage.open(blob.thumbnail.name) as file, Image.open(file) as thumbnail:
+            self.assertEqual((thumbnail.format, thumbnail.size), ('WEBP', (32, 16)))
+        with default_storage.open(blob.preview.name) as file, Image.open(file) as preview:
+            self.assertEqual(preview.size, (64, 32))
+
+        self.client.force_login(self.customer)
+        response = self.client.get(reverse('tickets:ticket-detail', args=[self.ticket.pk]))
+        self.assertContains(response, f'src="{blob.thumbnail.url}"')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertEqual(self.client.get(blob.thumbnail.url).status_code, 200)
+
+        # Previews are as private as the attachment
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(blob.thumbnail.url).status_code, 404)
+
+    def test_failures_and_other_files(self):
+        with self.assertLogs('core.previews', 'WARNING'):
+            self.assertEqual(self.attach('broken.png', b'not an image').preview_status, Blob.PreviewStatus.FAILED)
+        self.assertEqual(self.attach('notes.txt', b'plain text').preview_status, Blob.PreviewStatus.NONE)
@@ -0,0 +1,228 @@
+"""
+Closure tables for the self-referencing category trees.
+
+For every node, the closure table of its model holds one row per ancestor
+(the node itself included, at depth 0), so that the descendants or the
+ancestors of a node are one indexed query whatever the depth of the tree.
+The rows are maintained by the receivers connected with register_tree.
+
+The whole tree (ids, parents and names) is also cached, in the
+'reference' namespace, for breadcrumbs and labels that would otherwise
+need one query per level.
+"""
+from collections import defaultdict
+
+from django.apps import apps
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models.signals import post_save, pre_delete, pre_save
+from django.utils.translation import get_language, gettext_lazy as _
+
+from .cache import get_or_compute, make_key, register_namespace
+
+TREE_CACHE_TIMEOUT = 3600
+
+CYCLE_ERROR = _('A category cannot be moved under itself or one of its subcategories.')
+
+
+def closure_model(model):
+    return apps.get_model(model.closure_model)
+
+
+class TreeNodeMixin:
+    """
+    Tree API of a model with a `parent` foreign key to itself and a
+    `closure_model` ('app_label.ModelName') with ancestor, descendant and
+    depth fields
+    """
+    # Extra fields kept in the cached tree besides id, parent_id and name
+    tree_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # A save compares it with the new parent to move the subtree
+        instance._loaded_parent_id = instance.__dict__.get('parent_id')
+        return instance
+
+    def clean(self):
+        super().clean()
+        if creates_cycle(type(self), self):
+            raise ValidationError({'parent': CYCLE_ERROR})
+
+    def descendant_ids(self, include_self=True):
+        return descendant_ids(type(self), self.pk, include_self)
+
+    def get_descendants(self, include_self=False):
+        """The categories below this one, in one query"""
+        return type(self)._default_manager.filter(pk__in=self.descendant_ids(include_self))
+
+    def get_ancestors(self, include_self=False):
+        """The categories above this one, root first, in one query"""
+        return type(self)._default_manager.filter(
+            descendant_links__descendant_id=self.pk,
+            descendant_links__depth__gte=0 if include_self else 1,
+        ).order_by('-descendant_links__depth')
+
+    def breadcrumbs(self):
+        """Cached tree nodes from the root down to this category (dicts of the tree fields)"""
+        return tree_path(type(self), self.pk)
+
+
+def descendant_ids(model, pk, include_self=True):
+    """Subquery of the ids of the node `pk` and everything below it"""
+    rows = closure_model(model).objects.filter(ancestor_id=pk)
+    if not include_self:
+        rows = rows.filter(depth__gt=0)
+    return rows.values('descendant_id')
+
+
+def ancestor_ids(model, pk, include_self=True):
+    """Subquery of the ids of the node `pk` and everything above it"""
+    rows = closure_model(model).objects.filter(descendant_id=pk)
+    if not include_self:
+        rows = rows.filter(depth__gt=0)
+    return rows.values('ancestor_id')
+
+
+def creates_cycle(model, node):
+    """Whether the new parent of a saved `node` lies in its own subtree"""
+    if not node.pk or not node.parent_id:
+        return False
+    return closure_model(model).objects.filter(ancestor_id=node.pk, descendant_id=node.parent_id).exists()
+
+
+def _insert_node(model, node):
+    Closure = closure_model(model)
+    rows = [Closure(ancestor_id=node.pk, descendant_id=node.pk, depth=0)]
+    if node.parent_id:
+        rows += [
+            Closure(ancestor_id=ancestor, descendant_id=node.pk, depth=depth + 1)
+            for ancestor, depth in Closure.objects.filter(descendant_id=node.parent_id).values_list(
+                'ancestor_id', 'depth'
+            )
+        ]
+    Closure.objects.bulk_create(rows)
+
+
+def _move_node(model, node):
+    """Re-link the subtree of `node` under its new parent"""
+    Closure = closure_model(model)
+    subtree = list(Closure.objects.filter(ancestor_id=node.pk).values_list('descendant_id', 'depth'))
+    subtree_ids = [pk for pk, depth in subtree]
+    # Paths from the old ancestors into the subtree
+    Closure.objects.filter(descendant_id__in=subtree_ids).exclude(ancestor_id__in=subtree_ids).delete()
+    if node.parent_id:
+        ancestors = Closure.objects.filter(descendant_id=node.parent_id).values_list('ancestor_id', 'depth')
+        Closure.objects.bulk_create([
+            Closure(ancestor_id=ancestor, descendant_id=descendant, depth=up + down + 1)
+            for ancestor, up in ancestors
+            for descendant, down in subtree
+        ])
+
+
+def closure_rows(parents):
+    """(ancestor, descendant, depth) of every path of a tree given as {id: parent id}"""
+    rows = []
+    for pk in parents:
+        node, depth, seen = pk, 0, set()
+        while node is not None and node not in seen:
+            seen.add(node)
+            rows.append((node, pk, depth))
+            node, depth = parents.get(node), depth + 1
+    return rows
+
+
+def rebuild_closure(model):
+    """Rebuild the closure table of `model` from the parent links"""
+    Closure = closure_model(model)
+    parents = dict(model._default_manager.values_list('pk', 'parent_id'))
+    with transaction.atomic():
+        Closure.objects.all().delete()
+        Closure.objects.bulk_create(
+            [Closure(ancestor_id=a, descendant_id=d, depth=depth) for a, d, depth in closure_rows(parents)],
+            batch_size=1000,
+        )
+
+
+def get_tree(model):
+    """
+    The cached tree of `model`: {id: {'id', 'parent_id', 'name', *tree_fields}},
+    names in the current language
+    """
+    def compute():
+        fields = ('id', 'parent_id', 'name', *model.tree_fields)
+        return {node['id']: node for node in model._default_manager.order_by().values(*fields)}
+
+    key = make_key('reference', 'tree', model._meta.label_lower, get_language())
+    return get_or_compute(key, compute, TREE_CACHE_TIMEOUT)
+
+
+def tree_path(model, pk):
+    """Cached nodes from the root down to `pk`"""
+    tree = get_tree(model)
+    path = []
+    while pk is not None and pk in tree and len(path) <= len(tree):
+        path.append(tree[pk])
+        pk = tree[pk]['parent_id']
+    return path[::-1]
+
+
+def tree_descendants(model, pk):
+    """Ids of `pk` and of every node below it, from the cached tree"""
+    children = defaultdict(list)
+    for node in get_tree(model).values():
+        children[node['parent_id']].append(node['id'])
+    ids, stack = set(), [pk]
+    while stack:
+        node = stack.pop()
+        if node not in ids:
+            ids.add(node)
+            stack.extend(children[node])
+    return ids
+
+
+def roll_up(model, counts):
+    """Counts per node ({id: count}) including the counts of the nodes below"""
+    tree = get_tree(model)
+    totals = defaultdict(int)
+    for pk, count in counts.items():
+        for node in tree_path(model, pk) if pk in tree else [{'id': pk}]:
+            totals[node['id']] += count
+    return dict(totals)
+
+
+def register_tree(model):
+    """Maintain the closure table of `model` and invalidate its cached tree"""
+    register_namespace('reference', model)
+
+    def parent_changed(instance):
+        return getattr(instance, '_loaded_parent_id', instance.parent_id) != instance.parent_id
+
+    def node_saving(sender, instance, raw=False, **kwargs):
+        if not raw and parent_changed(instance) and creates_cycle(model, instance):
+            raise ValidationError({'parent': CYCLE_ERROR})
+
+    def node_saved(sender, instance, created, raw=False, **kwargs):
+        if raw:
+            return
+        if created:
+            _insert_node(model, instance)
+        elif parent_changed(instance):
+            _move_node(model, instance)
+        instance._loaded_parent_id = instance.parent_id
+
+    def node_deleting(sender, instance, **kwargs):
+        # Children left in place (SET_NULL) become roots: cut the paths through this node
+        Closure = closure_model(model)
+        below = list(descendant_ids(model, instance.pk, include_self=False).values_list('descendant_id', flat=True))
+        if below:
+            Closure.objects.filter(
+                descendant_id__in=below,
+                ancestor_id__in=list(ancestor_ids(model, instance.pk).values_list('ancestor_id', flat=True)),
+            ).delete()
+
+    uid = f'closure-{model._meta.label_lower}'
+    pre_save.connect(node_saving, sender=model, weak=False, dispatch_uid=f'{uid}-check')
+    post_save.connect(node_saved, sender=model, weak=False, dispatch_uid=uid)
+    pre_delete.connect(node_deleting, sender=model, weak=False, dispatch_uid=f'{uid}-delete')
@@ -1,9 +1,11 @@
 from django.urls import path
-from .views import HomeView, DashboardView
+from .views import HomeView, DashboardView, dashboard_widget, activity_feed
 
 app_name = 'core'
 
 urlpatterns = [
     path('', HomeView.as_view(), name='home'),
     path('dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('dashboard/widgets/<slug:name>/', dashboard_widget, name='dashboard-widget'),
+    path('dashboard/activity/', activity_feed, name='activity-feed'),
 ]
\ No newline at end of file
@@ -0,0 +1,112 @@
+"""
+Staff dashboard widgets, each served by its own cached JSON endpoint.
+"""
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.template.loader import render_to_string
+from django.utils.translation import get_language, gettext as _
+
+from tickets.models import Ticket
+
+from .activity import FEED_PAGE_SIZE
+from .cache import get_or_compute
+from .metrics import DashboardMetrics, OPEN_STATUSES
+from .models import ActivityEvent
+from .pagination import keyset_page
+
+
+class DashboardWidget:
+    """
+    A dashboard widget: a function computing its data from DashboardMetrics,
+    how long the result may be cached and, for lists and tables, the partial
+    template used to render it as HTML.
+    """
+
+    def __init__(self, compute, ttl, template=None):
+        self.compute = compute
+        self.ttl = ttl
+        self.template = template
+
+    def render(self):
+        data = self.compute(DashboardMetrics())
+        if self.template:
+            data = {'html': render_to_string(self.template, data)}
+        return json.dumps(data, cls=DjangoJSONEncoder)
+
+
+def summary(metrics):
+    status_counts = metrics.status_counts()
+    totals = metrics.summary()
+    return {
+        'open_tickets_count': sum(status_counts[status] for status in OPEN_STATUSES),
+        'tickets_resolved_this_week': totals['resolved_this_week'],
+        'sla_breaches': totals['sla_breaches'],
+        'avg_response_time': round(metrics.avg_response_time(), 1),
+    }
+
+
+def ticket_status(metrics):
+    counts = metrics.status_counts()
+    return {
+        'labels': [str(label) for _status, label in Ticket.Status.choices],
+        'data': [counts[status] for status, _label in Ticket.Status.choices],
+    }
+
+
+def tickets_by_category(metrics):
+    rows = metrics.tickets_by_category()
+    return {
+        'labels': [row['category__name'] or _('Uncategorized') for row in rows],
+        'data': [row['count'] for row in rows],
+    }
+
+
+def recent_activity(metrics):
+    # Staff see the whole stream, the same first page for everyone
+    events, next_cursor = keyset_page(ActivityEvent.objects.all(), page_size=FEED_PAGE_SIZE)
+    return {'events': events, 'next_cursor': next_cursor}
+
+
+WIDGETS = {
+    'summary': DashboardWidget(summary, ttl=60),
+    'ticket_status': DashboardWidget(ticket_status, ttl=60),
+    'tickets_by_category': DashboardWidget(tickets_by_category, ttl=300),
+    'weekly_trends': DashboardWidget(lambda metrics: metrics.weekly_trends(), ttl=300),
+    'agent_performance': DashboardWidget(
+        lambda metrics: {'agent_performance': metrics.agent_performance()},
+        ttl=300,
+        template='dashboard/agent_performance.html',
+    ),
+    'branch_performance': DashboardWidget(
+        lambda metrics: {'branch_performance': metrics.branch_performance()},
+        ttl=300,
+        template='dashboard/branch_performance.html',
+    ),
+    'critical_issues': DashboardWidget(
+        lambda metrics: {'critical_issues': metrics.critical_issues()},
+        ttl=60,
+        template='dashboard/critical_issues.html',
+    ),
+    'recent_activity': DashboardWidget(
+        recent_activity,
+        ttl=30,
+        template='dashboard/recent_activity.html',
+    ),
+}
+
+
+def get_widget_payload(name):
+    """
+    Return the JSON body of a widget and its ETag, served from the shared
+    cache for the widget's TTL. Raises KeyError for unknown widgets.
+    """
+    widget = WIDGETS[name]
+
+    def compute():
+        body = widget.render()
+        return body, '"%s"' % hashlib.md5(body.encode()).hexdigest()
+
+    # Rendered HTML depends on the active language
+    return get_or_compute(f'dashboard:widget:{name}:{get_language()}', compute, widget.ttl)
@@ -1,4 +1,5 @@
 import os
+import sys
 from pathlib import Path
 from django.utils.translation import gettext_lazy as _
 # Add these imports at the top of your settings.py
@@ -137,11 +138,78 @@ if os.environ.get('USE_SQLITE', 'False').lower() == 'true':
         }
     }
 
-# Cache settings - use local memory cache for now to simplify things
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Cache settings - Redis is shared by every worker process. Local memory is
+# only used when no Redis host is configured and when running the test suite.
+REDIS_HOST = os.environ.get('REDIS_HOST', '')
+# The test suite: `manage.py test`, pytest, or any runner with DJANGO_TESTING=true
+TESTING = (
+    os.environ.get('DJANGO_TESTING', 'False').lower() == 'true'
+    or sys.argv[1:2] == ['test']
+    or 'pytest' in sys.modules
+    or os.path.basename(sys.argv[0]).startswith('pytest')
+)
+
+if REDIS_HOST and not TESTING:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': f"redis://{REDIS_HOST}:{os.environ.get('REDIS_PORT', '6379')}/{os.environ.get('REDIS_CACHE_DB', '1')}",
+            'KEY_PREFIX': 'helpdesk',
+            'TIMEOUT': 300,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                'PASSWORD': read_secret('REDIS_PASSWORD', '') or None,
+                'SOCKET_CONNECT_TIMEOUT': 2,
+                'SOCKET_TIMEOUT': 2,
+                # A Redis outage degrades to cache misses instead of errors
+                'IGNORE_EXCEPTIONS': True,
+            },
+        }
     }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Celery - background jobs on Redis. Without Redis, and in the test suite,
+# tasks run in the calling process.
+_redis_password = read_secret('REDIS_PASSWORD', '')
+CELERY_BROKER_URL = (
+    f"redis://{':' + _redis_password + '@' if _redis_password else ''}{REDIS_HOST or 'localhost'}"
+    f":{os.environ.get('REDIS_PORT', '6379')}/{os.environ.get('REDIS_CELERY_DB', '2')}"
+)
+CELERY_TASK_ALWAYS_EAGER = not REDIS_HOST or TESTING
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TIMEZONE = 'UTC'
+CELERY_BEAT_SCHEDULE = {
+    # Previews whose task was lost (worker restart, broker outage)
+    'queue-pending-previews': {
+        'task': 'core.tasks.queue_pending_previews',
+        'schedule': 15 * 60,
+    },
+    # Repairs the drift of the workload index (tickets.workload)
+    'reconcile-agent-workloads': {
+        'task': 'tickets.tasks.reconcile_agent_workloads',
+        'schedule': 60 * 60,
+    },
+    # Rebuilds the days of the statistics rollup changed since the last run (tickets.stats)
+    'refresh-ticket-stats': {
+        'task': 'tickets.tasks.refresh_ticket_stats',
+        'schedule': 5 * 60,
+    },
+    # Flags the tickets past their SLA deadlines (tickets.sla)
+    'check-sla-breaches': {
+        'task': 'tickets.tasks.check_sla_breaches',
+        'schedule': 5 * 60,
+    },
+    'purge-unused-blobs': {
+        'task': 'core.tasks.purge_blobs',
+        'schedule': 24 * 60 * 60,
+    },
 }
 
 # Password validation
@@ -190,6 +258,22 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Media downloads are checked by Django and sent by nginx from its internal
+# location (X-Accel-Redirect); without nginx Django sends the files itself
+MEDIA_ACCEL_REDIRECT = os.environ.get('MEDIA_ACCEL_REDIRECT', 'False').lower() == 'true'
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+MEDIA_MAX_AGE = 3600
+
+# Attachment thumbnails and previews (core.previews), longest side in pixels
+PREVIEW_THUMBNAIL_SIZE = 320
+PREVIEW_SIZE = 1280
+
+# Uploads are hashed while they stream in, for the deduplicated attachment store (core.blobs)
+FILE_UPLOAD_HANDLERS = [
+    'core.blobs.HashingMemoryFileUploadHandler',
+    'core.blobs.HashingTemporaryFileUploadHandler',
+]
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -317,4 +401,26 @@ EMAIL_USE_TLS = read_secret('EMAIL_USE_TLS', 'True').lower() == 'true'
 EMAIL_HOST_USER = read_secret('EMAIL_USER', 'cfc_cloud@creditfoncier.cm')
 EMAIL_HOST_PASSWORD = read_secret('EMAIL_PASSWORD', '')
 DEFAULT_FROM_EMAIL = read_secret('DEFAULT_FROM_EMAIL', 'cfc_cloud@creditfoncier.cm')
-SITE_URL = read_secret('SITE_URL', 'http://192.168.6.38')
\ No newline at end of file
+SITE_URL = read_secret('SITE_URL', 'http://192.168.6.38')
+
+# Ticket list pagination
+TICKET_LIST_PAGE_SIZE = 25
+TICKET_LIST_MAX_PAGE_SIZE = 100
+# Show the number of matching tickets, counted exactly up to the limit and estimated above it
+TICKET_LIST_SHOW_TOTAL = True
+TICKET_LIST_EXACT_COUNT_LIMIT = 1000
+
+# Bulk ticket actions: tickets changed per batch, and seconds a batch may take
+TICKET_BULK_BATCH_SIZE = 200
+TICKET_BULK_BATCH_TIMEOUT = 10
+
+# Backlog assignment (tickets.assignment): unassigned new tickets matched per run
+TICKET_BACKLOG_ASSIGN_LIMIT = 1000
+# Agents tried by an automatic assignment when the chosen ones fill up concurrently
+TICKET_ASSIGN_ATTEMPTS = 5
+
+# Business calendar of the SLA policies keeping business hours only, in TIME_ZONE:
+# opening hours, weekdays (Monday is 0) and holidays (ISO dates)
+SLA_BUSINESS_HOURS = ('08:00', '17:00')
+SLA_BUSINESS_DAYS = (0, 1, 2, 3, 4)
+SLA_HOLIDAYS = ()
@@ -1,7 +1,6 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
 from django.http import JsonResponse, HttpResponse
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
@@ -11,6 +10,8 @@ from django.conf.urls.i18n import i18n_patterns
 from django.utils.translation import gettext_lazy as _
 from django.views.i18n import JavaScriptCatalog
 
+from core.views import protected_media
+
 schema_view = get_schema_view(
    openapi.Info(
       title="Helpdesk API",
@@ -30,6 +31,10 @@ def health_check(request):
 
 urlpatterns = [
     path('i18n/', include('django.conf.urls.i18n')),
+    # Versioned REST API, without a language prefix
+    path('api/v1/', include('tickets.api_urls')),
+    # Media files are permission checked, then sent by nginx (core.downloads)
+    re_path(rf'^{settings.MEDIA_URL.strip("/")}/(?P<path>.+)$', protected_media, name='protected-media'),
 ]
 
 urlpatterns += i18n_patterns(
@@ -45,7 +50,4 @@ urlpatterns += i18n_patterns(
     path('jsi18n/', JavaScriptCatalog.as_view(), name='javascript-catalog'),  
     path(_('comments/'), include('comments.urls', namespace='comments')),
     prefix_default_language=True, 
-)
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+)
\ No newline at end of file
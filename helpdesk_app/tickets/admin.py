@@ -58,12 +58,21 @@ class TicketAdmin(admin.ModelAdmin):
         ('Dates', {
             'fields': ('created_at', 'updated_at', 'due_date', 'resolved_at', 'closed_at')
         }),
+        ('SLA', {
+            'fields': ('sla', 'response_due_at', 'sla_paused_at', 'sla_paused_seconds', 'sla_breach')
+        }),
+        ('Activity', {
+            'fields': ('first_response_at', 'first_responder', 'last_activity_at', 'comment_count')
+        }),
         ('Additional Info', {
-            'fields': ('sla_breach', 'is_public')
+            'fields': ('is_public',)
         }),
     )
     
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = (
+        'created_at', 'updated_at', 'first_response_at', 'first_responder', 'last_activity_at', 'comment_count',
+        'sla', 'response_due_at', 'sla_paused_at', 'sla_paused_seconds',
+    )
     filter_horizontal = ('tags',)
 
 class SubCategoryInline(admin.TabularInline):
@@ -105,12 +114,16 @@ class TicketHistoryAdmin(admin.ModelAdmin):
 
 @admin.register(SLA)
 class SLAAdmin(admin.ModelAdmin):
-    list_display = ('name', 'response_time_critical', 'resolution_time_critical', 'business_hours_only')
+    list_display = ('name', 'category', 'department', 'priority', 'response_time_critical', 'resolution_time_critical', 'business_hours_only')
+    list_filter = ('priority', 'department', 'business_hours_only')
     search_fields = ('name', 'description')
     fieldsets = (
         (None, {
             'fields': ('name', 'description', 'business_hours_only')
         }),
+        ('Applies To', {
+            'fields': ('category', 'department', 'priority')
+        }),
         ('Response Times (hours)', {
             'fields': ('response_time_low', 'response_time_medium', 'response_time_high', 'response_time_critical')
         }),
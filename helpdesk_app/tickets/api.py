@@ -0,0 +1,236 @@
+"""
+Read-only REST API, mounted at /api/v1/.
+
+Lists are paginated by keyset cursor (core.pagination), the `fields`
+parameter selects the serialized fields and the related rows that are
+loaded, and every response carries an ETag (and a ticket its Last-Modified
+date) so that polling clients get a 304 when nothing changed.
+"""
+import hashlib
+
+from django.contrib.contenttypes.models import ContentType
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.utils.translation import get_language
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from comments.models import Comment
+from core.cache import namespace_version
+from core.pagination import InvalidCursor, paginate
+
+from .filters import apply_ticket_filters, can_see_all_tickets, get_filters, visible_tickets
+from .models import Category, Department, Ticket
+from .serializers import (
+    CategorySerializer,
+    CommentSerializer,
+    DepartmentSerializer,
+    TicketHistorySerializer,
+    TicketSerializer,
+)
+
+API_PAGE_SIZE = 25
+API_MAX_PAGE_SIZE = 100
+
+# Ticket fields -> related rows loaded for them
+SELECT_RELATED = {
+    'created_by': 'created_by',
+    'assigned_to': 'assigned_to',
+    'category': 'category',
+    'department': 'department',
+    'subdepartment': 'subdepartment',
+}
+PREFETCH_RELATED = {
+    'tags': 'tags',
+}
+
+
+def requested_fields(request, serializer_class):
+    """Field names of the `fields` parameter, or None for every field"""
+    value = request.query_params.get('fields')
+    if not value:
+        return None
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = set(fields) - set(serializer_class.Meta.fields)
+    if unknown:
+        raise ValidationError({'fields': f"Unknown fields: {', '.join(sorted(unknown))}"})
+    return fields
+
+
+class KeysetPagination:
+    """Pages of `page_size` rows in `ordering`, linked by `after`/`before` cursors"""
+
+    def __init__(self, ordering):
+        self.ordering = ordering
+
+    def paginate_queryset(self, queryset, request):
+        page_size = request.query_params.get('page_size', '')
+        page_size = min(int(page_size), API_MAX_PAGE_SIZE) if page_size.isdigit() and int(page_size) > 0 else API_PAGE_SIZE
+        try:
+            self.page = paginate(
+                queryset,
+                after_cursor=request.query_params.get('after'),
+                before_cursor=request.query_params.get('before'),
+                page_size=page_size,
+                ordering=self.ordering,
+            )
+        except InvalidCursor:
+            raise NotFound('Invalid cursor')
+        self.request = request
+        return self.page.items
+
+    def _link(self, param, cursor):
+        if not cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        for name in ('after', 'before'):
+            url = remove_query_param(url, name)
+        return replace_query_param(url, param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self._link('after', self.page.next_cursor),
+            'previous': self._link('before', self.page.previous_cursor),
+            'results': data,
+        })
+
+
+class ConditionalResponseMixin:
+    """Validators of API responses and the 304 short cut for conditional GETs"""
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = requested_fields(self.request, self.get_serializer_class())
+        return context
+
+    def _etag(self, *state):
+        request = self.request
+        raw = ':'.join(str(part) for part in (request.get_full_path(), request.user.pk, get_language(), *state))
+        return '"%s"' % hashlib.md5(raw.encode()).hexdigest()
+
+    def conditional_response(self, etag, last_modified, render):
+        """
+        Response of `render()`, or a 304 (without rendering anything) when
+        the client already has this version
+        """
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(self.request._request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = render()
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        # Clients may keep the response but must check it is still current
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def conditional_list(self, queryset, serializer_class, ordering):
+        """
+        One page of `queryset`, validated by the versions of the 'tickets'
+        and 'reference' cache namespaces: any ticket, comment or history
+        row written bumps the first, so a 304 costs no query. The filters,
+        fields and cursor are part of the URL the ETag is built from.
+        """
+        fields = requested_fields(self.request, serializer_class)
+        etag = self._etag(
+            namespace_version('tickets'), namespace_version('reference'), can_see_all_tickets(self.request.user)
+        )
+
+        def render():
+            paginator = KeysetPagination(ordering)
+            page = paginator.paginate_queryset(queryset, self.request)
+            serializer = serializer_class(page, many=True, context={'request': self.request, 'fields': fields})
+            return paginator.get_paginated_response(serializer.data)
+
+        return self.conditional_response(etag, None, render)
+
+
+class TicketViewSet(ConditionalResponseMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Tickets visible to the user, filtered with the parameters of the
+    ticket list (status, branch, priority, category, department,
+    subdepartment, q)
+    """
+    serializer_class = TicketSerializer
+
+    def get_queryset(self):
+        filters = get_filters(self.request.query_params)
+        tickets = apply_ticket_filters(visible_tickets(self.request.user), filters)
+        fields = requested_fields(self.request, TicketSerializer) or TicketSerializer.Meta.fields
+
+        # Only load the related rows of the requested fields
+        tickets = tickets.select_related(*[SELECT_RELATED[name] for name in fields if name in SELECT_RELATED])
+        tickets = tickets.prefetch_related(*[PREFETCH_RELATED[name] for name in fields if name in PREFETCH_RELATED])
+        deferred = ['search_vector']
+        if 'description' not in fields:
+            deferred.append('description')
+        return tickets.defer(*deferred)
+
+    def get_ordering(self):
+        # Search results are listed by relevance, like the ticket list
+        return ('-rank', '-id') if self.request.query_params.get('q') else ('-created_at', '-id')
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_list(self.get_queryset(), TicketSerializer, self.get_ordering())
+
+    def retrieve(self, request, *args, **kwargs):
+        ticket = self.get_object()
+        etag = self._etag(ticket.pk, ticket.updated_at.isoformat())
+        return self.conditional_response(etag, ticket.updated_at, lambda: Response(self.get_serializer(ticket).data))
+
+    def _ticket(self):
+        """The ticket of a nested list, if the user may see it"""
+        try:
+            return visible_tickets(self.request.user).only('pk').get(pk=self.kwargs['pk'])
+        except (Ticket.DoesNotExist, ValueError):
+            raise NotFound()
+
+    @action(detail=True)
+    def comments(self, request, pk=None):
+        ticket = self._ticket()
+        comments = Comment.objects.filter(
+            content_type=ContentType.objects.get_for_model(Ticket),
+            object_id=ticket.pk,
+        ).select_related('author')
+        # Internal notes are for staff only
+        if not can_see_all_tickets(request.user):
+            comments = comments.filter(is_internal=False)
+        return self.conditional_list(comments, CommentSerializer, ('created_at', 'id'))
+
+    @action(detail=True)
+    def history(self, request, pk=None):
+        ticket = self._ticket()
+        history = ticket.history.select_related('user')
+        return self.conditional_list(history, TicketHistorySerializer, ('-timestamp', '-id'))
+
+
+class ReferenceViewSet(ConditionalResponseMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Small reference tables, not paginated. Validated by the version of the
+    'reference' cache namespace, bumped whenever reference data changes.
+    """
+    pagination_class = None
+
+    def list(self, request, *args, **kwargs):
+        etag = self._etag(namespace_version('reference'))
+        return self.conditional_response(
+            etag, None, lambda: Response(self.get_serializer(self.get_queryset(), many=True).data)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag = self._etag(namespace_version('reference'))
+        return self.conditional_response(etag, None, lambda: Response(self.get_serializer(instance).data))
+
+
+class CategoryViewSet(ReferenceViewSet):
+    queryset = Category.objects.all()
+    serializer_class = CategorySerializer
+
+
+class DepartmentViewSet(ReferenceViewSet):
+    queryset = Department.objects.prefetch_related('subdepartments')
+    serializer_class = DepartmentSerializer
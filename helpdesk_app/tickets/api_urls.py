@@ -0,0 +1,11 @@
+from rest_framework.routers import DefaultRouter
+
+from . import api
+
+app_name = 'api-v1'
+router = DefaultRouter()
+router.register('tickets', api.TicketViewSet, basename='ticket')
+router.register('categories', api.CategoryViewSet, basename='category')
+router.register('departments', api.DepartmentViewSet, basename='department')
+
+urlpatterns = router.urls
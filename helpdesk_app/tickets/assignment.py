@@ -0,0 +1,454 @@
+"""
+Batch assignment of the ticket backlog.
+
+The unassigned NEW tickets are matched to the available agents at once, as
+a minimum-cost flow: source -> ticket class -> agent -> sink. Tickets of
+the same category and priority cost the same to every agent, so they are
+grouped in classes rather than matched one by one. Costs are integers:
+
+- a source -> class arc has one unit per ticket of the class, oldest
+  first, each carrying minus the reward of assigning that ticket
+  (priority, then waiting time), so that when capacity runs out the most
+  urgent tickets are the ones assigned;
+- a class -> agent arc costs nothing for an expert of the category, a
+  little more per level for an expert of a parent category, weighted by
+  priority; only these experts get a direct arc. Every other agent is
+  reached through a single fallback node shared by all the classes, at
+  the no-expertise cost of the class, so the network grows with the
+  expertise rather than with classes x agents;
+- an agent -> sink arc has one unit per free slot (max_tickets minus the
+  open tickets of the workload index), each unit costing more as the
+  agent fills up, so that the load is spread.
+
+Every cost stays below the smallest reward, so every ticket is assigned
+while some agent has room. The flow is solved by successive shortest paths
+with Dijkstra on reduced costs.
+
+Concurrent assignments cannot overload an agent. A single automatic
+assignment reserves the agent's slot with a conditional UPDATE of its
+workload row (tickets.workload.reserve_slot) and moves on to the next best
+agent when it was taken meanwhile. A backlog run locks the workload rows
+and the tickets it works on with SELECT ... FOR UPDATE SKIP LOCKED: rows
+held by another assignment are left out of this run instead of waited for.
+"""
+import heapq
+import random
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.db.models import Exists, F, OuterRef
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from accounts.models import AgentProfile, User
+from core.cache import bump
+from core.tree import ancestor_ids, tree_path
+
+from .bulk import apply_batch, send_bulk_notifications
+from .models import AgentWorkload, Category, Ticket
+from .workload import apply_workload, reserve_slot
+
+PRIORITY_REWARD = {
+    Ticket.Priority.LOW: 1000,
+    Ticket.Priority.MEDIUM: 2000,
+    Ticket.Priority.HIGH: 4000,
+    Ticket.Priority.CRITICAL: 8000,
+}
+PRIORITY_WEIGHT = {
+    Ticket.Priority.LOW: 1,
+    Ticket.Priority.MEDIUM: 2,
+    Ticket.Priority.HIGH: 3,
+    Ticket.Priority.CRITICAL: 4,
+}
+# Reward of each hour waited, up to AGE_REWARD_HOURS: less than a priority level
+AGE_REWARD = 10
+AGE_REWARD_HOURS = 72
+
+# Per level between the ticket category and the agent's expertise
+EXPERTISE_STEP_COST = 20
+NO_EXPERTISE_COST = 150
+# Cost of the last free slot of an agent, the first one costs nothing
+LOAD_COST = 300
+
+INFINITY = float('inf')
+
+
+class AssignmentConflict(Exception):
+    """The ticket is being assigned by another transaction"""
+
+
+def backlog_limit():
+    return getattr(settings, 'TICKET_BACKLOG_ASSIGN_LIMIT', 1000)
+
+
+def assign_attempts():
+    """Agents tried, or deadlocks retried, before an automatic assignment gives up"""
+    return getattr(settings, 'TICKET_ASSIGN_ATTEMPTS', 5)
+
+
+def find_available_agent(ticket, exclude=()):
+    """
+    Find the most suitable agent for a ticket, in a single query:
+    1. Availability status
+    2. Current workload (open tickets under max_tickets, read from the
+       workload index rather than counted, see tickets.workload)
+    3. Expertise (the ticket category or one of its parents) first, then
+       the lightest workload
+    Agents of `exclude` (ids) are skipped.
+    
+    Returns None if no suitable agent is found.
+    """
+    agents = User.objects.filter(
+        user_type=User.UserType.AGENT,
+        agent_profile__availability_status=True
+    ).exclude(
+        pk__in=list(exclude)
+    ).annotate(
+        # Agents without a workload row have no open ticket yet
+        open_tickets=Coalesce('workload__open_tickets', 0)
+    ).filter(
+        open_tickets__lt=F('agent_profile__max_tickets')
+    ).select_related('agent_profile')
+    
+    if ticket.category_id:
+        expertise = AgentProfile.expertise.through.objects.filter(
+            agentprofile_id=OuterRef('pk'),
+            category_id__in=ancestor_ids(Category, ticket.category_id)
+        )
+        return agents.annotate(is_expert=Exists(expertise)).order_by('-is_expert', 'open_tickets', 'pk').first()
+    return agents.order_by('open_tickets', 'pk').first()
+
+
+def auto_assign(ticket_id, user):
+    """
+    Assign the ticket to the most suitable agent with room, on behalf of
+    `user`, and return the agent; None when no agent has room.
+    The ticket is locked (SKIP LOCKED: AssignmentConflict when another
+    transaction holds it) and the agent's slot is reserved before the
+    ticket is saved. An agent filled up since it was chosen is skipped for
+    the next best one, and deadlocks or lock timeouts are retried after a
+    short random pause.
+    """
+    skipped = set()
+    for attempt in range(assign_attempts()):
+        try:
+            with transaction.atomic():
+                ticket = Ticket.objects.select_for_update(skip_locked=True).filter(pk=ticket_id).first()
+                if ticket is None:
+                    if Ticket.objects.filter(pk=ticket_id).exists():
+                        raise AssignmentConflict(ticket_id)
+                    raise Ticket.DoesNotExist(ticket_id)
+                agent = find_available_agent(ticket, exclude=skipped)
+                if agent is None:
+                    return None
+                reserved = reserve_slot(agent.pk, ticket.priority, agent.agent_profile.max_tickets)
+                if reserved:
+                    ticket.assign(agent)
+                    ticket.reserved_workload = reserved
+                    ticket.save(changed_by=user)
+                    # Not consumed when the save changed nothing (same agent, already open)
+                    leftover = ticket.__dict__.pop('reserved_workload', None)
+                    if leftover:
+                        apply_workload(Counter({leftover: -1}))
+                    return agent
+            skipped.add(agent.pk)
+        except OperationalError:
+            if attempt + 1 == assign_attempts():
+                raise
+            time.sleep(random.uniform(0.01, 0.05) * (attempt + 1))
+    return None
+
+
+def min_cost_flow(rewards, arcs, fallback, unit_costs):
+    """
+    Minimum-cost flow from the classes to the agents.
+
+    rewards[c]: non-increasing gains of assigning each ticket of class c;
+    fallback[c]: cost of giving one of them to any agent; arcs[c]: the
+    agents costing less, as {agent: cost}; unit_costs[a]: non-decreasing
+    cost of each free slot of agent a.
+    The fallback goes through a node shared by every class and linked to
+    every agent, so the network has an arc per class, per agent and per
+    cheaper (class, agent) pair instead of one per class and agent.
+    Returns {(c, a): number of tickets of class c given to agent a}.
+    """
+    classes, agents = len(rewards), len(unit_costs)
+    # Nodes: source, classes, shared, agents, sink
+    source, shared = 0, classes + 1
+    agent_node = classes + 2
+    sink = agent_node + agents
+
+    sent = [0] * classes
+    used = [0] * agents
+    flow = defaultdict(int)
+    flows_to = [set() for _ in range(agents)]
+    # Flow from each class into the shared node, and from it to each agent
+    to_shared = [0] * classes
+    from_shared = [0] * agents
+    into_shared = set()
+
+    # Initial potentials: shortest distances in the (acyclic) empty network
+    potential = [0] * (sink + 1)
+    for c in range(classes):
+        potential[1 + c] = -rewards[c][0]
+    potential[shared] = min(potential[1 + c] + fallback[c] for c in range(classes))
+    for a in range(agents):
+        potential[agent_node + a] = potential[shared]
+    for c in range(classes):
+        for a, cost in arcs[c].items():
+            potential[agent_node + a] = min(potential[agent_node + a], potential[1 + c] + cost)
+    potential[sink] = min(potential[agent_node + a] + unit_costs[a][0] for a in range(agents))
+
+    heappush, heappop = heapq.heappush, heapq.heappop
+    agent_range = range(agents)
+    while True:
+        distance = [INFINITY] * (sink + 1)
+        previous = [None] * (sink + 1)
+        settled = [False] * (sink + 1)
+        reached = []
+        distance[source] = 0
+        heap = [(0, source)]
+
+        def relax(target, reduced, node):
+            if reduced < distance[target]:
+                distance[target] = reduced
+                previous[target] = node
+                heappush(heap, (reduced, target))
+
+        while heap:
+            d, node = heappop(heap)
+            if settled[node]:
+                continue
+            # The sink is as close as anything left: no need to settle the ties
+            if d >= distance[sink]:
+                break
+            settled[node] = True
+            reached.append(node)
+            base = d + potential[node]
+            if node == source:
+                for c in range(classes):
+                    if sent[c] < len(rewards[c]):
+                        relax(1 + c, base - rewards[c][sent[c]] - potential[1 + c], node)
+            elif node < shared:
+                c = node - 1
+                for a, cost in arcs[c].items():
+                    relax(agent_node + a, base + cost - potential[agent_node + a], node)
+                relax(shared, base + fallback[c] - potential[shared], node)
+                if sent[c]:
+                    relax(source, base + rewards[c][sent[c] - 1] - potential[source], node)
+            elif node == shared:
+                for a in agent_range:
+                    relax(agent_node + a, base - potential[agent_node + a], node)
+                for c in into_shared:
+                    relax(1 + c, base - fallback[c] - potential[1 + c], node)
+            elif node < sink:
+                a = node - agent_node
+                for c in flows_to[a]:
+                    relax(1 + c, base - arcs[c][a] - potential[1 + c], node)
+                if from_shared[a]:
+                    relax(shared, base - potential[shared], node)
+                if used[a] < len(unit_costs[a]):
+                    relax(sink, base + unit_costs[a][used[a]] - potential[sink], node)
+            else:
+                for a in agent_range:
+                    if used[a]:
+                        relax(agent_node + a, base - unit_costs[a][used[a] - 1] - potential[agent_node + a], node)
+
+        # Stop when no slot is left or when assigning would not pay off
+        if distance[sink] == INFINITY or distance[sink] + potential[sink] - potential[source] >= 0:
+            break
+        # Every potential should grow by min(distance, limit): only the
+        # differences count, so the nodes settled closer than the sink
+        # move by the difference and the others stay
+        limit = distance[sink]
+        for node in reached:
+            potential[node] += distance[node] - limit
+
+        node = sink
+        while node != source:
+            before = previous[node]
+            if before == source:
+                sent[node - 1] += 1
+            elif node == source:
+                sent[before - 1] -= 1
+            elif node == sink:
+                used[before - agent_node] += 1
+            elif before == sink:
+                used[node - agent_node] -= 1
+            elif node == shared:
+                if before < shared:
+                    to_shared[before - 1] += 1
+                    into_shared.add(before - 1)
+                else:
+                    from_shared[before - agent_node] -= 1
+            elif before == shared:
+                if node < shared:
+                    to_shared[node - 1] -= 1
+                    if not to_shared[node - 1]:
+                        into_shared.discard(node - 1)
+                else:
+                    from_shared[node - agent_node] += 1
+            elif before < shared:
+                key = (before - 1, node - agent_node)
+                flow[key] += 1
+                flows_to[node - agent_node].add(before - 1)
+            else:
+                key = (node - 1, before - agent_node)
+                flow[key] -= 1
+                if not flow[key]:
+                    flows_to[before - agent_node].discard(node - 1)
+            node = before
+
+    # Any pairing of the flow through the shared node costs the same
+    senders = [[c, count] for c, count in enumerate(to_shared) if count]
+    for a, count in enumerate(from_shared):
+        while count:
+            sender = senders[-1]
+            moved = min(count, sender[1])
+            flow[sender[0], a] += moved
+            count -= moved
+            sender[1] -= moved
+            if not sender[1]:
+                senders.pop()
+    return {key: count for key, count in flow.items() if count}
+
+
+def ticket_reward(ticket, now):
+    """Gain of assigning `ticket`: its priority, then the hours it has waited"""
+    hours = int((now - ticket['created_at']).total_seconds() // 3600)
+    return PRIORITY_REWARD.get(ticket['priority'], 0) + AGE_REWARD * min(max(hours, 0), AGE_REWARD_HOURS)
+
+
+def expertise_cost(path, expertise):
+    """Cost of the agent with `expertise` for a ticket whose category path (root first) is `path`"""
+    if not path:
+        return 0
+    for distance, category_id in enumerate(reversed(path)):
+        if category_id in expertise:
+            return distance * EXPERTISE_STEP_COST
+    return NO_EXPERTISE_COST
+
+
+def slot_costs(open_tickets, max_tickets):
+    """Cost of each free slot of an agent, growing with the load it brings"""
+    return [LOAD_COST * load // max_tickets for load in range(open_tickets, max_tickets)]
+
+
+def plan_assignment(tickets, agents, now=None):
+    """
+    The assignments of `tickets` (dicts with pk, category_id, priority,
+    created_at) to `agents` (dicts with pk, open_tickets, max_tickets,
+    expertise: set of category ids), as {ticket pk: agent pk}
+    """
+    now = now or timezone.now()
+    agents = [agent for agent in agents if agent['open_tickets'] < agent['max_tickets']]
+    if not tickets or not agents:
+        return {}
+
+    members = defaultdict(list)
+    for ticket in sorted(tickets, key=lambda ticket: (ticket['created_at'], ticket['pk'])):
+        members[ticket['category_id'], ticket['priority']].append(ticket)
+    classes = list(members)
+
+    paths = {}
+    for category_id, _ in classes:
+        if category_id not in paths:
+            paths[category_id] = [node['id'] for node in tree_path(Category, category_id)] if category_id else []
+
+    rewards = [
+        [ticket_reward(ticket, now) for ticket in members[key]]
+        for key in classes
+    ]
+    # Only the experts of a class cost less than the fallback of every other agent
+    experts = defaultdict(set)
+    for a, agent in enumerate(agents):
+        for category_id in agent['expertise']:
+            experts[category_id].add(a)
+    fallback, arcs = [], []
+    for category_id, priority in classes:
+        weight = PRIORITY_WEIGHT.get(priority, 1)
+        path = paths[category_id]
+        fallback.append((NO_EXPERTISE_COST if path else 0) * weight)
+        costs = {a: expertise_cost(path, agents[a]['expertise']) * weight for c in path for a in experts[c]}
+        arcs.append({a: cost for a, cost in costs.items() if cost < fallback[-1]})
+    unit_costs = [slot_costs(agent['open_tickets'], agent['max_tickets']) for agent in agents]
+
+    plan = {}
+    given = defaultdict(list)
+    for (c, a), count in sorted(min_cost_flow(rewards, arcs, fallback, unit_costs).items()):
+        given[c] += [agents[a]['pk']] * count
+    for c, agent_ids in given.items():
+        # The oldest tickets of the class come first
+        plan.update((ticket['pk'], agent_id) for ticket, agent_id in zip(members[classes[c]], agent_ids))
+    return plan
+
+
+def backlog_tickets(limit=None):
+    """
+    The unassigned NEW tickets, oldest first, locked; tickets locked by
+    another transaction are skipped
+    """
+    return list(
+        Ticket.objects.select_for_update(skip_locked=True)
+        .filter(status=Ticket.Status.NEW, assigned_to__isnull=True)
+        .order_by('created_at', 'pk')
+        .values('pk', 'category_id', 'priority', 'created_at')[:limit or backlog_limit()]
+    )
+
+
+def available_agents():
+    """
+    The available agents with their workload and expertise. Their workload
+    rows are locked; agents whose row another transaction holds are skipped.
+    """
+    agents = list(
+        User.objects.filter(user_type=User.UserType.AGENT, agent_profile__availability_status=True)
+        .annotate(max_tickets=F('agent_profile__max_tickets'))
+        .order_by('pk')
+        .values('pk', 'max_tickets')
+    )
+    AgentWorkload.objects.bulk_create([AgentWorkload(agent_id=agent['pk']) for agent in agents], ignore_conflicts=True)
+    workloads = dict(
+        AgentWorkload.objects.select_for_update(skip_locked=True)
+        .filter(agent_id__in=[agent['pk'] for agent in agents])
+        .order_by('agent_id')
+        .values_list('agent_id', 'open_tickets')
+    )
+    agents = [agent for agent in agents if agent['pk'] in workloads]
+
+    expertise = defaultdict(set)
+    links = AgentProfile.expertise.through.objects.filter(agentprofile_id__in=list(workloads))
+    for agent_id, category_id in links.values_list('agentprofile_id', 'category_id'):
+        expertise[agent_id].add(category_id)
+    for agent in agents:
+        agent['open_tickets'] = workloads[agent['pk']]
+        agent['expertise'] = expertise[agent['pk']]
+    return agents
+
+
+def assign_backlog(user, limit=None, dry_run=False):
+    """
+    Assign the backlog of unassigned NEW tickets on behalf of `user`, in
+    one transaction. Returns the plan ({ticket pk: agent pk}); with
+    `dry_run` nothing is changed.
+    """
+    with transaction.atomic():
+        # Both skip the rows other assignments hold: this run never waits for them
+        agents = available_agents()
+        plan = plan_assignment(backlog_tickets(limit), agents)
+        if dry_run or not plan:
+            return plan
+
+        now = timezone.now()
+        notifications = []
+        per_agent = defaultdict(list)
+        for pk, agent_id in plan.items():
+            per_agent[agent_id].append(pk)
+        agents = User.objects.in_bulk(list(per_agent))
+        for agent_id, ticket_ids in sorted(per_agent.items()):
+            apply_batch(sorted(ticket_ids), 'assign', agents[agent_id], user, now, notifications)
+        bump('tickets')
+        transaction.on_commit(lambda: send_bulk_notifications(notifications))
+    return plan
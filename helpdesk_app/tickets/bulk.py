@@ -0,0 +1,266 @@
+"""
+Bulk actions on a selection of tickets.
+
+Tickets are changed batch by batch with set-based writes (bulk_update for
+the tickets, bulk_create for their history and activity events) inside a
+single transaction, so an action either applies to every ticket or to
+none. Saves do not go through Ticket.save(), so the SLA deadlines are
+updated and the work of the post_save receivers (statistics, workloads,
+search index, cache, activity) is done here once per batch, and each
+recipient gets one email for the whole action instead of one per ticket.
+"""
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from accounts.models import User
+from core.cache import bump
+
+from .history import write_history
+from .models import Tag, Ticket, TicketHistory
+from .search import index_tickets
+from .sla import SLA_FIELDS, update_deadlines
+from .stats import mark_dirty
+from .workload import apply_workload, ticket_slots, workload_delta
+
+BULK_ACTIONS = ('assign', 'status', 'priority', 'tag')
+
+
+class BulkActionError(Exception):
+    """The action cannot be applied; nothing was changed"""
+
+
+def batch_size():
+    return getattr(settings, 'TICKET_BULK_BATCH_SIZE', 200)
+
+
+def batch_timeout():
+    """Seconds a single batch may take before the whole action is rolled back"""
+    return getattr(settings, 'TICKET_BULK_BATCH_TIMEOUT', 10)
+
+
+def _limit_statement_time(seconds):
+    """Make PostgreSQL cancel any statement of the current transaction running longer than `seconds`"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT set_config('statement_timeout', %s, true)", [f'{int(seconds * 1000)}ms'])
+
+
+def resolve_value(action, value):
+    """
+    The new value of a bulk action from the submitted one: an agent (or
+    None to unassign), a status, a priority or a Tag.
+    Raises BulkActionError for an unknown action or value.
+    """
+    if action == 'assign':
+        if not value:
+            return None
+        try:
+            return User.objects.get(pk=value, user_type=User.UserType.AGENT)
+        except (User.DoesNotExist, ValueError):
+            raise BulkActionError(_('Selected agent does not exist.'))
+    if action == 'status':
+        if value not in dict(Ticket.Status.choices):
+            raise BulkActionError(_('Invalid status selected.'))
+        return value
+    if action == 'priority':
+        if value not in dict(Ticket.Priority.choices):
+            raise BulkActionError(_('Invalid priority selected.'))
+        return value
+    if action == 'tag':
+        try:
+            return Tag.objects.get(pk=value)
+        except (Tag.DoesNotExist, ValueError):
+            raise BulkActionError(_('Selected tag does not exist.'))
+    raise BulkActionError(_('Unknown bulk action.'))
+
+
+def _change_assignee(ticket, agent, now):
+    """Field changes as (field, old display value, new display value)"""
+    if ticket.assigned_to_id == (agent.pk if agent else None):
+        return []
+    changes = [('assigned_to', str(ticket.assigned_to) if ticket.assigned_to else 'Unassigned',
+                str(agent) if agent else 'Unassigned')]
+    ticket.assigned_to = agent
+    # New tickets are opened when assigned, like a single assignment
+    if agent and ticket.status == Ticket.Status.NEW:
+        changes += _change_status(ticket, Ticket.Status.OPEN, now)
+    return changes
+
+
+def _change_status(ticket, status, now):
+    if ticket.status == status:
+        return []
+    changes = [('status', ticket.get_status_display(), dict(Ticket.Status.choices)[status])]
+    ticket.set_status(status, now)
+    return changes
+
+
+def _change_priority(ticket, priority, now):
+    if ticket.priority == priority:
+        return []
+    changes = [('priority', ticket.get_priority_display(), dict(Ticket.Priority.choices)[priority])]
+    ticket.priority = priority
+    return changes
+
+
+# updated_at is set explicitly, bulk_update does not apply auto_now
+UPDATED_FIELDS = {
+    'assign': ['assigned_to', 'status', 'updated_at'],
+    'status': ['status', 'resolved_at', 'closed_at', 'updated_at'],
+    'priority': ['priority', 'updated_at'],
+}
+
+
+def apply_batch(ticket_ids, action, value, user, now, notifications):
+    """
+    Apply `action` with an already resolved `value` (see resolve_value) to
+    the tickets `ticket_ids` on behalf of `user`, stamped `now`; returns the
+    number of tickets that changed.
+
+    Must run inside the caller's transaction: the tickets are locked with
+    SELECT ... FOR UPDATE, and their history, deadlines, workloads,
+    statistics days and search index are written with them. The changes
+    to notify are appended to `notifications`. The caller bumps the
+    'tickets' cache namespace and sends the notifications on commit
+    (send_bulk_notifications), and sets any statement timeout.
+    """
+    tickets = list(
+        Ticket.objects.filter(pk__in=ticket_ids)
+        .select_related('created_by', 'assigned_to')
+        .select_for_update(of=('self',))
+        .order_by('pk')
+    )
+
+    history = []
+    changed = []
+    dirty_dates = set()
+    if action == 'tag':
+        tagged = set(
+            Ticket.tags.through.objects.filter(ticket_id__in=ticket_ids, tag=value)
+            .values_list('ticket_id', flat=True)
+        )
+        changed = [ticket for ticket in tickets if ticket.pk not in tagged]
+        Ticket.tags.through.objects.bulk_create(
+            [Ticket.tags.through(ticket_id=ticket.pk, tag_id=value.pk) for ticket in changed],
+            ignore_conflicts=True,
+        )
+        Ticket.objects.filter(pk__in=[ticket.pk for ticket in changed]).update(updated_at=now)
+        history = [
+            TicketHistory(ticket=ticket, user=user, field_changed='tags', new_value=value.name)
+            for ticket in changed
+        ]
+    else:
+        change = {'assign': _change_assignee, 'status': _change_status, 'priority': _change_priority}[action]
+        workload = Counter()
+        for ticket in tickets:
+            loaded_dates = ticket.report_dates()
+            changes = change(ticket, value, now)
+            if not changes:
+                continue
+            update_deadlines(ticket, now)
+            ticket.updated_at = now
+            changed.append(ticket)
+            dirty_dates |= loaded_dates | ticket.report_dates()
+            workload.update(workload_delta(*ticket_slots(ticket)))
+            history += [
+                TicketHistory(ticket=ticket, user=user, field_changed=field, old_value=old, new_value=new)
+                for field, old, new in changes
+            ]
+            for field, old, new in changes:
+                notifications.append((field, ticket, old, new))
+        Ticket.objects.bulk_update(changed, [*UPDATED_FIELDS[action], *SLA_FIELDS])
+        # bulk_update skips the post_save receiver keeping the workloads
+        apply_workload(workload)
+
+    write_history(history)
+    # Status and priority are dimensions of the daily statistics
+    mark_dirty(dirty_dates)
+    if action == 'tag':
+        # Tag names are part of the search document
+        index_tickets(ticket.pk for ticket in changed)
+    return len(changed)
+
+
+def apply_bulk_action(tickets, action, value, user):
+    """
+    Apply `action` ('assign', 'status', 'priority' or 'tag') with the
+    submitted `value` to every ticket of the `tickets` queryset, on behalf
+    of `user`. Returns the number of tickets that changed.
+    Raises BulkActionError if the value is invalid or a batch takes longer
+    than the configured timeout; in both cases nothing is changed.
+    """
+    value = resolve_value(action, value)
+    ticket_ids = list(tickets.order_by('pk').values_list('pk', flat=True))
+    size = batch_size()
+    timeout = batch_timeout()
+    now = timezone.now()
+    notifications = []
+    count = 0
+
+    too_long = _('The action took too long and was cancelled, please select fewer tickets.')
+
+    try:
+        with transaction.atomic():
+            _limit_statement_time(timeout)
+            for start in range(0, len(ticket_ids), size):
+                started = time.monotonic()
+                count += apply_batch(ticket_ids[start:start + size], action, value, user, now, notifications)
+                if time.monotonic() - started > timeout:
+                    raise BulkActionError(too_long)
+
+            if count:
+                bump('tickets')
+                transaction.on_commit(lambda: send_bulk_notifications(notifications))
+    except OperationalError as error:
+        # Statement cancelled by the statement timeout
+        raise BulkActionError(too_long) from error
+    return count
+
+
+def send_bulk_notifications(notifications):
+    """
+    One email per recipient for all the tickets of a bulk action that
+    concern them: assigned agents, and requesters whose tickets changed status
+    """
+    # Imported here, the signals module imports the models of several apps
+    from .signals import send_notification_email
+
+    site_domain = settings.SITE_URL if hasattr(settings, 'SITE_URL') else "http://localhost:8000"
+    assigned = {}
+    status_changes = {}
+    for field, ticket, old, new in notifications:
+        item = {
+            'ticket': ticket,
+            'old_value': old,
+            'new_value': new,
+            'url': f"{site_domain}{reverse('tickets:ticket-detail', kwargs={'pk': ticket.pk})}",
+        }
+        if field == 'assigned_to' and ticket.assigned_to and ticket.assigned_to.email:
+            assigned.setdefault(ticket.assigned_to.email, []).append(item)
+        elif field == 'status' and ticket.created_by and ticket.created_by.email:
+            status_changes.setdefault(ticket.created_by.email, []).append(item)
+
+    for email, items in assigned.items():
+        send_notification_email(
+            subject=f"[CFC Helpdesk] {_('Tickets Assigned to You')} ({len(items)})",
+            template_name='tickets_bulk_assigned',
+            context={'items': items},
+            recipient_list=[email],
+            email_type='ticket_assigned',
+            related_object_type='ticket'
+        )
+    for email, items in status_changes.items():
+        send_notification_email(
+            subject=f"[CFC Helpdesk] {_('Ticket Status Updated')} ({len(items)})",
+            template_name='tickets_bulk_status_update',
+            context={'items': items},
+            recipient_list=[email],
+            email_type='status_change',
+            related_object_type='ticket'
+        )
@@ -0,0 +1,218 @@
+"""
+Streaming exports of ticket lists.
+
+Rows are read with values() over a chunked iterator (a server-side cursor
+on PostgreSQL) and written to the response as they come, so an export
+uses the same memory for a hundred rows as for millions and the first
+bytes are sent before the query has finished.
+"""
+import csv
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from .models import Ticket
+
+# Rows fetched from the database at a time
+EXPORT_CHUNK_SIZE = 2000
+
+# Bytes buffered before a piece of an XLSX file is sent
+XLSX_FLUSH_SIZE = 64 * 1024
+
+# Columns as (header, values() field); users are exported by name and email
+EXPORT_COLUMNS = [
+    (_('ID'), 'id'),
+    (_('Title'), 'title'),
+    (_('Status'), 'status'),
+    (_('Priority'), 'priority'),
+    (_('Branch'), 'branch'),
+    (_('Category'), 'category__name'),
+    (_('Department'), 'department__name'),
+    (_('Sub-department'), 'subdepartment__name'),
+    (_('Created by'), 'created_by'),
+    (_('Assigned to'), 'assigned_to'),
+    (_('Created'), 'created_at'),
+    (_('Due date'), 'due_date'),
+    (_('Resolved'), 'resolved_at'),
+    (_('Closed'), 'closed_at'),
+]
+
+USER_FIELDS = ('first_name', 'last_name', 'email')
+
+# Leading characters that make a spreadsheet read a CSV cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+# Characters that are not allowed in XML documents
+INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _query_fields():
+    fields = []
+    for header, field in EXPORT_COLUMNS:
+        if field in ('created_by', 'assigned_to'):
+            fields += [f'{field}__{name}' for name in USER_FIELDS]
+        else:
+            fields.append(field)
+    return fields
+
+
+def _user_display(row, prefix):
+    name = f"{row[f'{prefix}__first_name'] or ''} {row[f'{prefix}__last_name'] or ''}".strip()
+    email = row[f'{prefix}__email'] or ''
+    if name and email:
+        return f'{name} <{email}>'
+    return name or email
+
+
+def export_headers():
+    return [str(header) for header, field in EXPORT_COLUMNS]
+
+
+def export_rows(tickets, ordering=('-created_at', '-id')):
+    """Values of every exported ticket, one list per ticket in the order of EXPORT_COLUMNS"""
+    statuses = dict(Ticket.Status.choices)
+    priorities = dict(Ticket.Priority.choices)
+    branches = dict(Ticket.Branch.choices)
+    rows = tickets.order_by(*ordering).values(*_query_fields())
+
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        values = []
+        for header, field in EXPORT_COLUMNS:
+            if field in ('created_by', 'assigned_to'):
+                value = _user_display(row, field)
+            else:
+                value = row[field]
+            if field == 'status':
+                value = statuses.get(value, value)
+            elif field == 'priority':
+                value = priorities.get(value, value)
+            elif field == 'branch':
+                value = branches.get(value, value)
+            elif value is not None and field.endswith(('_at', '_date')):
+                value = timezone.localtime(value).strftime('%Y-%m-%d %H:%M')
+            values.append('' if value is None else value)
+        yield values
+
+
+class Echo:
+    """File-like object that returns what is written, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def csv_cell(value):
+    """`value` for a CSV cell: text typed by users must not run as a formula when the file is opened"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(rows):
+    """CSV document of `rows` as a generator of strings, starting with the header row"""
+    writer = csv.writer(Echo())
+    # Byte order mark so spreadsheet applications read the file as UTF-8
+    yield '\ufeff' + writer.writerow(export_headers())
+    for row in rows:
+        yield writer.writerow([csv_cell(value) for value in row])
+
+
+class ZipStream:
+    """
+    Unseekable file-like object collecting what zipfile writes, so that an
+    archive can be sent piece by piece (entries then use data descriptors)
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, data):
+        self.buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+
+XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Tickets" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+def _xlsx_row(values):
+    cells = []
+    for value in values:
+        if isinstance(value, int):
+            cells.append(f'<c t="n"><v>{value}</v></c>')
+        else:
+            # Inline strings, so no shared string table has to be built up front
+            text = escape(INVALID_XML_CHARS.sub('', str(value)))
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return f"<row>{''.join(cells)}</row>"
+
+
+def stream_xlsx(rows):
+    """XLSX workbook of `rows` with a single sheet, as a generator of bytes"""
+    stream = ZipStream()
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', XLSX_CONTENT_TYPES)
+        archive.writestr('_rels/.rels', XLSX_ROOT_RELS)
+        archive.writestr('xl/workbook.xml', XLSX_WORKBOOK)
+        archive.writestr('xl/_rels/workbook.xml.rels', XLSX_WORKBOOK_RELS)
+
+        # The size of the sheet is unknown until the end, allow it to pass 4 GB
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row(export_headers()).encode())
+            yield stream.take()
+            for row in rows:
+                sheet.write(_xlsx_row(row).encode())
+                if len(stream.buffer) >= XLSX_FLUSH_SIZE:
+                    yield stream.take()
+            sheet.write(b'</sheetData></worksheet>')
+    yield stream.take()
@@ -0,0 +1,143 @@
+"""
+Ticket list facet counts.
+
+For every filter of the ticket list, the number of tickets matching each
+option given the other active filters (a filter does not restrict its own
+counts, so every option keeps a meaningful number). PostgreSQL computes all
+facets with one GROUPING SETS query; other databases use one grouped query
+per facet. A category also selects and counts the tickets of its
+subcategories, using the cached category tree. Results are cached per
+normalized filter signature in the 'tickets' cache namespace, which is
+bumped whenever tickets change, and per version of the category tree.
+"""
+import hashlib
+import json
+
+from django.db import connection
+from django.db.models import Count
+
+from core.cache import get_or_compute, make_key, namespace_version
+from core.tree import roll_up, tree_descendants
+
+from .filters import can_see_all_tickets, visible_tickets
+from .models import Category
+from .search import search_tickets
+
+# Facet name -> ticket column
+FACETS = {
+    'status': 'status',
+    'branch': 'branch',
+    'priority': 'priority',
+    'category': 'category_id',
+    'department': 'department_id',
+    'subdepartment': 'subdepartment_id',
+}
+
+ID_FACETS = ('category', 'department', 'subdepartment')
+
+FACET_CACHE_TIMEOUT = 300
+
+
+def selected_values(filters):
+    """Accepted values of each active facet, from the values returned by get_filters"""
+    selected = {}
+    for name in FACETS:
+        value = filters.get(name)
+        if value:
+            selected[name] = [int(value)] if name in ID_FACETS else [value]
+    return selected
+
+
+def facet_signature(user, filters):
+    """Stable cache key part for the user's scope and the active filters"""
+    scope = 'all' if can_see_all_tickets(user) else f'customer:{user.pk}'
+    query = ' '.join((filters.get('q') or '').lower().split())
+    normalized = [scope, sorted(selected_values(filters).items()), query]
+    return hashlib.md5(json.dumps(normalized).encode()).hexdigest()
+
+
+def get_facet_counts(user, filters):
+    """
+    Counts per facet and option, e.g. {'status': {'new': 4, 'open': 2}, ...}.
+    Options without tickets are missing.
+    """
+    def compute():
+        tickets = visible_tickets(user)
+        if filters.get('q'):
+            tickets = search_tickets(tickets, filters['q'])
+        return compute_facet_counts(tickets, selected_values(filters))
+
+    key = make_key('tickets', 'facets', namespace_version('reference'), facet_signature(user, filters))
+    return get_or_compute(key, compute, FACET_CACHE_TIMEOUT)
+
+
+def compute_facet_counts(tickets, selected):
+    if 'category' in selected:
+        selected = dict(selected, category=sorted(
+            {pk for value in selected['category'] for pk in tree_descendants(Category, value)}
+        ))
+    if connection.vendor == 'postgresql':
+        counts = _grouping_sets_counts(tickets, selected)
+    else:
+        counts = _grouped_counts(tickets, selected)
+    # A category counts the tickets of its subcategories too
+    counts['category'] = roll_up(Category, counts['category'])
+    return counts
+
+
+def _grouped_counts(tickets, selected):
+    """One grouped query per facet"""
+    counts = {}
+    for name, column in FACETS.items():
+        others = {
+            f'{FACETS[other]}__in': values
+            for other, values in selected.items()
+            if other != name
+        }
+        rows = tickets.filter(**others).order_by().values(column).annotate(count=Count('id'))
+        counts[name] = {row[column]: row['count'] for row in rows if row[column] is not None}
+    return counts
+
+
+def _grouping_sets_counts(tickets, selected):
+    """
+    All facets in one query: one grouping set per facet, each counted with
+    a FILTER made of the other facets' conditions
+    """
+    columns = list(FACETS.values())
+    subquery, subquery_params = tickets.order_by().values('id', *columns).query.sql_with_params()
+    quote = connection.ops.quote_name
+
+    select = [quote(column) for column in columns]
+    select += [f'GROUPING({quote(column)})' for column in columns]
+    params = []
+    for name in FACETS:
+        conditions = []
+        for other, values in selected.items():
+            if other == name:
+                continue
+            placeholders = ', '.join(['%s'] * len(values))
+            conditions.append(f'{quote(FACETS[other])} IN ({placeholders})')
+            params.extend(values)
+        if conditions:
+            select.append(f"COUNT(*) FILTER (WHERE {' AND '.join(conditions)})")
+        else:
+            select.append('COUNT(*)')
+
+    grouping_sets = ', '.join(f'({quote(column)})' for column in columns)
+    sql = (
+        f"SELECT {', '.join(select)} FROM ({subquery}) AS facet_tickets "
+        f"GROUP BY GROUPING SETS ({grouping_sets})"
+    )
+
+    counts = {name: {} for name in FACETS}
+    size = len(columns)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + list(subquery_params))
+        for row in cursor.fetchall():
+            values, grouping, facet_counts = row[:size], row[size:2 * size], row[2 * size:]
+            for i, name in enumerate(FACETS):
+                # GROUPING() is 0 for the column grouped by this row's set
+                if grouping[i] == 0 and values[i] is not None and facet_counts[i]:
+                    counts[name][values[i]] = facet_counts[i]
+    return counts
@@ -0,0 +1,56 @@
+"""
+Ticket list filters shared by the list view and the views that act on
+the same selection of tickets.
+"""
+from core.tree import descendant_ids
+
+from .models import Category, Ticket
+from .search import search_tickets
+
+# Query parameters understood by apply_ticket_filters
+FILTER_PARAMS = ('status', 'branch', 'priority', 'category', 'department', 'subdepartment', 'q')
+
+
+def can_see_all_tickets(user):
+    return user.is_staff or hasattr(user, 'agent_profile')
+
+
+def visible_tickets(user):
+    """Tickets `user` may see: customers only see their own tickets"""
+    tickets = Ticket.objects.all()
+    if not can_see_all_tickets(user):
+        tickets = tickets.filter(created_by=user)
+    return tickets
+
+
+def get_filters(params):
+    """Normalized filter values from request parameters (missing filters are None)"""
+    filters = {name: params.get(name) or None for name in FILTER_PARAMS}
+    for name in ('status', 'branch', 'priority'):
+        if filters[name] == 'all':
+            filters[name] = None
+    for name in ('category', 'department', 'subdepartment'):
+        if filters[name] and not filters[name].isdigit():
+            filters[name] = None
+    return filters
+
+
+def apply_ticket_filters(tickets, filters):
+    """Narrow a ticket queryset with the values returned by get_filters"""
+    if filters['status']:
+        tickets = tickets.filter(status=filters['status'])
+    if filters['branch']:
+        tickets = tickets.filter(branch=filters['branch'])
+    if filters['priority']:
+        tickets = tickets.filter(priority=filters['priority'])
+    if filters['category']:
+        # The category and its subcategories, one closure table subquery
+        tickets = tickets.filter(category_id__in=descendant_ids(Category, filters['category']))
+    if filters['department']:
+        tickets = tickets.filter(department_id=filters['department'])
+    if filters['subdepartment']:
+        tickets = tickets.filter(subdepartment_id=filters['subdepartment'])
+    if filters['q']:
+        # Full-text search, annotates each ticket with its relevance `rank`
+        tickets = search_tickets(tickets, filters['q'])
+    return tickets
@@ -0,0 +1,78 @@
+"""
+Ticket change history.
+
+Ticket.save(changed_by=...) compares the fields with the values loaded from
+the database and records one TicketHistory row per changed field; the
+rows of a save (or of a whole bulk operation) are written with a single
+bulk_create, together with their activity events.
+"""
+from django.db import models
+from django.utils.translation import gettext as _
+
+# Fields whose changes are recorded in the ticket history
+TRACKED_FIELDS = (
+    'title', 'description', 'office_door_number', 'category', 'department', 'subdepartment',
+    'branch', 'priority', 'status', 'assigned_to', 'due_date',
+)
+
+
+def display_value(ticket, name, value):
+    """Text of a raw field value as shown in the history"""
+    from .reference import REFERENCE_INDEXES, reference_instance
+
+    field = ticket._meta.get_field(name)
+    if isinstance(value, models.Model):
+        return str(value)
+    if field.is_relation:
+        if value is None:
+            return 'Unassigned' if name == 'assigned_to' else 'None'
+        if name in REFERENCE_INDEXES:
+            related = reference_instance(REFERENCE_INDEXES[name], value)
+        else:
+            related = field.related_model._default_manager.filter(pk=value).first()
+        return str(related) if related else str(value)
+    if field.choices:
+        return str(dict(field.choices).get(value, value))
+    if value is None or value == '':
+        return str(_('None'))
+    return str(value)
+
+
+def history_entries(ticket, changes, user):
+    """
+    Unsaved TicketHistory rows for the tracked fields among `changes`
+    ({field name: (old raw value, new raw value)})
+    """
+    from .models import TicketHistory
+
+    entries = []
+    for name in TRACKED_FIELDS:
+        if name not in changes:
+            continue
+        old, new = changes[name]
+        if ticket._meta.get_field(name).is_relation:
+            # The new related object is usually cached on the ticket already
+            new = getattr(ticket, name)
+        entries.append(TicketHistory(
+            ticket=ticket,
+            user=user,
+            field_changed=name,
+            old_value=display_value(ticket, name, old),
+            new_value=display_value(ticket, name, new),
+        ))
+    return entries
+
+
+def write_history(entries):
+    """Insert history rows and their activity events, two queries in all"""
+    from core.activity import build_history_event
+    from core.models import ActivityEvent
+
+    from .models import TicketHistory
+
+    if not entries:
+        return []
+    entries = TicketHistory.objects.bulk_create(entries)
+    # bulk_create skips the post_save receiver that feeds the activity stream
+    ActivityEvent.objects.bulk_create([build_history_event(entry) for entry in entries])
+    return entries
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from tickets.assignment import assign_backlog
+
+
+class Command(BaseCommand):
+    help = (
+        'Assigns the unassigned new tickets to the available agents in one transaction, '
+        'by expertise, workload, priority and age'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            required=True,
+            help='Username recorded in the ticket history as the author of the assignments'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Maximum number of tickets considered, oldest first'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only show the assignments'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user {options['user']}")
+
+        plan = assign_backlog(user, limit=options['limit'], dry_run=options['dry_run'])
+        if options['dry_run']:
+            for ticket_id, agent_id in sorted(plan.items()):
+                self.stdout.write(f'Ticket #{ticket_id} -> agent {agent_id}')
+        verb = 'Would assign' if options['dry_run'] else 'Assigned'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {len(plan)} tickets to {len(set(plan.values()))} agents'
+        ))
@@ -0,0 +1,80 @@
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max, Q
+
+from accounts.models import User
+from comments.models import Comment
+from tickets.models import Ticket
+
+
+class Command(BaseCommand):
+    help = 'Backfills first response and last activity columns on tickets from existing comments'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            default=500,
+            type=int,
+            help='Number of tickets processed per batch'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ticket_type = ContentType.objects.get_for_model(Ticket)
+        staff_filter = (
+            Q(author__is_staff=True) |
+            Q(author__user_type__in=[User.UserType.ADMIN, User.UserType.AGENT]) |
+            Q(author__agent_profile__isnull=False)
+        )
+
+        last_id = 0
+        updated = 0
+        while True:
+            tickets = list(
+                Ticket.objects.filter(pk__gt=last_id).order_by('pk')
+                .only('pk', 'created_by_id')[:batch_size]
+            )
+            if not tickets:
+                break
+            last_id = tickets[-1].pk
+            ticket_ids = [ticket.pk for ticket in tickets]
+            comments = Comment.objects.filter(content_type=ticket_type, object_id__in=ticket_ids)
+
+            # Comment count and latest activity, one grouped query per batch
+            activity = {
+                row['object_id']: row
+                for row in comments.order_by().values('object_id').annotate(
+                    count=Count('id'),
+                    last=Max('created_at'),
+                )
+            }
+
+            # Earliest staff reply per ticket, skipping replies by the requester
+            first_responses = {}
+            staff_comments = comments.filter(staff_filter).distinct().order_by(
+                'object_id', 'created_at'
+            ).values_list('object_id', 'author_id', 'created_at')
+            creators = {ticket.pk: ticket.created_by_id for ticket in tickets}
+            for object_id, author_id, created_at in staff_comments:
+                if object_id in first_responses or author_id == creators.get(object_id):
+                    continue
+                first_responses[object_id] = (author_id, created_at)
+
+            for ticket in tickets:
+                row = activity.get(ticket.pk, {})
+                ticket.comment_count = row.get('count', 0)
+                ticket.last_activity_at = row.get('last')
+                ticket.first_responder_id, ticket.first_response_at = first_responses.get(
+                    ticket.pk, (None, None)
+                )
+
+            with transaction.atomic():
+                Ticket.objects.bulk_update(
+                    tickets,
+                    ['comment_count', 'last_activity_at', 'first_responder', 'first_response_at'],
+                )
+            updated += len(tickets)
+            self.stdout.write(f'Processed {updated} tickets...')
+
+        self.stdout.write(self.style.SUCCESS(f'Backfilled activity for {updated} tickets'))
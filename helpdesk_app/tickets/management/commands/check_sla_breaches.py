@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from tickets.sla import flag_breaches, recompute_deadlines
+
+
+class Command(BaseCommand):
+    help = 'Flags the running tickets past their SLA response or resolution deadline'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recompute',
+            action='store_true',
+            help='First recompute the deadlines of the unresolved tickets (after changing the SLA policies)'
+        )
+
+    def handle(self, *args, **options):
+        if options['recompute']:
+            updated = recompute_deadlines()
+            self.stdout.write(f'Recomputed the deadlines of {updated} tickets')
+        flagged = flag_breaches()
+        self.stdout.write(self.style.SUCCESS(f'Flagged {flagged} SLA breaches'))
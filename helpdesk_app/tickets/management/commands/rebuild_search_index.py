@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tickets.models import Ticket
+from tickets.search import clear_index, index_tickets
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index of every ticket'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            default=500,
+            type=int,
+            help='Number of tickets indexed per batch'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        clear_index()
+
+        last_id = 0
+        indexed = 0
+        while True:
+            ids = list(
+                Ticket.objects.filter(pk__gt=last_id).order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            with transaction.atomic():
+                index_tickets(ids)
+            indexed += len(ids)
+            self.stdout.write(f'Indexed {indexed} tickets...')
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the search index for {indexed} tickets'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from tickets.workload import reconcile_workloads
+
+
+class Command(BaseCommand):
+    help = 'Recounts the open tickets of every agent and corrects the workload index where it drifted'
+
+    def handle(self, *args, **options):
+        fixed = reconcile_workloads()
+        self.stdout.write(self.style.SUCCESS(f'Reconciled agent workloads, {fixed} corrected'))
@@ -0,0 +1,38 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from tickets import stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the daily ticket statistics for the days changed since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Rebuild the statistics of every day instead of the changed ones'
+        )
+        parser.add_argument(
+            '--since',
+            help='Also rebuild every day from this date (YYYY-MM-DD) until today'
+        )
+
+    def handle(self, *args, **options):
+        if options['full']:
+            count = stats.rebuild_all()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt statistics for {count} days'))
+            return
+
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be a date in YYYY-MM-DD format')
+            total = (timezone.localdate() - since).days + 1
+            stats.refresh_days(since + timedelta(days=i) for i in range(max(total, 0)))
+
+        count = stats.refresh_dirty_days()
+        self.stdout.write(self.style.SUCCESS(f'Refreshed statistics for {count} changed days'))
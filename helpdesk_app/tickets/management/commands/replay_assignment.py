@@ -0,0 +1,99 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from tickets.simulation import STRATEGIES, generate_dataset, load_history, percentile, replay
+
+
+class Command(BaseCommand):
+    help = (
+        'Replays the ticket history, or a seeded synthetic one, through the assignment '
+        'strategies and compares throughput, queue waits and load balance'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--strategy',
+            action='append',
+            choices=sorted(STRATEGIES),
+            help='Strategy to replay (repeatable, default all)'
+        )
+        parser.add_argument(
+            '--since',
+            help='Replay the tickets created from this date (ISO format)'
+        )
+        parser.add_argument(
+            '--until',
+            help='Replay the tickets created before this date (ISO format)'
+        )
+        parser.add_argument(
+            '--synthetic',
+            type=int,
+            metavar='TICKETS',
+            help='Replay this many generated tickets instead of the history'
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic dataset')
+        parser.add_argument('--agents', type=int, default=50, help='Agents of the synthetic dataset')
+        parser.add_argument('--categories', type=int, default=30, help='Categories of the synthetic dataset')
+        parser.add_argument(
+            '--utilization',
+            type=float,
+            default=0.75,
+            help='Share of the agent capacity the synthetic tickets need from experts'
+        )
+        parser.add_argument('--json', action='store_true', help='Output the metrics as JSON')
+
+    def parse_date(self, value):
+        if not value:
+            return None
+        date = parse_datetime(value) or parse_datetime(f'{value}T00:00:00')
+        if date is None:
+            raise CommandError(f'Invalid date {value}')
+        return date
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        recorded = None
+        if options['synthetic']:
+            tickets, agents, paths = generate_dataset(
+                options['synthetic'],
+                agent_count=options['agents'],
+                category_count=options['categories'],
+                seed=options['seed'],
+                utilization=options['utilization'],
+            )
+        else:
+            tickets, agents, paths, recorded = load_history(
+                self.parse_date(options['since']), self.parse_date(options['until'])
+            )
+        if not tickets:
+            raise CommandError('No tickets to replay')
+        if not agents:
+            raise CommandError('No agents to replay the tickets with')
+
+        results = replay(tickets, agents, paths, options['strategy'])
+        elapsed = time.monotonic() - started
+
+        if options['json']:
+            self.stdout.write(json.dumps({'results': results, 'seconds': round(elapsed, 2)}, indent=2))
+            return
+
+        self.stdout.write(f'{len(tickets)} tickets, {len(agents)} agents')
+        if recorded:
+            self.stdout.write(
+                f'Recorded waits (hours): p50 {percentile(recorded, 0.5) / 3600:.1f}, '
+                f'p90 {percentile(recorded, 0.9) / 3600:.1f}, p99 {percentile(recorded, 0.99) / 3600:.1f}'
+            )
+        self.stdout.write(
+            f"{'Strategy':<20}{'Per day':>10}{'p50 h':>9}{'p90 h':>9}{'p99 h':>9}"
+            f"{'Expert':>9}{'Load var':>10}{'Busy':>8}"
+        )
+        for result in results:
+            self.stdout.write(
+                f"{result['strategy']:<20}{result['throughput_per_day']:>10.1f}"
+                f"{result['wait_p50_hours']:>9.2f}{result['wait_p90_hours']:>9.2f}{result['wait_p99_hours']:>9.2f}"
+                f"{result['expert_share']:>9.0%}{result['load_variance']:>10.4f}{result['utilization']:>8.0%}"
+            )
+        self.stdout.write(self.style.SUCCESS(f'Replayed in {elapsed:.1f}s'))
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tickets', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Comment count'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='first_responder',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='first_responses', to=settings.AUTH_USER_MODEL, verbose_name='First responder'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='first_response_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='First response at'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='last_activity_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Last activity at'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['first_response_at'], name='tickets_tic_first_r_df0708_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['status', 'last_activity_at'], name='tickets_tic_status_dbef56_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0002_ticket_activity_tracking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketStatsDirtyDate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='Date')),
+                ('marked_at', models.DateTimeField(auto_now_add=True, verbose_name='Marked at')),
+            ],
+            options={
+                'verbose_name': 'Dirty Statistics Date',
+                'verbose_name_plural': 'Dirty Statistics Dates',
+            },
+        ),
+        migrations.CreateModel(
+            name='TicketDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('branch', models.CharField(choices=[('siege', 'Headquarters'), ('yaounde', 'Yaoundé'), ('douala', 'Douala'), ('buea', 'Buea'), ('bamenda', 'Bamenda'), ('ngaoundere', 'Ngaoundere'), ('garoua', 'Garoua'), ('maroua', 'Maroua'), ('bafoussam', 'Bafoussam'), ('ebolowa', 'Ebolowa'), ('bertoua', 'Bertoua')], max_length=64, verbose_name='Branch')),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('critical', 'Critical')], max_length=20, verbose_name='Priority')),
+                ('created_count', models.PositiveIntegerField(default=0, verbose_name='Created')),
+                ('due_count', models.PositiveIntegerField(default=0, verbose_name='With due date')),
+                ('breached_count', models.PositiveIntegerField(default=0, verbose_name='SLA breached')),
+                ('resolved_count', models.PositiveIntegerField(default=0, verbose_name='Resolved')),
+                ('closed_count', models.PositiveIntegerField(default=0, verbose_name='Closed')),
+                ('resolution_seconds', models.BigIntegerField(default=0, verbose_name='Total resolution time (seconds)')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_stats', to='tickets.category', verbose_name='Category')),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_stats', to='tickets.department', verbose_name='Department')),
+            ],
+            options={
+                'verbose_name': 'Ticket Daily Statistics',
+                'verbose_name_plural': 'Ticket Daily Statistics',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date', 'branch'], name='tickets_tic_date_99d570_idx'), models.Index(fields=['date', 'priority'], name='tickets_tic_date_a4290b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.10 on 2026-10-18 09:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def closure_rows(parents):
+    """(ancestor, descendant, depth) of every path of a tree given as {id: parent id}"""
+    rows = []
+    for pk in parents:
+        node, depth, seen = pk, 0, set()
+        while node is not None and node not in seen:
+            seen.add(node)
+            rows.append((node, pk, depth))
+            node, depth = parents.get(node), depth + 1
+    return rows
+
+
+def populate_closure(apps, schema_editor):
+    Node = apps.get_model('tickets', 'Category')
+    Closure = apps.get_model('tickets', 'CategoryClosure')
+    parents = dict(Node.objects.values_list('pk', 'parent_id'))
+    Closure.objects.bulk_create(
+        [Closure(ancestor_id=a, descendant_id=d, depth=depth) for a, d, depth in closure_rows(parents)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0005_ticket_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField(verbose_name='Depth')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='tickets.category')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='tickets.category')),
+            ],
+            options={
+                'verbose_name': 'Category path',
+                'verbose_name_plural': 'Category paths',
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='category_path_ancestors_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='categoryclosure',
+            constraint=models.UniqueConstraint(fields=('ancestor', 'descendant'), name='unique_category_path'),
+        ),
+        migrations.RunPython(populate_closure, migrations.RunPython.noop),
+    ]
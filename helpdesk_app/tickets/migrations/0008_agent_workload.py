@@ -0,0 +1,57 @@
+# Generated by Django 4.2.10 on 2026-10-18 10:06
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Frozen here: the migration must not depend on the current tickets.workload
+OPEN_STATUSES = ('new', 'open', 'in_progress', 'waiting')
+PRIORITIES = ('low', 'medium', 'high', 'critical')
+
+
+def populate_workloads(apps, schema_editor):
+    """Count the open tickets of every agent, in total and per priority, in one grouped query"""
+    Ticket = apps.get_model('tickets', 'Ticket')
+    AgentWorkload = apps.get_model('tickets', 'AgentWorkload')
+    rows = (
+        Ticket.objects.filter(assigned_to__isnull=False, status__in=OPEN_STATUSES)
+        .values('assigned_to')
+        .annotate(
+            open_tickets=models.Count('pk'),
+            **{f'{priority}_tickets': models.Count('pk', filter=models.Q(priority=priority)) for priority in PRIORITIES},
+        )
+        .order_by()
+    )
+    AgentWorkload.objects.bulk_create(
+        [AgentWorkload(agent_id=row.pop('assigned_to'), **row) for row in rows.iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_initial'),
+        ('tickets', '0007_attachment_blobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgentWorkload',
+            fields=[
+                ('agent', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='workload', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Agent')),
+                ('open_tickets', models.IntegerField(default=0, verbose_name='Open tickets')),
+                ('low_tickets', models.IntegerField(default=0, verbose_name='Low priority')),
+                ('medium_tickets', models.IntegerField(default=0, verbose_name='Medium priority')),
+                ('high_tickets', models.IntegerField(default=0, verbose_name='High priority')),
+                ('critical_tickets', models.IntegerField(default=0, verbose_name='Critical priority')),
+                ('reconciled_at', models.DateTimeField(blank=True, null=True, verbose_name='Reconciled at')),
+            ],
+            options={
+                'verbose_name': 'Agent Workload',
+                'verbose_name_plural': 'Agent Workloads',
+            },
+        ),
+        migrations.RunPython(populate_workloads, migrations.RunPython.noop),
+    ]
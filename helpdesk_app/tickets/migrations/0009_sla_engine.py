@@ -0,0 +1,53 @@
+# Generated by Django 4.2.10 on 2026-10-18 10:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0008_agent_workload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sla',
+            name='category',
+            field=models.ForeignKey(blank=True, help_text='Applies to this category and its subcategories', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='slas', to='tickets.category', verbose_name='Category'),
+        ),
+        migrations.AddField(
+            model_name='sla',
+            name='department',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='slas', to='tickets.department', verbose_name='Department'),
+        ),
+        migrations.AddField(
+            model_name='sla',
+            name='priority',
+            field=models.CharField(blank=True, choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('critical', 'Critical')], max_length=20, verbose_name='Priority'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='response_due_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Response due at'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='sla',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tickets', to='tickets.sla', verbose_name='SLA'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='sla_paused_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='SLA paused at'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='sla_paused_seconds',
+            field=models.PositiveIntegerField(default=0, verbose_name='SLA paused time (seconds)'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['response_due_at'], name='tickets_tic_respons_3d0026_idx'),
+        ),
+    ]
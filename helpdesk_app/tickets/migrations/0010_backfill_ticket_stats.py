@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def mark_every_day_dirty(apps, schema_editor):
+    """
+    Mark every day since the first ticket for the statistics rollup, which
+    the refresh_ticket_stats task then builds on its next run
+    """
+    Ticket = apps.get_model('tickets', 'Ticket')
+    TicketStatsDirtyDate = apps.get_model('tickets', 'TicketStatsDirtyDate')
+    first = Ticket.objects.order_by('created_at').values_list('created_at', flat=True).first()
+    if first is None:
+        return
+    day, today = timezone.localdate(first), timezone.localdate()
+    days = []
+    while day <= today:
+        days.append(TicketStatsDirtyDate(date=day))
+        day += timedelta(days=1)
+    TicketStatsDirtyDate.objects.bulk_create(days, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0009_sla_engine'),
+    ]
+
+    operations = [
+        migrations.RunPython(mark_every_day_dirty, migrations.RunPython.noop),
+    ]
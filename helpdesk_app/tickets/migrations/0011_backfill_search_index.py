@@ -0,0 +1,76 @@
+from django.db import migrations
+
+# Tickets indexed per statement
+BATCH_SIZE = 1000
+
+SEARCH_CONFIGS = ('english', 'french')
+
+# Tag names in every language, then the public comments of the ticket t
+TAGS = (
+    "(SELECT string_agg(concat_ws(' ', tag.name_en, tag.name_fr), ' ') "
+    "FROM tickets_ticket_tags tt JOIN tickets_tag tag ON tag.id = tt.tag_id WHERE tt.ticket_id = t.id)"
+)
+COMMENTS = (
+    "(SELECT string_agg(c.text, chr(10) ORDER BY c.created_at) "
+    "FROM comments_comment c JOIN django_content_type ct ON ct.id = c.content_type_id "
+    "WHERE ct.app_label = 'tickets' AND ct.model = 'ticket' AND c.object_id = t.id AND NOT c.is_internal)"
+)
+
+SQLITE_TAGS = (
+    "(SELECT group_concat(trim(coalesce(tag.name_en, '') || ' ' || coalesce(tag.name_fr, '')), ' ') "
+    "FROM tickets_ticket_tags tt JOIN tickets_tag tag ON tag.id = tt.tag_id WHERE tt.ticket_id = t.id)"
+)
+SQLITE_COMMENTS = (
+    "(SELECT group_concat(c.text, char(10)) "
+    "FROM comments_comment c JOIN django_content_type ct ON ct.id = c.content_type_id "
+    "WHERE ct.app_label = 'tickets' AND ct.model = 'ticket' AND c.object_id = t.id AND NOT c.is_internal)"
+)
+
+
+def postgresql_vector():
+    """Same document and weights as tickets.search, from the row of t and its related rows"""
+    parts = [('A', 't.title'), ('B', 't.description'), ('C', TAGS), ('D', COMMENTS)]
+    return ' || '.join(
+        f"setweight(to_tsvector('{config}'::regconfig, coalesce({text}, '')), '{weight}')"
+        for config in SEARCH_CONFIGS for weight, text in parts
+    )
+
+
+def backfill_search_index(apps, schema_editor):
+    """Index the tickets created before the search index, one statement per batch of ids"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        statements = [
+            f'UPDATE tickets_ticket AS t SET search_vector = {postgresql_vector()} WHERE t.id >= %s AND t.id < %s',
+        ]
+    elif vendor == 'sqlite':
+        statements = [
+            'DELETE FROM tickets_ticket_fts WHERE rowid >= %s AND rowid < %s',
+            'INSERT INTO tickets_ticket_fts (rowid, title, description, tags, comments) '
+            f"SELECT t.id, t.title, t.description, coalesce({SQLITE_TAGS}, ''), coalesce({SQLITE_COMMENTS}, '') "
+            'FROM tickets_ticket t WHERE t.id >= %s AND t.id < %s',
+        ]
+    else:
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT MIN(id), MAX(id) FROM tickets_ticket')
+        first, last = cursor.fetchone()
+        if first is None:
+            return
+        for start in range(first, last + 1, BATCH_SIZE):
+            for statement in statements:
+                cursor.execute(statement, [start, start + BATCH_SIZE])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('comments', '0002_attachment_blobs'),
+        ('tickets', '0010_backfill_ticket_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_index, migrations.RunPython.noop),
+    ]
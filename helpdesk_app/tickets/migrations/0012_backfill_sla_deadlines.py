@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_time
+
+# Frozen here: the migration must not depend on the current tickets.sla
+RUNNING_STATUSES = ('new', 'open', 'in_progress')
+WAITING = 'waiting'
+PRIORITIES = ('low', 'medium', 'high', 'critical')
+DEFAULT_RESPONSE_HOURS = 24
+DEFAULT_RESOLUTION_HOURS = 72
+
+BATCH_SIZE = 1000
+
+
+def business_calendar():
+    """(opens, closes, weekdays, holidays, time zone) from the SLA_* settings"""
+    opens, closes = getattr(settings, 'SLA_BUSINESS_HOURS', ('08:00', '17:00'))
+    holidays = getattr(settings, 'SLA_HOLIDAYS', ())
+    return (
+        parse_time(opens) if isinstance(opens, str) else opens,
+        parse_time(closes) if isinstance(closes, str) else closes,
+        frozenset(getattr(settings, 'SLA_BUSINESS_DAYS', (0, 1, 2, 3, 4))),
+        frozenset(parse_date(day) if isinstance(day, str) else day for day in holidays),
+        timezone.get_default_timezone(),
+    )
+
+
+def add_business_time(calendar, start, seconds):
+    """The moment `seconds` of business time after `start`, None past ten years"""
+    opens, closes, days, holidays, tz = calendar
+    if seconds <= 0:
+        return start
+    day = start.astimezone(tz).date()
+    for _ in range(3660):
+        if day.weekday() in days and day not in holidays:
+            begin = max(start, datetime.combine(day, opens, tzinfo=tz))
+            end = datetime.combine(day, closes, tzinfo=tz)
+            if begin < end:
+                available = (end - begin).total_seconds()
+                if seconds <= available:
+                    return begin + timedelta(seconds=seconds)
+                seconds -= available
+        day += timedelta(days=1)
+    return None
+
+
+def hours(sla, kind, priority, default):
+    return getattr(sla, f'{kind}_time_{priority}') if priority in PRIORITIES else default
+
+
+def backfill_sla_deadlines(apps, schema_editor):
+    """
+    Give the tickets not resolved yet, created before the SLA engine, the
+    policy and deadlines it would have set: the most specific policy for
+    their category (or a parent), department and priority, deadlines
+    counted from their creation. Waiting tickets have their clock paused
+    from now. The statistics days were all marked by 0010.
+    """
+    Category = apps.get_model('tickets', 'Category')
+    SLA = apps.get_model('tickets', 'SLA')
+    Ticket = apps.get_model('tickets', 'Ticket')
+    slas = list(SLA.objects.all())
+    if not slas:
+        return
+    parents = dict(Category.objects.values_list('pk', 'parent_id'))
+    paths = {}
+
+    def category_path(category_id):
+        """Ids from the root down to `category_id`"""
+        if category_id not in paths:
+            path, node = [], category_id
+            while node is not None and node not in path:
+                path.append(node)
+                node = parents.get(node)
+            paths[category_id] = path[::-1]
+        return paths[category_id]
+
+    def find_sla(ticket):
+        path = category_path(ticket.category_id) if ticket.category_id else []
+        best, best_key = None, None
+        for sla in slas:
+            if sla.priority and sla.priority != ticket.priority:
+                continue
+            if sla.department_id and sla.department_id != ticket.department_id:
+                continue
+            if sla.category_id and sla.category_id not in path:
+                continue
+            depth = path.index(sla.category_id) + 1 if sla.category_id else 0
+            key = (depth, bool(sla.department_id), bool(sla.priority), -sla.pk)
+            if best_key is None or key > best_key:
+                best, best_key = sla, key
+        return best
+
+    def deadline(sla, start, seconds):
+        if not sla.business_hours_only:
+            return start + timedelta(seconds=seconds)
+        return add_business_time(calendar, start, seconds)
+
+    calendar = business_calendar()
+    now = timezone.now()
+    tickets = Ticket.objects.filter(sla__isnull=True, status__in=(*RUNNING_STATUSES, WAITING)).only(
+        'created_at', 'status', 'priority', 'category_id', 'department_id', 'sla_paused_seconds'
+    )
+    changed = []
+    for ticket in tickets.iterator(chunk_size=BATCH_SIZE):
+        sla = find_sla(ticket)
+        if sla is None:
+            continue
+        ticket.sla_id = sla.pk
+        if ticket.status == WAITING:
+            ticket.sla_paused_at = now
+        paused = ticket.sla_paused_seconds
+        response = hours(sla, 'response', ticket.priority, DEFAULT_RESPONSE_HOURS)
+        resolution = hours(sla, 'resolution', ticket.priority, DEFAULT_RESOLUTION_HOURS)
+        ticket.response_due_at = deadline(sla, ticket.created_at, response * 3600 + paused)
+        ticket.due_date = deadline(sla, ticket.created_at, resolution * 3600 + paused)
+        ticket.updated_at = now
+        changed.append(ticket)
+    Ticket.objects.bulk_update(
+        changed, ['sla', 'sla_paused_at', 'response_due_at', 'due_date', 'updated_at'], batch_size=BATCH_SIZE
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0011_backfill_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_sla_deadlines, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,12 @@
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 from django.urls import reverse
 
+from core.blobs import BlobAttachmentMixin
+from core.tree import TreeNodeMixin, tree_path
+
 class Department(models.Model):
     """
     Departments for organization structure.
@@ -57,10 +61,12 @@ class SubDepartment(models.Model):
     def __str__(self):
         return f"{self.department.name} > {self.name}"
 
-class Category(models.Model):
+class Category(TreeNodeMixin, models.Model):
     """
     Categories for tickets to organize them by department or topic.
     """
+    closure_model = 'tickets.CategoryClosure'
+
     name = models.CharField(_('Name'), max_length=100)
     description = models.TextField(_('Description'), blank=True)
     parent = models.ForeignKey(
@@ -80,16 +86,41 @@ class Category(models.Model):
         ordering = ['name']
     
     def __str__(self):
-        if self.parent:
+        if not self.parent_id:
+            return self.name
+        if Category.parent.is_cached(self):
             return f"{self.parent.name} > {self.name}"
-        return self.name
+        # The parent name comes from the cached tree instead of a query per category
+        path = tree_path(Category, self.parent_id)
+        parent_name = path[-1]['name'] if path else self.parent.name
+        return f"{parent_name} > {self.name}"
     
     def get_all_children(self):
-        """Get all child categories recursively"""
-        children = list(self.subcategories.all())
-        for child in self.subcategories.all():
-            children.extend(child.get_all_children())
-        return children
+        """Get all child categories, at any depth"""
+        return list(self.get_descendants())
+
+
+class CategoryClosure(models.Model):
+    """
+    One row per (ancestor, descendant) pair of the category tree, the
+    category itself included at depth 0; maintained by core.tree.
+    """
+    ancestor = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveIntegerField(_('Depth'))
+
+    class Meta:
+        verbose_name = _('Category path')
+        verbose_name_plural = _('Category paths')
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='unique_category_path'),
+        ]
+        indexes = [
+            models.Index(fields=['descendant', 'depth'], name='category_path_ancestors_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} > {self.descendant_id} ({self.depth})"
 
 class Ticket(models.Model):
     """
@@ -197,6 +228,36 @@ class Ticket(models.Model):
     resolved_at = models.DateTimeField(_('Resolved at'), null=True, blank=True)
     closed_at = models.DateTimeField(_('Closed at'), null=True, blank=True)
     
+    # Activity tracking, maintained from comment events
+    first_response_at = models.DateTimeField(_('First response at'), null=True, blank=True)
+    first_responder = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name='first_responses',
+        verbose_name=_('First responder'),
+        null=True,
+        blank=True
+    )
+    last_activity_at = models.DateTimeField(_('Last activity at'), null=True, blank=True)
+    comment_count = models.PositiveIntegerField(_('Comment count'), default=0)
+    
+    # Service level, maintained by tickets.sla; due_date is the resolution deadline
+    sla = models.ForeignKey(
+        'SLA',
+        on_delete=models.SET_NULL,
+        related_name='tickets',
+        verbose_name=_('SLA'),
+        null=True,
+        blank=True
+    )
+    response_due_at = models.DateTimeField(_('Response due at'), null=True, blank=True)
+    sla_paused_at = models.DateTimeField(_('SLA paused at'), null=True, blank=True)
+    sla_paused_seconds = models.PositiveIntegerField(_('SLA paused time (seconds)'), default=0)
+    
+    # Full-text search document (title, description, tags and public comments),
+    # maintained by tickets.search. GIN indexed on PostgreSQL.
+    search_vector = SearchVectorField(_('Search vector'), null=True, editable=False)
+    
     # Additional Fields
     tags = models.ManyToManyField('Tag', blank=True, related_name='tickets')
     sla_breach = models.BooleanField(_('SLA Breach'), default=False)
@@ -215,8 +276,15 @@ class Ticket(models.Model):
             models.Index(fields=['status', 'branch', 'priority']),
             models.Index(fields=['created_at']),
             models.Index(fields=['due_date']),
+            models.Index(fields=['response_due_at']),
             models.Index(fields=['assigned_to']),
             models.Index(fields=['department', 'subdepartment']),
+            models.Index(fields=['first_response_at']),
+            models.Index(fields=['status', 'last_activity_at']),
+            # Keyset pagination of the ticket list
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['created_by', '-created_at', '-id']),
+            models.Index(fields=['status', '-created_at', '-id']),
         ]
     
     def __str__(self):
@@ -231,9 +299,112 @@ class Ticket(models.Model):
         if self.due_date and timezone.now() > self.due_date:
             return True
         return False
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the reporting dates as loaded so a save also refreshes the days it leaves
+        instance._loaded_report_dates = instance.report_dates()
+        instance._snapshot()
+        return instance
+    
+    def _snapshot(self, fields=None):
+        """Remember the current values of `fields` (default all), the reference of get_changes()"""
+        if fields is None or not hasattr(self, '_loaded_values'):
+            self._loaded_values = {}
+            fields = self._meta.concrete_fields
+        else:
+            fields = [self._meta.get_field(name) for name in fields]
+        for field in fields:
+            if field.attname in self.__dict__:
+                self._loaded_values[field.attname] = self.__dict__[field.attname]
+    
+    def refresh_from_db(self, using=None, fields=None):
+        # Also called to load a deferred field when it is first read
+        super().refresh_from_db(using=using, fields=fields)
+        self._snapshot(fields)
+    
+    def get_changes(self):
+        """
+        Fields changed since the ticket was loaded or last saved, as
+        {field name: (old value, new value)} with the raw column values
+        (ids for foreign keys)
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        changes = {}
+        for field in self._meta.concrete_fields:
+            if field.attname not in self.__dict__:
+                continue  # Deferred and never touched
+            value = self.__dict__[field.attname]
+            if field.attname not in loaded or loaded[field.attname] != value:
+                changes[field.name] = (loaded.get(field.attname), value)
+        return changes
+    
+    def save(self, *args, changed_by=None, **kwargs):
+        """
+        Save the ticket. An existing ticket only writes the fields that
+        changed since it was loaded, and is not written at all when nothing
+        changed; with `changed_by`, a history row is recorded for every
+        changed tracked field (see tickets.history).
+        The changes are available to the post_save receivers as
+        `recorded_changes` ({field name: TicketHistory}).
+        The SLA policy and deadlines follow the changes (see tickets.sla),
+        except for a save limited to `update_fields`.
+        """
+        from django.db import transaction
+        from .history import history_entries, write_history
+        from .sla import update_deadlines
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            update_deadlines(self)
+        changes = None if self._state.adding or update_fields is not None else self.get_changes()
+        if changes is None:
+            super().save(*args, **kwargs)
+            self._snapshot(update_fields)
+            return
+        changes.pop('updated_at', None)
+        if not changes:
+            return
+        
+        with transaction.atomic():
+            entries = []
+            if changed_by is not None:
+                # Written first so that the post_save receivers find them
+                entries = write_history(history_entries(self, changes, changed_by))
+            self.recorded_changes = {entry.field_changed: entry for entry in entries}
+            try:
+                kwargs['update_fields'] = [*changes, 'updated_at']
+                super().save(*args, **kwargs)
+            finally:
+                del self.recorded_changes
+        self._snapshot()
+    
+    def set_status(self, status, now=None):
+        """Change the status, stamping the first resolution and closing times"""
+        from django.utils import timezone
+        now = now or timezone.now()
+        self.status = status
+        if status == self.Status.RESOLVED and not self.resolved_at:
+            self.resolved_at = now
+        elif status == self.Status.CLOSED and not self.closed_at:
+            self.closed_at = now
+    
+    def assign(self, agent):
+        """Assign the ticket to `agent`; assigned tickets are open"""
+        self.assigned_to = agent
+        self.set_status(self.Status.OPEN)
+    
+    def report_dates(self):
+        """Local dates on which this ticket is counted in the daily statistics"""
+        from django.utils import timezone
+        values = (self.__dict__.get(name) for name in ('created_at', 'resolved_at', 'closed_at'))
+        return {timezone.localdate(value) for value in values if value}
 
 
-class TicketAttachment(models.Model):
+class TicketAttachment(BlobAttachmentMixin, models.Model):
     """
     Files attached to tickets.
     """
@@ -244,6 +415,15 @@ class TicketAttachment(models.Model):
         verbose_name=_('Ticket')
     )
     file = models.FileField(_('File'), upload_to='ticket_attachments/%Y/%m/')
+    blob = models.ForeignKey(
+        'core.Blob',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='+',
+        verbose_name=_('Blob')
+    )
     uploaded_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.PROTECT,
@@ -330,6 +510,31 @@ class SLA(models.Model):
     # Operating hours
     business_hours_only = models.BooleanField(_('Business hours only'), default=True)
     
+    # Tickets the policy applies to; the most specific matching policy wins (see tickets.sla)
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name='slas',
+        verbose_name=_('Category'),
+        null=True,
+        blank=True,
+        help_text=_('Applies to this category and its subcategories')
+    )
+    department = models.ForeignKey(
+        Department,
+        on_delete=models.CASCADE,
+        related_name='slas',
+        verbose_name=_('Department'),
+        null=True,
+        blank=True
+    )
+    priority = models.CharField(
+        _('Priority'),
+        max_length=20,
+        choices=Ticket.Priority.choices,
+        blank=True
+    )
+    
     class Meta:
         verbose_name = _('SLA')
         verbose_name_plural = _('SLAs')
@@ -357,4 +562,97 @@ class SLA(models.Model):
             return self.resolution_time_high
         elif priority == Ticket.Priority.CRITICAL:
             return self.resolution_time_critical
-        return 72  # Default
\ No newline at end of file
+        return 72  # Default
+
+
+class TicketDailyStats(models.Model):
+    """
+    Daily ticket rollup keyed by (date, branch, priority, category, department).
+    Rebuilt per day by the refresh_ticket_stats command so reports read a
+    number of rows proportional to the date range, not to the ticket volume.
+    """
+    date = models.DateField(_('Date'))
+    branch = models.CharField(_('Branch'), max_length=64, choices=Ticket.Branch.choices)
+    priority = models.CharField(_('Priority'), max_length=20, choices=Ticket.Priority.choices)
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.SET_NULL,
+        related_name='daily_stats',
+        verbose_name=_('Category'),
+        null=True,
+        blank=True
+    )
+    department = models.ForeignKey(
+        Department,
+        on_delete=models.SET_NULL,
+        related_name='daily_stats',
+        verbose_name=_('Department'),
+        null=True,
+        blank=True
+    )
+    
+    # Tickets created on this date
+    created_count = models.PositiveIntegerField(_('Created'), default=0)
+    due_count = models.PositiveIntegerField(_('With due date'), default=0)
+    breached_count = models.PositiveIntegerField(_('SLA breached'), default=0)
+    
+    # Tickets resolved or closed on this date
+    resolved_count = models.PositiveIntegerField(_('Resolved'), default=0)
+    closed_count = models.PositiveIntegerField(_('Closed'), default=0)
+    resolution_seconds = models.BigIntegerField(_('Total resolution time (seconds)'), default=0)
+    
+    class Meta:
+        verbose_name = _('Ticket Daily Statistics')
+        verbose_name_plural = _('Ticket Daily Statistics')
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['date', 'branch']),
+            models.Index(fields=['date', 'priority']),
+        ]
+    
+    def __str__(self):
+        return f"{self.date} - {self.branch}/{self.priority}"
+
+
+class TicketStatsDirtyDate(models.Model):
+    """
+    Days whose rollup rows are out of date and must be rebuilt.
+    """
+    date = models.DateField(_('Date'), unique=True)
+    marked_at = models.DateTimeField(_('Marked at'), auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('Dirty Statistics Date')
+        verbose_name_plural = _('Dirty Statistics Dates')
+    
+    def __str__(self):
+        return str(self.date)
+
+
+
+class AgentWorkload(models.Model):
+    """
+    Open tickets assigned to an agent, in total and per priority. Kept up
+    to date by the ticket saves, bulk actions and deletions (see
+    tickets.workload) and reconciled periodically with the ticket table.
+    """
+    agent = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='workload',
+        primary_key=True,
+        verbose_name=_('Agent')
+    )
+    open_tickets = models.IntegerField(_('Open tickets'), default=0)
+    low_tickets = models.IntegerField(_('Low priority'), default=0)
+    medium_tickets = models.IntegerField(_('Medium priority'), default=0)
+    high_tickets = models.IntegerField(_('High priority'), default=0)
+    critical_tickets = models.IntegerField(_('Critical priority'), default=0)
+    reconciled_at = models.DateTimeField(_('Reconciled at'), null=True, blank=True)
+    
+    class Meta:
+        verbose_name = _('Agent Workload')
+        verbose_name_plural = _('Agent Workloads')
+    
+    def __str__(self):
+        return f"{self.agent}: {self.open_tickets}"
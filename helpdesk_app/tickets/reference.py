@@ -0,0 +1,186 @@
+"""
+Reference data (categories, departments, tags, SLAs) held in memory by
+each process.
+
+A set is loaded on first use and kept until the version of the shared
+'reference' cache namespace changes; tickets.signals bumps it whenever one
+of these models is saved or deleted, so every process reloads on its next
+request after an admin change. In steady state reading a set costs one
+cache lookup and no query.
+
+The returned objects are shared by every request and thread of the
+process: callers must copy them before setting attributes.
+"""
+import copy
+import hashlib
+import json
+import threading
+
+from django.utils.translation import get_language
+
+from core.cache import namespace_version
+
+from .models import SLA, Category, Department, SubDepartment, Tag
+
+_loaders = {}
+_values = {}
+_lock = threading.Lock()
+
+# Ticket foreign keys -> the set indexing their shared instances by pk
+REFERENCE_INDEXES = {
+    'category': 'category_index',
+    'department': 'department_index',
+    'subdepartment': 'subdepartment_index',
+}
+
+
+def reference_set(name):
+    """Register the decorated function as the loader of the set `name`"""
+    def register(loader):
+        _loaders[name] = loader
+        return loader
+    return register
+
+
+def get_reference(name):
+    """The current value of the set `name`, in the active language"""
+    version = namespace_version('reference')
+    key = (name, get_language())
+    entry = _values.get(key)
+    if entry is not None and version is not None and entry[0] == version:
+        return entry[1]
+    value = _loaders[name]()
+    with _lock:
+        _values[key] = (version, value)
+    return value
+
+
+def clear_reference():
+    """Forget every loaded set of this process"""
+    with _lock:
+        _values.clear()
+
+
+def annotated_copies(instances, counts, attribute='ticket_count'):
+    """Per-request copies of shared instances with their count from `counts` ({pk: count})"""
+    copies = []
+    for instance in instances:
+        instance = copy.copy(instance)
+        setattr(instance, attribute, counts.get(instance.pk, 0))
+        copies.append(instance)
+    return copies
+
+
+def reference_instance(index, pk):
+    """The shared instance of the index set `index` for `pk` (e.g. a posted id), None when there is none"""
+    try:
+        return get_reference(index).get(int(pk))
+    except (TypeError, ValueError):
+        return None
+
+
+def attach_reference(ticket):
+    """Point the category and department of `ticket` to the shared instances, instead of a query each"""
+    for field, index in REFERENCE_INDEXES.items():
+        descriptor = getattr(type(ticket), field)
+        pk = getattr(ticket, descriptor.field.attname)
+        if pk is not None and not descriptor.is_cached(ticket):
+            instance = get_reference(index).get(pk)
+            if instance is not None:
+                descriptor.field.set_cached_value(ticket, instance)
+    return ticket
+
+
+@reference_set('categories')
+def load_categories():
+    categories = list(Category.objects.prefetch_related('subcategories'))
+    # Parents from the same list, so labels need no query
+    by_id = {category.pk: category for category in categories}
+    for category in categories:
+        if category.parent_id in by_id:
+            Category.parent.field.set_cached_value(category, by_id[category.parent_id])
+    return tuple(categories)
+
+
+@reference_set('parent_categories')
+def load_parent_categories():
+    return tuple(category for category in get_reference('categories') if not category.parent_id)
+
+
+@reference_set('subcategories')
+def load_subcategories():
+    """{parent id: ({'id', 'name'}, ...)}, from the reference tree"""
+    children = {}
+    for pk, parent_id, name in get_reference('tree')['data']['categories']:
+        if parent_id:
+            children.setdefault(parent_id, []).append({'id': pk, 'name': name})
+    return {pk: tuple(values) for pk, values in children.items()}
+
+
+@reference_set('category_index')
+def load_category_index():
+    return {category.pk: category for category in get_reference('categories')}
+
+
+@reference_set('departments')
+def load_departments():
+    return tuple(Department.objects.prefetch_related('subdepartments'))
+
+
+@reference_set('subdepartments')
+def load_subdepartments():
+    """{department id: ({'id', 'name'}, ...)}, from the reference tree"""
+    children = {}
+    for pk, department_id, name in get_reference('tree')['data']['subdepartments']:
+        children.setdefault(department_id, []).append({'id': pk, 'name': name})
+    return {pk: tuple(values) for pk, values in children.items()}
+
+
+@reference_set('tree')
+def load_tree():
+    """
+    The category and department hierarchy as served to the forms: rows of
+    [id, parent id, name] (categories), [id, name] (departments) and
+    [id, department id, name] (subdepartments), sorted by id so that the
+    payload and its ETag only change with the data. 'body' is the
+    serialized payload and 'etag' its content hash.
+    """
+    categories = sorted(get_reference('categories'), key=lambda category: category.pk)
+    departments = sorted(get_reference('departments'), key=lambda department: department.pk)
+    data = {
+        'categories': [[category.pk, category.parent_id, category.name] for category in categories],
+        'departments': [[department.pk, department.name] for department in departments],
+        'subdepartments': sorted(
+            [sub.pk, department.pk, sub.name]
+            for department in departments
+            for sub in department.subdepartments.all()
+        ),
+    }
+    body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()
+    return {'data': data, 'body': body, 'etag': f'"{hashlib.sha256(body).hexdigest()[:32]}"'}
+
+
+@reference_set('department_index')
+def load_department_index():
+    return {department.pk: department for department in get_reference('departments')}
+
+
+@reference_set('subdepartment_index')
+def load_subdepartment_index():
+    subdepartments = {}
+    for department in get_reference('departments'):
+        for subdepartment in department.subdepartments.all():
+            # Its department is the shared one too
+            SubDepartment.department.field.set_cached_value(subdepartment, department)
+            subdepartments[subdepartment.pk] = subdepartment
+    return subdepartments
+
+
+@reference_set('tags')
+def load_tags():
+    return tuple(Tag.objects.all())
+
+
+@reference_set('slas')
+def load_slas():
+    return tuple(SLA.objects.all())
@@ -0,0 +1,242 @@
+"""
+Full-text search on tickets.
+
+On PostgreSQL, Ticket.search_vector holds the English and French lexemes
+of the title (weight A), description (B), tag names (C) and public comments
+(D), and is GIN indexed. On SQLite the same documents are stored in the
+tickets_ticket_fts FTS5 table. Other databases fall back to LIKE matching.
+The index is kept up to date by the signals in tickets.signals.
+"""
+import re
+
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, FloatField, OuterRef, Q, Subquery, TextField, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Concat
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+
+from comments.models import Comment
+
+from .models import Ticket
+
+SEARCH_CONFIGS = ('english', 'french')
+
+# Ticket fields of the search document; tags and comments are indexed on their own changes
+SEARCH_FIELDS = frozenset({'title', 'description'})
+FTS_TABLE = 'tickets_ticket_fts'
+
+# Put around matches by the database, replaced by <mark> once the text is escaped
+START_SEL = '\x02'
+STOP_SEL = '\x03'
+
+
+def build_documents(ticket_ids):
+    """Searchable text of each ticket: title, description, tag names and public comments"""
+    documents = {
+        pk: {'title': title, 'description': description, 'tags': [], 'comments': []}
+        for pk, title, description in Ticket.objects.filter(pk__in=ticket_ids).values_list(
+            'pk', 'title', 'description'
+        )
+    }
+
+    # Tag names in every language, so a search in either language finds them
+    tag_names = Ticket.tags.through.objects.filter(ticket_id__in=documents).values_list(
+        'ticket_id', 'tag__name_en', 'tag__name_fr'
+    )
+    for ticket_id, name_en, name_fr in tag_names:
+        documents[ticket_id]['tags'].extend(name for name in (name_en, name_fr) if name)
+
+    comments = Comment.objects.filter(
+        content_type=ContentType.objects.get_for_model(Ticket),
+        object_id__in=documents,
+        is_internal=False,
+    ).order_by('created_at').values_list('object_id', 'text')
+    for ticket_id, text in comments:
+        documents[ticket_id]['comments'].append(text)
+
+    return documents
+
+
+def _vector():
+    """
+    tsvector expression of the documents of the tickets of an UPDATE, in
+    every configuration: the tag names and public comments come from
+    correlated subqueries, so a batch is indexed by a single statement
+    """
+    tags = (
+        Ticket.tags.through.objects.filter(ticket_id=OuterRef('pk'))
+        .order_by()
+        .values('ticket_id')
+        .annotate(names=StringAgg(Concat('tag__name_en', Value(' '), 'tag__name_fr', output_field=TextField()), ' '))
+        .values('names')
+    )
+    comments = (
+        Comment.objects.filter(
+            content_type=ContentType.objects.get_for_model(Ticket),
+            object_id=OuterRef('pk'),
+            is_internal=False,
+        )
+        .order_by()
+        .values('object_id')
+        .annotate(texts=StringAgg('text', '\n', ordering='created_at'))
+        .values('texts')
+    )
+    parts = [
+        ('A', F('title')),
+        ('B', F('description')),
+        ('C', Subquery(tags, output_field=TextField())),
+        ('D', Subquery(comments, output_field=TextField())),
+    ]
+    vector = None
+    for config in SEARCH_CONFIGS:
+        for weight, text in parts:
+            part = SearchVector(text, config=config, weight=weight)
+            vector = part if vector is None else vector + part
+    return vector
+
+
+def index_tickets(ticket_ids):
+    """(Re)index the given tickets"""
+    ticket_ids = list(ticket_ids)
+    if not ticket_ids:
+        return
+    vendor = connection.vendor
+    if vendor == 'postgresql':
+        Ticket.objects.filter(pk__in=ticket_ids).update(search_vector=_vector())
+        return
+    if vendor != 'sqlite':
+        return
+
+    documents = build_documents(ticket_ids)
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in ticket_ids])
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, description, tags, comments) VALUES (%s, %s, %s, %s, %s)',
+            [
+                (pk, doc['title'], doc['description'], ' '.join(doc['tags']), '\n'.join(doc['comments']))
+                for pk, doc in documents.items()
+            ]
+        )
+
+
+def index_ticket(ticket_id):
+    index_tickets([ticket_id])
+
+
+def remove_from_index(ticket_id):
+    """Drop a deleted ticket from the SQLite index (PostgreSQL keeps it in the row)"""
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [ticket_id])
+
+
+def clear_index():
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+
+def _search_query(query):
+    """Match in either language, with web search syntax ("phrase", -word, or)"""
+    combined = None
+    for config in SEARCH_CONFIGS:
+        part = SearchQuery(query, config=config, search_type='websearch')
+        combined = part if combined is None else combined | part
+    return combined
+
+
+def _fts_match(query):
+    """FTS5 MATCH expression: every word must match, as a prefix"""
+    words = re.findall(r'\w+', query)
+    return ' '.join('"%s"*' % word for word in words)
+
+
+def search_tickets(tickets, query):
+    """
+    Tickets of `tickets` matching `query`, annotated with a relevance
+    `rank` (higher is better)
+    """
+    query = query.strip()
+    vendor = connection.vendor
+
+    if vendor == 'postgresql':
+        search_query = _search_query(query)
+        return tickets.filter(search_vector=search_query).annotate(
+            # Double precision so the rank survives a round trip in a page cursor
+            rank=Cast(SearchRank(F('search_vector'), search_query), FloatField())
+        )
+
+    if vendor == 'sqlite':
+        match = _fts_match(query)
+        if not match:
+            return tickets.none()
+        table = Ticket._meta.db_table
+        return tickets.filter(
+            pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (match,))
+        ).annotate(
+            # bm25() is lower for better matches; columns weighted like on PostgreSQL
+            rank=RawSQL(
+                f'SELECT -bm25({FTS_TABLE}, 10.0, 4.0, 2.0, 1.0) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s AND rowid = "{table}"."id"',
+                (match,),
+                output_field=FloatField(),
+            )
+        )
+
+    return tickets.filter(
+        Q(title__icontains=query) | Q(description__icontains=query)
+    ).annotate(rank=Value(0.0, output_field=FloatField()))
+
+
+def highlight(text):
+    """Escape a snippet and turn the match markers into <mark> tags"""
+    text = escape(text)
+    return mark_safe(text.replace(START_SEL, '<mark>').replace(STOP_SEL, '</mark>'))
+
+
+def add_snippets(tickets, query):
+    """
+    Set `snippet` on each ticket of a page: an extract of the matching text
+    with the matches highlighted, computed for this page only
+    """
+    tickets = list(tickets)
+    if not tickets:
+        return tickets
+    ids = [ticket.pk for ticket in tickets]
+    vendor = connection.vendor
+
+    if vendor == 'postgresql':
+        snippets = dict(
+            Ticket.objects.filter(pk__in=ids).annotate(
+                snippet=SearchHeadline(
+                    'description',
+                    _search_query(query.strip()),
+                    start_sel=START_SEL,
+                    stop_sel=STOP_SEL,
+                    max_fragments=2,
+                    max_words=25,
+                    min_words=10,
+                )
+            ).values_list('pk', 'snippet')
+        )
+    elif vendor == 'sqlite' and _fts_match(query):
+        placeholders = ', '.join(['%s'] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, snippet({FTS_TABLE}, -1, %s, %s, '...', 20) FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH %s AND rowid IN ({placeholders})",
+                [START_SEL, STOP_SEL, _fts_match(query), *ids]
+            )
+            snippets = dict(cursor.fetchall())
+    else:
+        snippets = {}
+
+    for ticket in tickets:
+        text = snippets.get(ticket.pk) or Truncator(ticket.description).chars(150)
+        ticket.snippet = highlight(text)
+    return tickets
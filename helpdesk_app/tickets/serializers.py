@@ -0,0 +1,103 @@
+"""
+Serializers of the read-only REST API (/api/v1/).
+"""
+from rest_framework import serializers
+
+from accounts.models import User
+from comments.models import Comment
+
+from .models import Category, Department, SubDepartment, Tag, Ticket, TicketHistory
+
+
+class SparseFieldsMixin:
+    """
+    Serialize only the fields listed in the `fields` context entry (all
+    fields when it is missing)
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get('fields')
+        if requested:
+            for name in set(self.fields) - set(requested):
+                self.fields.pop(name)
+
+
+class UserSummarySerializer(serializers.ModelSerializer):
+    full_name = serializers.CharField(source='get_full_name')
+
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'full_name', 'email']
+
+
+class CategorySummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Category
+        fields = ['id', 'name']
+
+
+class DepartmentSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Department
+        fields = ['id', 'name', 'code']
+
+
+class SubDepartmentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SubDepartment
+        fields = ['id', 'name', 'code', 'description']
+
+
+class TagSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Tag
+        fields = ['id', 'name', 'color']
+
+
+class TicketSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    created_by = UserSummarySerializer(read_only=True)
+    assigned_to = UserSummarySerializer(read_only=True)
+    category = CategorySummarySerializer(read_only=True)
+    department = DepartmentSummarySerializer(read_only=True)
+    subdepartment = SubDepartmentSerializer(read_only=True)
+    tags = TagSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Ticket
+        fields = [
+            'id', 'title', 'description', 'status', 'priority', 'branch', 'office_door_number',
+            'category', 'department', 'subdepartment', 'created_by', 'assigned_to', 'tags',
+            'created_at', 'updated_at', 'response_due_at', 'due_date', 'resolved_at', 'closed_at',
+            'first_response_at', 'last_activity_at', 'comment_count', 'sla_breach', 'is_public',
+        ]
+
+
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    author = UserSummarySerializer(read_only=True)
+
+    class Meta:
+        model = Comment
+        fields = ['id', 'author', 'text', 'is_internal', 'is_edited', 'created_at', 'updated_at']
+
+
+class TicketHistorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    user = UserSummarySerializer(read_only=True)
+
+    class Meta:
+        model = TicketHistory
+        fields = ['id', 'user', 'field_changed', 'old_value', 'new_value', 'timestamp']
+
+
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'description', 'parent', 'icon', 'color']
+
+
+class DepartmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    subdepartments = SubDepartmentSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Department
+        fields = ['id', 'name', 'code', 'description', 'subdepartments']
@@ -0,0 +1,95 @@
+"""
+Ticket workflows shared by the views and other entry points.
+"""
+from django.db import transaction
+from django.utils.translation import gettext as _
+
+from .history import write_history
+from .models import Category, Department, SubDepartment, Ticket, TicketAttachment, TicketHistory
+
+
+class TicketValidationError(Exception):
+    """Submitted ticket data is invalid; `errors` lists the messages"""
+
+    def __init__(self, errors):
+        super().__init__(' '.join(str(error) for error in errors))
+        self.errors = errors
+
+
+def _lookup(model, value, error, errors):
+    """The instance of `model` with the submitted id (one query), None when no id was given"""
+    if not value:
+        return None
+    instance = model.objects.filter(pk=value).first() if str(value).isdigit() else None
+    if instance is None:
+        errors.append(error)
+    return instance
+
+
+def create_ticket(user, data, files=()):
+    """
+    Create a ticket for `user` from submitted `data` (title, description,
+    branch, priority, office_door_number, category, department,
+    subdepartment) with the uploaded `files` attached.
+
+    Everything is validated before anything is written. The ticket is then
+    inserted once, and its history and attachments are bulk inserted, in one
+    transaction; the post_save receivers therefore run once and the
+    ticket_created signal (notifications) is sent once, after commit.
+    Raises TicketValidationError.
+    """
+    errors = []
+    title = (data.get('title') or '').strip()
+    description = (data.get('description') or '').strip()
+    if not title or not description:
+        errors.append(_("Please fill out all required fields."))
+
+    branch = data.get('branch') or Ticket.Branch.SIEGE
+    if branch not in dict(Ticket.Branch.choices):
+        errors.append(_("Invalid branch selected."))
+    priority = data.get('priority') or Ticket.Priority.MEDIUM
+    if priority not in dict(Ticket.Priority.choices):
+        errors.append(_("Invalid priority selected."))
+
+    category = _lookup(Category, data.get('category'), _("Selected category does not exist."), errors)
+    department = _lookup(Department, data.get('department'), _("Selected department does not exist."), errors)
+    subdepartment = _lookup(
+        SubDepartment, data.get('subdepartment'), _("Selected sub-department does not exist."), errors
+    )
+    if department and subdepartment and subdepartment.department_id != department.pk:
+        errors.append(_("The sub-department does not belong to the selected department."))
+
+    if errors:
+        raise TicketValidationError(errors)
+
+    with transaction.atomic():
+        ticket = Ticket.objects.create(
+            title=title,
+            description=description,
+            branch=branch,
+            priority=priority,
+            status=Ticket.Status.NEW,
+            office_door_number=data.get('office_door_number') or None,
+            category=category,
+            department=department,
+            subdepartment=subdepartment,
+            created_by=user,
+        )
+
+        history = [
+            TicketHistory(ticket=ticket, user=user, field_changed='status', new_value=ticket.get_status_display())
+        ]
+        for field, value in (('department', department), ('subdepartment', subdepartment)):
+            if value:
+                history.append(TicketHistory(ticket=ticket, user=user, field_changed=field, new_value=str(value)))
+        write_history(history)
+
+        attachments = [
+            TicketAttachment(ticket=ticket, file=file, uploaded_by=user, description=file.name[:255])
+            for file in files
+        ]
+        # bulk_create does not call save(), which stores the uploads as blobs
+        for attachment in attachments:
+            attachment.store_file()
+        TicketAttachment.objects.bulk_create(attachments)
+    return ticket
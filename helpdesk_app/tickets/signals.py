@@ -1,5 +1,7 @@
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.db import transaction
+from django.dispatch import Signal, receiver
 from django.contrib.contenttypes.models import ContentType
 from django.utils.translation import gettext as _
 from django.core.mail import send_mail, EmailMultiAlternatives
@@ -8,10 +10,23 @@ from django.conf import settings
 from django.urls import reverse
 from django.utils import timezone
 
-from .models import Ticket, TicketHistory
+from .models import Ticket, TicketAttachment, TicketHistory, Category, Department, SubDepartment, Tag, SLA
+from .stats import mark_dirty
+from .search import SEARCH_FIELDS, index_ticket, index_tickets, remove_from_index
+from .workload import WORKLOAD_FIELDS, apply_workload, ticket_slots, workload_delta, workload_slot
 from accounts.models import User
-from comments.models import Comment
-from core.models import EmailLog, EmailSetting
+from comments.models import Comment, CommentAttachment
+from core.blobs import register_blob_references
+from core.cache import register_namespace
+from core.tree import register_tree
+from core.activity import build_comment_event, build_event, build_history_event
+from core.models import ActivityEvent, EmailLog, EmailSetting
+
+# Cached data derived from these models is keyed in versioned namespaces
+register_namespace('tickets', Ticket, TicketHistory, Comment)
+register_namespace('reference', Category, Department, SubDepartment, Tag, SLA)
+register_tree(Category)
+register_blob_references(TicketAttachment, CommentAttachment)
 
 def get_email_settings():
     """
@@ -118,77 +133,169 @@ def send_notification_email(subject, template_name, context, recipient_list, ema
             email_log.save()
 
 
+# Sent once for every new ticket, after the transaction that created it commits
+ticket_created = Signal()
+
+
+def ticket_url(ticket):
+    site_domain = settings.SITE_URL if hasattr(settings, 'SITE_URL') else "http://localhost:8000"
+    return f"{site_domain}{reverse('tickets:ticket-detail', kwargs={'pk': ticket.pk})}"
+
+
 @receiver(post_save, sender=Ticket)
 def ticket_notification(sender, instance, created, **kwargs):
     """
-    Send email notifications when tickets are created or updated
+    Send email notifications when tickets are updated, and announce new
+    tickets once their transaction is committed
     """
-    # Get the site domain for use in URLs
-    site_domain = settings.SITE_URL if hasattr(settings, 'SITE_URL') else "http://localhost:8000"
+    if created:
+        transaction.on_commit(lambda: ticket_created.send(sender=Ticket, ticket=instance))
+        return
     
     # Prepare context data common to all emails
     context = {
         'ticket': instance,
-        'ticket_url': f"{site_domain}{reverse('tickets:ticket-detail', kwargs={'pk': instance.pk})}",
+        'ticket_url': ticket_url(instance),
     }
     
-    if created:
-        # Send notification to all agents for a new ticket
-        agents = User.objects.filter(user_type=User.UserType.AGENT)
-        agent_emails = [agent.email for agent in agents if agent.email]
-        
-        if agent_emails:
-            send_notification_email(
-                subject=f"[CFC Helpdesk] {_('New Ticket')}: {instance.title}",
-                template_name='ticket_created_agent',
-                context=context,
-                recipient_list=agent_emails,
-                email_type='ticket_created',
-                related_object_id=instance.pk,
-                related_object_type='ticket'
-            )
-        
-        # Send confirmation to the ticket creator
-        if instance.created_by and instance.created_by.email:
-            send_notification_email(
-                subject=f"[CFC Helpdesk] {_('Your ticket has been created')}: {instance.title}",
-                template_name='ticket_created_customer',
-                context=context,
-                recipient_list=[instance.created_by.email],
-                email_type='ticket_created',
-                related_object_id=instance.pk,
-                related_object_type='ticket'
-            )
-    else:
-        # Get the latest history entry to determine what changed
+    # Changes recorded by this save, or else the latest recorded change
+    changes = getattr(instance, 'recorded_changes', None)
+    if changes is None:
         latest_change = TicketHistory.objects.filter(ticket=instance).order_by('-timestamp').first()
-        
-        if latest_change:
-            context['change'] = latest_change
-            
-            # If the ticket is assigned to an agent, notify them
-            if instance.assigned_to and instance.assigned_to.email and latest_change.field_changed == 'assigned_to':
-                send_notification_email(
-                    subject=f"[CFC Helpdesk] {_('Ticket Assigned to You')}: {instance.title}",
-                    template_name='ticket_assigned',
-                    context=context,
-                    recipient_list=[instance.assigned_to.email],
-                    email_type='ticket_assigned',
-                    related_object_id=instance.pk,
-                    related_object_type='ticket'
-                )
-            
-            # Notify the customer of status changes
-            if instance.created_by and instance.created_by.email and latest_change.field_changed == 'status':
-                send_notification_email(
-                    subject=f"[CFC Helpdesk] {_('Ticket Status Updated')}: {instance.title}",
-                    template_name='ticket_status_update',
-                    context=context, 
-                    recipient_list=[instance.created_by.email],
-                    email_type='status_change',
-                    related_object_id=instance.pk,
-                    related_object_type='ticket'
-                )
+        changes = {latest_change.field_changed: latest_change} if latest_change else {}
+    
+    # If the ticket is assigned to an agent, notify them
+    if instance.assigned_to and instance.assigned_to.email and 'assigned_to' in changes:
+        send_notification_email(
+            subject=f"[CFC Helpdesk] {_('Ticket Assigned to You')}: {instance.title}",
+            template_name='ticket_assigned',
+            context={**context, 'change': changes['assigned_to']},
+            recipient_list=[instance.assigned_to.email],
+            email_type='ticket_assigned',
+            related_object_id=instance.pk,
+            related_object_type='ticket'
+        )
+    
+    # Notify the customer of status changes
+    if instance.created_by and instance.created_by.email and 'status' in changes:
+        send_notification_email(
+            subject=f"[CFC Helpdesk] {_('Ticket Status Updated')}: {instance.title}",
+            template_name='ticket_status_update',
+            context={**context, 'change': changes['status']}, 
+            recipient_list=[instance.created_by.email],
+            email_type='status_change',
+            related_object_id=instance.pk,
+            related_object_type='ticket'
+        )
+
+
+@receiver(ticket_created)
+def ticket_created_notification(sender, ticket, **kwargs):
+    """
+    Notify the agents of a new ticket and confirm it to its creator
+    """
+    context = {
+        'ticket': ticket,
+        'ticket_url': ticket_url(ticket),
+    }
+    
+    # Send notification to all agents for a new ticket
+    agent_emails = list(
+        User.objects.filter(user_type=User.UserType.AGENT).exclude(email='').values_list('email', flat=True)
+    )
+    if agent_emails:
+        send_notification_email(
+            subject=f"[CFC Helpdesk] {_('New Ticket')}: {ticket.title}",
+            template_name='ticket_created_agent',
+            context=context,
+            recipient_list=agent_emails,
+            email_type='ticket_created',
+            related_object_id=ticket.pk,
+            related_object_type='ticket'
+        )
+    
+    # Send confirmation to the ticket creator
+    if ticket.created_by and ticket.created_by.email:
+        send_notification_email(
+            subject=f"[CFC Helpdesk] {_('Your ticket has been created')}: {ticket.title}",
+            template_name='ticket_created_customer',
+            context=context,
+            recipient_list=[ticket.created_by.email],
+            email_type='ticket_created',
+            related_object_id=ticket.pk,
+            related_object_type='ticket'
+        )
+
+
+@receiver(post_save, sender=Ticket)
+def ticket_stats_changed(sender, instance, **kwargs):
+    """
+    Mark the statistics days touched by a ticket save, including the days
+    its resolution or closing dates were moved away from
+    """
+    dates = instance.report_dates()
+    mark_dirty(dates | getattr(instance, '_loaded_report_dates', set()))
+    instance._loaded_report_dates = dates
+
+
+@receiver(post_save, sender=Ticket)
+def ticket_workload_changed(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Move the ticket between the workload counters of its agents when its
+    assignee, status or priority changed
+    """
+    if update_fields is not None and not WORKLOAD_FIELDS.intersection(update_fields):
+        return
+    delta = workload_delta(*ticket_slots(instance, created))
+    # Counted already by the reservation of an automatic assignment
+    reserved = instance.__dict__.pop('reserved_workload', None)
+    if reserved:
+        delta[reserved] -= 1
+    apply_workload(delta)
+
+
+@receiver(post_delete, sender=Ticket)
+def ticket_workload_deleted(sender, instance, **kwargs):
+    apply_workload(workload_delta(workload_slot(instance.assigned_to_id, instance.status, instance.priority), None))
+
+
+@receiver(post_save, sender=Ticket)
+def ticket_created_activity(sender, instance, created, **kwargs):
+    if created:
+        build_event(instance, instance.created_by, ActivityEvent.Verb.CREATED, 'Ticket created').save()
+
+
+@receiver(post_save, sender=TicketHistory)
+def history_activity(sender, instance, created, **kwargs):
+    """
+    Every recorded change also goes to the activity stream
+    """
+    if created:
+        build_history_event(instance).save()
+
+
+@receiver(post_delete, sender=Ticket)
+def ticket_stats_deleted(sender, instance, **kwargs):
+    mark_dirty(instance.report_dates())
+
+
+def record_comment_activity(ticket, comment):
+    """
+    Update the denormalized activity columns of a ticket for a new comment.
+    Uses conditional UPDATEs so concurrent comments cannot overwrite each other.
+    """
+    Ticket.objects.filter(pk=ticket.pk).update(
+        comment_count=F('comment_count') + 1,
+        last_activity_at=comment.created_at,
+        updated_at=timezone.now(),
+    )
+    
+    # The first reply from support staff (other than the requester) is the response time
+    if comment.author_id != ticket.created_by_id and comment.author.is_support_staff:
+        Ticket.objects.filter(pk=ticket.pk, first_response_at__isnull=True).update(
+            first_response_at=comment.created_at,
+            first_responder=comment.author,
+        )
 
 
 @receiver(post_save, sender=Comment)
@@ -211,6 +318,9 @@ def comment_notification(sender, instance, created, **kwargs):
     except Ticket.DoesNotExist:
         return
     
+    record_comment_activity(ticket, instance)
+    build_comment_event(ticket, instance).save()
+    
     # Get the site domain for use in URLs
     site_domain = settings.SITE_URL if hasattr(settings, 'SITE_URL') else "http://localhost:8000"
     
@@ -263,4 +373,66 @@ def comment_notification(sender, instance, created, **kwargs):
                 email_type='comment_added',
                 related_object_id=instance.pk,
                 related_object_type='comment'
-            )
\ No newline at end of file
+            )
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    """
+    Keep the ticket comment counter in sync when a comment is removed
+    """
+    ticket_type = ContentType.objects.get_for_model(Ticket)
+    if instance.content_type_id != ticket_type.id:
+        return
+    
+    Ticket.objects.filter(pk=instance.object_id, comment_count__gt=0).update(
+        comment_count=F('comment_count') - 1,
+        updated_at=timezone.now(),
+    )
+
+
+@receiver(post_save, sender=Ticket)
+def ticket_search_index(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Reindex a new ticket, or one whose title or description may have
+    changed; saves limited to other fields leave the document as it is
+    """
+    if not created and update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    index_ticket(instance.pk)
+
+
+@receiver(post_delete, sender=Ticket)
+def ticket_search_remove(sender, instance, **kwargs):
+    remove_from_index(instance.pk)
+
+
+@receiver(m2m_changed, sender=Ticket.tags.through)
+def ticket_tags_search_index(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Tag names are part of the search document
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        index_ticket(instance.pk)
+    elif pk_set:
+        index_tickets(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+def tag_search_index(sender, instance, created, **kwargs):
+    if not created:
+        index_tickets(instance.tickets.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_search_index(sender, instance, **kwargs):
+    """
+    Public comments are part of the search document of their ticket
+    """
+    ticket_type = ContentType.objects.get_for_model(Ticket)
+    if instance.content_type_id == ticket_type.id and not instance.is_internal:
+        index_ticket(instance.object_id)
+
@@ -0,0 +1,300 @@
+"""
+Offline replay of assignment strategies.
+
+Tickets, recorded or generated, are replayed through a discrete-event
+simulation of the agents. A ticket arrives at its creation time and waits
+in the queue (by priority, then arrival) until the strategy gives it to an
+agent with a free slot. It then holds the slot for its service time. An
+agent working outside its expertise takes longer (EXPERTISE_SLOWDOWN). The
+run reports throughput, queue wait percentiles and the variance of the
+share of its capacity each agent had in use, so that routing can be compared without touching production.
+
+Strategies are classes registered with @register_strategy; they pick one
+agent among those with a free slot.
+"""
+import heapq
+import math
+import random
+import statistics
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from django.db.models import Min
+
+from core.tree import get_tree, tree_path
+
+from .assignment import LOAD_COST, NO_EXPERTISE_COST, PRIORITY_WEIGHT, expertise_cost
+from .models import Category, Ticket, TicketHistory
+
+# Times are in seconds from the first arrival
+SimTicket = namedtuple('SimTicket', 'pk arrival category priority service')
+
+PRIORITY_RANK = {
+    Ticket.Priority.CRITICAL: 0,
+    Ticket.Priority.HIGH: 1,
+    Ticket.Priority.MEDIUM: 2,
+    Ticket.Priority.LOW: 3,
+}
+
+# Service time of a ticket handled without the expertise, relative to an expert
+EXPERTISE_SLOWDOWN = 0.5
+# Service time of recorded tickets never resolved
+DEFAULT_SERVICE = timedelta(hours=8).total_seconds()
+
+STRATEGIES = {}
+
+
+class SimAgent:
+    __slots__ = ('index', 'pk', 'capacity', 'expertise', 'open', 'handled', 'busy')
+
+    def __init__(self, index, pk, capacity, expertise):
+        self.index = index
+        self.pk = pk
+        self.capacity = capacity
+        self.expertise = frozenset(expertise)
+        self.open = 0
+        self.handled = 0
+        # Slot-seconds spent on tickets
+        self.busy = 0.0
+
+
+def register_strategy(name):
+    """Class decorator adding an assignment strategy to the replay"""
+    def register(cls):
+        cls.name = name
+        STRATEGIES[name] = cls
+        return cls
+    return register
+
+
+class Strategy:
+    """Chooses the agent of a ticket among the agents with a free slot"""
+    name = None
+
+    def __init__(self, agents, costs):
+        self.agents = agents
+        # costs[category][agent index]: expertise cost (tickets.assignment.expertise_cost)
+        self.costs = costs
+
+    def choose(self, ticket, available):
+        raise NotImplementedError
+
+
+@register_strategy('current')
+class CurrentStrategy(Strategy):
+    """find_available_agent: experts of the category or a parent first, then the fewest open tickets"""
+
+    def choose(self, ticket, available):
+        costs = self.costs[ticket.category]
+        return min(available, key=lambda agent: (costs[agent.index] == NO_EXPERTISE_COST, agent.open, agent.pk))
+
+
+@register_strategy('round-robin')
+class RoundRobinStrategy(Strategy):
+    """Each agent in turn, skipping the full ones"""
+
+    def __init__(self, agents, costs):
+        super().__init__(agents, costs)
+        self.next = 0
+
+    def choose(self, ticket, available):
+        count = len(self.agents)
+        agent = min(available, key=lambda agent: (agent.index - self.next) % count)
+        self.next = (agent.index + 1) % count
+        return agent
+
+
+@register_strategy('least-loaded')
+class LeastLoadedStrategy(Strategy):
+    """The smallest share of its capacity in use, whatever the expertise"""
+
+    def choose(self, ticket, available):
+        return min(available, key=lambda agent: (agent.open / agent.capacity, agent.pk))
+
+
+@register_strategy('expertise-weighted')
+class ExpertiseWeightedStrategy(Strategy):
+    """Greedy version of the backlog matching costs: expertise weighted by priority, plus load"""
+
+    def choose(self, ticket, available):
+        costs = self.costs[ticket.category]
+        weight = PRIORITY_WEIGHT.get(ticket.priority, 1)
+        return min(available, key=lambda agent: (
+            costs[agent.index] * weight + LOAD_COST * agent.open // agent.capacity, agent.pk
+        ))
+
+
+def expertise_costs(agents, paths):
+    """{category: [expertise cost of each agent]} from the category paths (root first)"""
+    return {
+        category: [expertise_cost(path, agent.expertise) for agent in agents]
+        for category, path in paths.items()
+    }
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of a sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def simulate(tickets, agents, strategy, costs):
+    """
+    Replay `tickets` (SimTicket, by arrival) with the `strategy` class on
+    fresh copies of `agents`; returns the metrics of the run
+    """
+    agents = [SimAgent(agent.index, agent.pk, agent.capacity, agent.expertise) for agent in agents]
+    choose = strategy(agents, costs).choose
+    available = {agent.index: agent for agent in agents if agent.capacity > 0}
+    queue = []
+    completions = []
+    waits = []
+    experts = 0
+    last_event = 0.0
+
+    def dispatch(now):
+        nonlocal experts
+        while queue and available:
+            ticket = heapq.heappop(queue)[-1]
+            agent = choose(ticket, list(available.values()))
+            cost = costs[ticket.category][agent.index]
+            experts += cost == 0
+            service = ticket.service * (1 + EXPERTISE_SLOWDOWN * cost / NO_EXPERTISE_COST)
+            waits.append(now - ticket.arrival)
+            agent.open += 1
+            agent.handled += 1
+            agent.busy += service
+            if agent.open >= agent.capacity:
+                del available[agent.index]
+            heapq.heappush(completions, (now + service, ticket.pk, agent.index))
+
+    def complete_until(time):
+        nonlocal last_event
+        while completions and completions[0][0] <= time:
+            finished, _, index = heapq.heappop(completions)
+            agent = agents[index]
+            agent.open -= 1
+            available[index] = agent
+            last_event = finished
+            dispatch(finished)
+
+    for ticket in tickets:
+        complete_until(ticket.arrival)
+        heapq.heappush(queue, (PRIORITY_RANK.get(ticket.priority, len(PRIORITY_RANK)), ticket.arrival, ticket.pk, ticket))
+        dispatch(ticket.arrival)
+    complete_until(math.inf)
+
+    span = max(last_event, tickets[-1].arrival if tickets else 0.0) or 1.0
+    waits.sort()
+    # Share of its capacity each agent had in use over the run
+    loads = [agent.busy / (agent.capacity * span) for agent in agents if agent.capacity]
+    return {
+        'strategy': strategy.name,
+        'tickets': len(tickets),
+        'assigned': len(waits),
+        'throughput_per_day': len(waits) / (span / 86400),
+        'wait_p50_hours': percentile(waits, 0.5) / 3600,
+        'wait_p90_hours': percentile(waits, 0.9) / 3600,
+        'wait_p99_hours': percentile(waits, 0.99) / 3600,
+        'expert_share': experts / len(waits) if waits else 0.0,
+        'load_variance': statistics.pvariance(loads) if len(loads) > 1 else 0.0,
+        'utilization': sum(agent.busy for agent in agents) / (sum(agent.capacity for agent in agents) * span or 1),
+        'handled': {agent.pk: agent.handled for agent in agents},
+    }
+
+
+def replay(tickets, agents, paths, strategies=None):
+    """Metrics of every strategy (default all) on the same tickets and agents"""
+    costs = expertise_costs(agents, paths)
+    return [simulate(tickets, agents, STRATEGIES[name], costs) for name in (strategies or STRATEGIES)]
+
+
+def generate_dataset(count, agent_count=50, category_count=30, seed=0, utilization=0.75):
+    """
+    A seeded synthetic history: a two-level category tree, agents with
+    two to five expertise categories and 5 to 20 slots, and `count`
+    tickets arriving as a Poisson process that keeps the agents about
+    `utilization` busy. Returns (tickets, agents, paths).
+    """
+    rng = random.Random(seed)
+    roots = max(1, category_count // 5)
+    parents = {pk: None if pk <= roots else rng.randint(1, roots) for pk in range(1, category_count + 1)}
+    paths = {None: []}
+    for pk in parents:
+        path, node = [], pk
+        while node is not None:
+            path.append(node)
+            node = parents[node]
+        paths[pk] = path[::-1]
+
+    agents = [
+        SimAgent(index, 1000 + index, rng.randint(5, 20), rng.sample(range(1, category_count + 1), rng.randint(2, 5)))
+        for index in range(agent_count)
+    ]
+    mean_service = timedelta(hours=6).total_seconds()
+    rate = utilization * sum(agent.capacity for agent in agents) / mean_service
+    categories = [None, *parents]
+    priorities = (Ticket.Priority.LOW, Ticket.Priority.MEDIUM, Ticket.Priority.HIGH, Ticket.Priority.CRITICAL)
+
+    tickets = []
+    arrival = 0.0
+    for pk in range(1, count + 1):
+        arrival += rng.expovariate(rate)
+        tickets.append(SimTicket(
+            pk,
+            arrival,
+            rng.choice(categories),
+            rng.choices(priorities, weights=(30, 45, 20, 5))[0],
+            rng.lognormvariate(math.log(mean_service) - 0.5, 1.0),
+        ))
+    return tickets, agents, paths
+
+
+def load_history(since=None, until=None):
+    """
+    The recorded tickets as (tickets, agents, paths, recorded waits). The
+    service time of a ticket runs from its first assignment (TicketHistory)
+    to its resolution or closing; the recorded waits, from its creation to
+    that first assignment, give the baseline of the replay.
+    """
+    from accounts.models import AgentProfile, User
+
+    rows = Ticket.objects.order_by('created_at', 'pk')
+    if since:
+        rows = rows.filter(created_at__gte=since)
+    if until:
+        rows = rows.filter(created_at__lt=until)
+    first_assigned = dict(
+        TicketHistory.objects.filter(field_changed='assigned_to', ticket__in=rows)
+        .values('ticket').annotate(first=Min('timestamp')).order_by().values_list('ticket', 'first')
+    )
+
+    tickets, waits = [], []
+    start = None
+    fields = ('pk', 'created_at', 'category_id', 'priority', 'resolved_at', 'closed_at')
+    for pk, created, category, priority, resolved, closed in rows.values_list(*fields).iterator(chunk_size=5000):
+        start = start or created
+        assigned = first_assigned.get(pk)
+        if assigned:
+            waits.append((assigned - created).total_seconds())
+        done = resolved or closed
+        service = (done - (assigned or created)).total_seconds() if done else DEFAULT_SERVICE
+        tickets.append(SimTicket(pk, (created - start).total_seconds(), category, priority, max(service, 60.0)))
+
+    # The agents assignment would consider, as in assignment.available_agents
+    profiles = AgentProfile.objects.filter(
+        user__is_active=True, user__user_type=User.UserType.AGENT, availability_status=True
+    ).order_by('pk')
+    expertise = defaultdict(set)
+    links = AgentProfile.expertise.through.objects.filter(agentprofile__in=profiles)
+    for agent_id, category_id in links.values_list('agentprofile_id', 'category_id'):
+        expertise[agent_id].add(category_id)
+    agents = [
+        SimAgent(index, pk, max_tickets, expertise[pk])
+        for index, (pk, max_tickets) in enumerate(profiles.values_list('pk', 'max_tickets'))
+    ]
+
+    paths = {pk: [node['id'] for node in tree_path(Category, pk)] for pk in get_tree(Category)}
+    paths[None] = []
+    return tickets, agents, paths, sorted(waits)
@@ -0,0 +1,238 @@
+"""
+SLA engine.
+
+Each ticket gets the most specific SLA policy matching its category (or a
+parent category), department and priority: a deeper category wins, then a
+department, then a priority. Its response deadline (response_due_at) and
+resolution deadline (due_date) are counted from the creation time, on the
+business calendar (SLA_BUSINESS_HOURS, SLA_BUSINESS_DAYS, SLA_HOLIDAYS, in
+TIME_ZONE) when the policy keeps business hours only.
+
+The clock stops while a ticket waits on the customer: sla_paused_at
+records when it started waiting, and on leaving that status the paused
+time is added to sla_paused_seconds and the deadlines move by as much.
+Deadlines are recomputed when the priority, category or department
+changes. They are stored as indexed columns, so flag_breaches finds the
+tickets past them with range queries.
+
+update_deadlines is called by Ticket.save() and by the bulk actions.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_time
+
+from core.cache import bump
+from core.tree import tree_path
+
+from .models import Category, Ticket
+from .reference import get_reference
+from .stats import mark_dirty
+
+# Fields written by update_deadlines
+SLA_FIELDS = ('sla', 'response_due_at', 'due_date', 'sla_paused_at', 'sla_paused_seconds')
+
+# Ticket fields the policy and the deadlines depend on
+POLICY_FIELDS = ('priority', 'category_id', 'department_id')
+
+# Statuses in which the SLA clock runs
+RUNNING_STATUSES = (Ticket.Status.NEW, Ticket.Status.OPEN, Ticket.Status.IN_PROGRESS)
+
+
+class BusinessCalendar:
+    """Opening hours of the weekdays `days` (Monday is 0), except `holidays`, in `tz`"""
+
+    def __init__(self, opens, closes, days, holidays=(), tz=None):
+        self.opens = opens
+        self.closes = closes
+        self.days = frozenset(days)
+        self.holidays = frozenset(holidays)
+        self.tz = tz or timezone.get_default_timezone()
+
+    def windows(self, start):
+        """The opening (start, end) of each business day, from the day of `start` on"""
+        day = start.astimezone(self.tz).date()
+        # Bounded so that a calendar without any business day cannot loop forever
+        for _ in range(3660):
+            if day.weekday() in self.days and day not in self.holidays:
+                yield (
+                    datetime.combine(day, self.opens, tzinfo=self.tz),
+                    datetime.combine(day, self.closes, tzinfo=self.tz),
+                )
+            day += timedelta(days=1)
+
+    def add(self, start, seconds):
+        """The moment `seconds` of business time after `start`"""
+        if seconds <= 0:
+            return start
+        for opens, closes in self.windows(start):
+            begin = max(start, opens)
+            if begin >= closes:
+                continue
+            available = (closes - begin).total_seconds()
+            if seconds <= available:
+                return begin + timedelta(seconds=seconds)
+            seconds -= available
+        return None
+
+    def seconds_between(self, start, end):
+        """Business time between `start` and `end`, in seconds"""
+        total = 0.0
+        if end <= start:
+            return total
+        for opens, closes in self.windows(start):
+            if opens >= end:
+                break
+            total += max(0.0, (min(closes, end) - max(start, opens)).total_seconds())
+        return total
+
+
+def business_calendar():
+    opens, closes = getattr(settings, 'SLA_BUSINESS_HOURS', ('08:00', '17:00'))
+    return BusinessCalendar(
+        parse_time(opens) if isinstance(opens, str) else opens,
+        parse_time(closes) if isinstance(closes, str) else closes,
+        getattr(settings, 'SLA_BUSINESS_DAYS', (0, 1, 2, 3, 4)),
+        [parse_date(day) if isinstance(day, str) else day for day in getattr(settings, 'SLA_HOLIDAYS', ())],
+    )
+
+
+def add_sla_time(sla, start, seconds, calendar=None):
+    """The moment `seconds` of `sla` time (business time or not) after `start`"""
+    if not sla.business_hours_only:
+        return start + timedelta(seconds=seconds)
+    return (calendar or business_calendar()).add(start, seconds)
+
+
+def sla_time_between(sla, start, end, calendar=None):
+    """Seconds of `sla` time (business time or not) between `start` and `end`"""
+    if not sla.business_hours_only:
+        return max(0.0, (end - start).total_seconds())
+    return (calendar or business_calendar()).seconds_between(start, end)
+
+
+def find_sla(category_id, department_id, priority):
+    """The most specific policy for a ticket, None when no policy applies"""
+    path = [node['id'] for node in tree_path(Category, category_id)] if category_id else []
+    best, best_key = None, None
+    for sla in get_reference('slas'):
+        if sla.priority and sla.priority != priority:
+            continue
+        if sla.department_id and sla.department_id != department_id:
+            continue
+        if sla.category_id and sla.category_id not in path:
+            continue
+        depth = path.index(sla.category_id) + 1 if sla.category_id else 0
+        key = (depth, bool(sla.department_id), bool(sla.priority), -sla.pk)
+        if best_key is None or key > best_key:
+            best, best_key = sla, key
+    return best
+
+
+def get_sla(pk):
+    """The policy `pk` from the reference set"""
+    return next((sla for sla in get_reference('slas') if sla.pk == pk), None)
+
+
+def update_deadlines(ticket, now=None, recompute=False):
+    """
+    Bring the SLA fields of `ticket` up to date with its changes since it
+    was loaded (everything for a new ticket): pause or resume the clock
+    when it enters or leaves the waiting status, pick the policy and
+    recompute the deadlines when the priority, category or department
+    changed, or with `recompute`. Only sets the attributes, the caller
+    saves them.
+    """
+    values = ticket.__dict__
+    loaded = getattr(ticket, '_loaded_values', None)
+    if ticket._state.adding or loaded is None:
+        recompute = True
+    else:
+        recompute = recompute or any(
+            name in values and name in loaded and values[name] != loaded[name] for name in POLICY_FIELDS
+        )
+        status_changed = 'status' in values and values['status'] != loaded.get('status', values['status'])
+        if not (recompute or status_changed):
+            return
+
+    now = now or timezone.now()
+    calendar = business_calendar()
+    waiting = ticket.status == Ticket.Status.WAITING
+    if waiting and ticket.sla_paused_at is None:
+        ticket.sla_paused_at = now
+    elif not waiting and ticket.sla_paused_at is not None:
+        sla = get_sla(ticket.sla_id)
+        if sla is not None:
+            ticket.sla_paused_seconds += round(sla_time_between(sla, ticket.sla_paused_at, now, calendar))
+            recompute = True
+        ticket.sla_paused_at = None
+
+    if not recompute:
+        return
+    sla = find_sla(ticket.category_id, ticket.department_id, ticket.priority)
+    if sla is None:
+        if ticket.sla_id is not None:
+            # No policy applies any more: its deadlines go, a due date set by hand stays
+            ticket.sla_id = ticket.response_due_at = ticket.due_date = None
+        return
+    ticket.sla_id = sla.pk
+    start = ticket.created_at or now
+    paused = ticket.sla_paused_seconds
+    ticket.response_due_at = add_sla_time(sla, start, sla.get_response_time(ticket.priority) * 3600 + paused, calendar)
+    ticket.due_date = add_sla_time(sla, start, sla.get_resolution_time(ticket.priority) * 3600 + paused, calendar)
+
+
+def _sla_values(ticket):
+    return (ticket.sla_id, ticket.response_due_at, ticket.due_date, ticket.sla_paused_at, ticket.sla_paused_seconds)
+
+
+def recompute_deadlines(tickets=None):
+    """
+    Recompute the deadlines of `tickets` (default every ticket not yet
+    resolved), after a change of the policies or for tickets created
+    before them; returns the number of tickets updated
+    """
+    if tickets is None:
+        tickets = Ticket.objects.filter(status__in=(*RUNNING_STATUSES, Ticket.Status.WAITING))
+    now = timezone.now()
+    changed = []
+    dirty_dates = set()
+    fields = ('created_at', 'resolved_at', 'closed_at', 'status', *POLICY_FIELDS, *SLA_FIELDS)
+    for ticket in tickets.only(*fields).iterator(chunk_size=1000):
+        before = _sla_values(ticket)
+        update_deadlines(ticket, now, recompute=True)
+        if _sla_values(ticket) != before:
+            # updated_at is set explicitly, bulk_update does not apply auto_now
+            ticket.updated_at = now
+            changed.append(ticket)
+            dirty_dates |= ticket.report_dates()
+    with transaction.atomic():
+        Ticket.objects.bulk_update(changed, [*SLA_FIELDS, 'updated_at'], batch_size=1000)
+        # The due date is part of the daily statistics
+        mark_dirty(dirty_dates)
+    if changed:
+        bump('tickets')
+    return len(changed)
+
+
+def flag_breaches(now=None):
+    """
+    Flag the running tickets past their response or resolution deadline;
+    returns the number of tickets flagged. Each condition is a range on an
+    indexed deadline column. The days of the flagged tickets are marked
+    for the statistics rollup, which counts them as breached from then on.
+    """
+    now = now or timezone.now()
+    running = Ticket.objects.filter(sla_breach=False, status__in=RUNNING_STATUSES)
+    late = running.filter(due_date__lt=now) | running.filter(
+        response_due_at__lt=now, first_response_at__isnull=True
+    )
+    with transaction.atomic():
+        rows = list(late.select_for_update().order_by('pk').values_list('pk', 'created_at'))
+        flagged = Ticket.objects.filter(pk__in=[pk for pk, _ in rows]).update(sla_breach=True, updated_at=now)
+        mark_dirty(timezone.localdate(created_at) for _, created_at in rows)
+    if flagged:
+        bump('tickets')
+    return flagged
@@ -0,0 +1,169 @@
+"""
+Maintenance of the TicketDailyStats rollup.
+
+Ticket saves and deletes mark the days they touch as dirty; the
+refresh_ticket_stats command then rebuilds only those days from the
+ticket table, so the cost of a refresh follows the amount of change.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Ticket, TicketDailyStats, TicketStatsDirtyDate
+
+# Dimensions of a rollup row besides the date
+KEY_FIELDS = ('branch', 'priority', 'category', 'department')
+
+# Number of days rebuilt per transaction
+REFRESH_BATCH_DAYS = 31
+
+
+def breached_filter():
+    """Tickets that missed their SLA: flagged, or resolved/closed after the due date"""
+    return (
+        Q(sla_breach=True) |
+        Q(resolved_at__gt=F('due_date')) |
+        Q(resolved_at__isnull=True, closed_at__gt=F('due_date'))
+    )
+
+
+def to_seconds(value):
+    """Convert an aggregated duration to whole seconds (0 when there is no data)"""
+    if value is None:
+        return 0
+    if isinstance(value, timedelta):
+        return int(value.total_seconds())
+    # Some backends return the raw number of microseconds
+    return int(value) // 1000000
+
+
+def mark_dirty(dates):
+    """Flag days whose rollup rows must be rebuilt"""
+    dates = set(dates)
+    if dates:
+        TicketStatsDirtyDate.objects.bulk_create(
+            [TicketStatsDirtyDate(date=day) for day in dates],
+            ignore_conflicts=True,
+        )
+
+
+def day_ranges(days):
+    """Collapse dates into (start, end) datetime ranges of consecutive local days"""
+    tz = timezone.get_current_timezone()
+    ranges = []
+    for day in sorted(set(days)):
+        start = timezone.make_aware(datetime.combine(day, time.min), tz)
+        end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min), tz)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+def on_days(field, days):
+    """Q matching tickets whose `field` falls on one of the given days (index friendly)"""
+    query = Q()
+    for start, end in day_ranges(days):
+        query |= Q(**{f'{field}__gte': start, f'{field}__lt': end})
+    return query
+
+
+def _grouped(field, days, **aggregates):
+    """Aggregate tickets per (day of `field`, dimensions) for the given days"""
+    return (
+        Ticket.objects.filter(on_days(field, days))
+        .annotate(day=TruncDate(field))
+        .order_by().values('day', *KEY_FIELDS)
+        .annotate(**aggregates)
+    )
+
+
+def compute_days(days):
+    """Build (unsaved) rollup rows for the given days with three grouped queries"""
+    rows = {}
+
+    def row_for(values):
+        key = (values['day'],) + tuple(values[field] for field in KEY_FIELDS)
+        if key not in rows:
+            rows[key] = TicketDailyStats(
+                date=values['day'],
+                branch=values['branch'],
+                priority=values['priority'],
+                category_id=values['category'],
+                department_id=values['department'],
+            )
+        return rows[key]
+
+    for values in _grouped(
+        'created_at', days,
+        created=Count('id'),
+        due=Count('id', filter=Q(due_date__isnull=False)),
+        breached=Count('id', filter=breached_filter()),
+    ):
+        row = row_for(values)
+        row.created_count = values['created']
+        row.due_count = values['due']
+        row.breached_count = values['breached']
+
+    for values in _grouped(
+        'resolved_at', days,
+        resolved=Count('id'),
+        duration=Sum(ExpressionWrapper(F('resolved_at') - F('created_at'), output_field=DurationField())),
+    ):
+        row = row_for(values)
+        row.resolved_count = values['resolved']
+        row.resolution_seconds = to_seconds(values['duration'])
+
+    for values in _grouped('closed_at', days, closed=Count('id')):
+        row_for(values).closed_count = values['closed']
+
+    return list(rows.values())
+
+
+def refresh_days(days):
+    """Rebuild the rollup rows of the given days"""
+    days = sorted(set(days))
+    for i in range(0, len(days), REFRESH_BATCH_DAYS):
+        batch = days[i:i + REFRESH_BATCH_DAYS]
+        with transaction.atomic():
+            TicketDailyStats.objects.filter(date__in=batch).delete()
+            TicketDailyStats.objects.bulk_create(compute_days(batch), batch_size=1000)
+    return len(days)
+
+
+def refresh_dirty_days():
+    """
+    Rebuild every day marked dirty and clear the marks.
+    Marks are locked while their days are rebuilt, so concurrent refreshes
+    work on disjoint days and a mark added meanwhile is kept for the next run.
+    """
+    refreshed = 0
+    while True:
+        with transaction.atomic():
+            marks = list(
+                TicketStatsDirtyDate.objects.select_for_update(skip_locked=True)
+                .order_by('date')[:REFRESH_BATCH_DAYS]
+            )
+            if not marks:
+                break
+            refresh_days([mark.date for mark in marks])
+            TicketStatsDirtyDate.objects.filter(pk__in=[mark.pk for mark in marks]).delete()
+        refreshed += len(marks)
+    return refreshed
+
+
+def rebuild_all():
+    """Rebuild the whole rollup from the first ticket until today"""
+    first = Ticket.objects.order_by('created_at').values_list('created_at', flat=True).first()
+    with transaction.atomic():
+        TicketDailyStats.objects.all().delete()
+        TicketStatsDirtyDate.objects.all().delete()
+    if first is None:
+        return 0
+    start = timezone.localdate(first)
+    total = (timezone.localdate() - start).days + 1
+    return refresh_days(start + timedelta(days=i) for i in range(total))
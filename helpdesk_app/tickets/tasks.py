@@ -0,0 +1,20 @@
+from celery import shared_task
+
+from .sla import flag_breaches
+from .stats import refresh_dirty_days
+from .workload import reconcile_workloads
+
+
+@shared_task(ignore_result=True)
+def reconcile_agent_workloads():
+    reconcile_workloads()
+
+
+@shared_task(ignore_result=True)
+def check_sla_breaches():
+    flag_breaches()
+
+
+@shared_task(ignore_result=True)
+def refresh_ticket_stats():
+    refresh_dirty_days()
@@ -0,0 +1,130 @@
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from comments.models import Comment
+from tickets.models import Department, Ticket
+
+User = get_user_model()
+
+
+class TicketApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agent = User.objects.create_user(
+            username='apiagent',
+            email='apiagent@example.com',
+            password='password123',
+            user_type='agent',
+            is_staff=True
+        )
+        cls.customer = User.objects.create_user(
+            username='apicustomer',
+            email='apicustomer@example.com',
+            password='password123',
+            user_type='customer'
+        )
+        cls.tickets = [
+            Ticket.objects.create(
+                title=f'API ticket {i}',
+                description='API test',
+                status=Ticket.Status.OPEN,
+                branch=Ticket.Branch.SIEGE,
+                created_by=cls.customer if i < 2 else cls.agent,
+            )
+            for i in range(5)
+        ]
+        cls.department = Department.objects.create(name='IT', code='IT')
+
+    def setUp(self):
+        self.client.force_login(self.agent)
+
+    def get(self, url, params=None, **headers):
+        return self.client.get(url, params or {}, **headers)
+
+    def test_cursor_pagination(self):
+        url = reverse('api-v1:ticket-list')
+        response = self.get(url, {'page_size': 3})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        newest_first = [ticket.pk for ticket in reversed(self.tickets)]
+        self.assertEqual([row['id'] for row in data['results']], newest_first[:3])
+        self.assertIsNone(data['previous'])
+
+        data = self.client.get(data['next']).json()
+        self.assertEqual([row['id'] for row in data['results']], newest_first[3:])
+        self.assertIsNone(data['next'])
+
+        self.assertEqual(self.get(url, {'after': 'not-a-cursor'}).status_code, 404)
+
+    def test_sparse_fields(self):
+        response = self.get(reverse('api-v1:ticket-list'), {'fields': 'id,title,assigned_to'})
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'title', 'assigned_to'})
+
+        response = self.get(reverse('api-v1:ticket-list'), {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_customers_only_get_their_tickets(self):
+        self.client.force_login(self.customer)
+        data = self.get(reverse('api-v1:ticket-list')).json()
+        self.assertEqual(len(data['results']), 2)
+        other = self.tickets[4]
+        self.assertEqual(self.get(reverse('api-v1:ticket-detail', args=[other.pk])).status_code, 404)
+
+    def test_conditional_get(self):
+        url = reverse('api-v1:ticket-list')
+        etag = self.get(url)['ETag']
+
+        # The 304 does not look at the tickets
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertFalse([query for query in queries if 'tickets_ticket' in query['sql']])
+        self.assertNotEqual(self.get(url, {'status': Ticket.Status.OPEN})['ETag'], etag)
+
+        # A change to any ticket of the list gives a new version
+        ticket = self.tickets[0]
+        ticket.priority = Ticket.Priority.HIGH
+        with self.captureOnCommitCallbacks(execute=True):
+            ticket.save()
+        response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        detail = reverse('api-v1:ticket-detail', args=[ticket.pk])
+        etag = self.get(detail)['ETag']
+        self.assertEqual(self.get(detail, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_comments_and_history(self):
+        ticket = self.tickets[0]
+        for text, is_internal in (('Public answer', False), ('Internal note', True)):
+            Comment.objects.create(
+                content_type=ContentType.objects.get_for_model(Ticket),
+                object_id=ticket.pk,
+                author=self.agent,
+                text=text,
+                is_internal=is_internal,
+            )
+        url = reverse('api-v1:ticket-comments', args=[ticket.pk])
+        self.assertEqual(len(self.get(url).json()['results']), 2)
+
+        self.client.force_login(self.customer)
+        texts = [row['text'] for row in self.get(url).json()['results']]
+        self.assertEqual(texts, ['Public answer'])
+
+        ticket.history.create(user=self.agent, field_changed='status', old_value='New', new_value='Open')
+        data = self.get(reverse('api-v1:ticket-history', args=[ticket.pk])).json()
+        self.assertEqual(data['results'][0]['new_value'], 'Open')
+
+    def test_reference_data_etag(self):
+        url = reverse('api-v1:department-list')
+        response = self.get(url)
+        self.assertEqual(response.json()[0]['name'], 'IT')
+        etag = response['ETag']
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.department.name = 'Information Technology'
+        self.department.save()
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
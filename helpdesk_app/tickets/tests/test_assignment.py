@@ -0,0 +1,205 @@
+import random
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import AgentProfile
+from tickets import assignment
+from tickets.assignment import auto_assign, plan_assignment
+from tickets.models import AgentWorkload, Category, Ticket, TicketHistory
+
+User = get_user_model()
+
+
+class BacklogAssignmentTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(
+            username='backlogstaff',
+            email='backlogstaff@example.com',
+            password='password123',
+            user_type='agent',
+            is_staff=True
+        )
+        cls.customer = User.objects.create_user(
+            username='backlogcustomer',
+            email='backlogcustomer@example.com',
+            password='password123',
+            user_type='customer'
+        )
+        cls.network = Category.objects.create(name='Network')
+        cls.vpn = Category.objects.create(name='VPN', parent=cls.network)
+        cls.printers = Category.objects.create(name='Printers')
+        cls.network_agent = cls.agent('networkagent', cls.network, max_tickets=3)
+        cls.printer_agent = cls.agent('printeragent', cls.printers, max_tickets=3)
+
+    @classmethod
+    def agent(cls, username, expertise, max_tickets):
+        agent = User.objects.create_user(
+            username=username,
+            email=f'{username}@example.com',
+            password='password123',
+            user_type='agent'
+        )
+        profile = AgentProfile.objects.create(user=agent, max_tickets=max_tickets)
+        profile.expertise.add(expertise)
+        return agent
+
+    def ticket(self, category, priority=Ticket.Priority.MEDIUM, hours=0):
+        ticket = Ticket.objects.create(
+            title='Backlog', description='Waiting', category=category, priority=priority, created_by=self.customer
+        )
+        Ticket.objects.filter(pk=ticket.pk).update(created_at=timezone.now() - timedelta(hours=hours))
+        return ticket
+
+    def assign(self):
+        self.client.force_login(self.staff)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('tickets:ticket-assign-backlog'))
+
+    def assignees(self):
+        return dict(Ticket.objects.values_list('pk', 'assigned_to'))
+
+    def test_experts_and_urgent_tickets_first(self):
+        vpn = [self.ticket(self.vpn) for _ in range(2)]
+        printer = self.ticket(self.printers)
+        critical = self.ticket(self.printers, Ticket.Priority.CRITICAL)
+        low = [self.ticket(self.network, Ticket.Priority.LOW, hours=hours) for hours in (1, 30, 50)]
+
+        self.assertEqual(self.assign().status_code, 302)
+        assignees = self.assignees()
+        # Six slots for seven tickets: the newest low priority ticket waits
+        self.assertIsNone(assignees[low[0].pk])
+        self.assertEqual({assignees[ticket.pk] for ticket in vpn}, {self.network_agent.pk})
+        self.assertEqual({assignees[printer.pk], assignees[critical.pk]}, {self.printer_agent.pk})
+        self.assertEqual(AgentWorkload.objects.get(agent=self.network_agent).open_tickets, 3)
+        self.assertEqual(AgentWorkload.objects.get(agent=self.printer_agent).open_tickets, 3)
+        self.assertEqual(Ticket.objects.filter(status=Ticket.Status.OPEN).count(), 6)
+        self.assertTrue(TicketHistory.objects.filter(user=self.staff, field_changed='assigned_to').exists())
+
+    def test_only_staff_assign_the_backlog(self):
+        ticket = self.ticket(self.vpn)
+        self.client.force_login(self.network_agent)
+        self.client.post(reverse('tickets:ticket-assign-backlog'))
+        self.assertIsNone(self.assignees()[ticket.pk])
+
+    def test_agent_filled_meanwhile_is_skipped(self):
+        ticket = self.ticket(self.vpn)
+        AgentWorkload.objects.create(agent=self.network_agent, open_tickets=3, medium_tickets=3)
+        find_available_agent = assignment.find_available_agent
+
+        def stale(ticket, exclude):
+            # The network agent was chosen before a concurrent assignment took its last slot
+            return find_available_agent(ticket, exclude) if exclude else self.network_agent
+
+        with mock.patch.object(assignment, 'find_available_agent', stale):
+            self.assertEqual(auto_assign(ticket.pk, self.staff), self.printer_agent)
+        self.assertEqual(AgentWorkload.objects.get(agent=self.network_agent).open_tickets, 3)
+        self.assertEqual(AgentWorkload.objects.get(agent=self.printer_agent).open_tickets, 1)
+
+    def test_large_backlog(self):
+        now = timezone.now()
+        rng = random.Random(7)
+        roots = [Category.objects.create(name=f'Root {i}') for i in range(25)]
+        children = [Category.objects.create(name=f'Child {i}', parent=rng.choice(roots)) for i in range(100)]
+        categories = [category.pk for category in roots + children]
+        # A class for each category and priority
+        tickets = [
+            {'pk': pk, 'category_id': category_id, 'priority': priority,
+             'created_at': now - timedelta(hours=rng.random() * 100)}
+            for pk, (category_id, priority) in enumerate(
+                (category_id, priority) for category_id in categories for priority in Ticket.Priority.values
+            )
+        ]
+        agents = [
+            {'pk': 1000 + i, 'open_tickets': rng.randint(0, 10), 'max_tickets': 20,
+             'expertise': set(rng.sample(categories, 3))}
+            for i in range(50)
+        ]
+        with mock.patch.object(assignment, 'min_cost_flow', wraps=assignment.min_cost_flow) as min_cost_flow:
+            plan = plan_assignment(tickets, agents, now)
+
+        free = sum(agent['max_tickets'] - agent['open_tickets'] for agent in agents)
+        self.assertEqual(len(tickets), 500)
+        self.assertEqual(len(plan), min(500, free))
+        for agent in agents:
+            given = sum(1 for agent_id in plan.values() if agent_id == agent['pk'])
+            self.assertLessEqual(agent['open_tickets'] + given, agent['max_tickets'])
+        # Every category with an expert has its tickets with that expert or another one
+        parents = {category.pk: category.parent_id for category in roots + children}
+        expertise = {agent['pk']: agent['expertise'] for agent in agents}
+        for ticket in tickets:
+            path = {ticket['category_id'], parents[ticket['category_id']]}
+            if any(path & agent['expertise'] for agent in agents):
+                self.assertTrue(path & expertise[plan[ticket['pk']]], ticket)
+        # Direct arcs only to the experts, every other agent through the shared node
+        rewards, arcs, fallback, unit_costs = min_cost_flow.call_args.args
+        network = sum(len(class_arcs) for class_arcs in arcs) + len(rewards) + len(unit_costs)
+        self.assertLess(network, len(rewards) * len(unit_costs) // 10)
+
+
+class ConcurrentAssignmentTest(TransactionTestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            username='stressstaff',
+            email='stressstaff@example.com',
+            password='password123',
+            user_type='agent',
+            is_staff=True
+        )
+        customer = User.objects.create_user(
+            username='stresscustomer',
+            email='stresscustomer@example.com',
+            password='password123',
+            user_type='customer'
+        )
+        self.agents = []
+        for i, max_tickets in enumerate((3, 4)):
+            agent = User.objects.create_user(
+                username=f'stressagent{i}',
+                email=f'stressagent{i}@example.com',
+                password='password123',
+                user_type='agent'
+            )
+            AgentProfile.objects.create(user=agent, max_tickets=max_tickets)
+            self.agents.append(agent)
+        self.tickets = [
+            Ticket.objects.create(title=f'Stress {i}', description='Parallel', created_by=customer)
+            for i in range(16)
+        ]
+
+    # The SQLite test database fails on table locks at once instead of
+    # waiting for them, the retries absorb it
+    @override_settings(TICKET_ASSIGN_ATTEMPTS=50)
+    def test_parallel_auto_assign_respects_max_tickets(self):
+        start = threading.Barrier(8)
+        errors = []
+
+        def worker(tickets):
+            try:
+                start.wait()
+                for ticket in tickets:
+                    auto_assign(ticket.pk, self.staff)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(self.tickets[i::8],)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        for agent in self.agents:
+            open_tickets = Ticket.objects.filter(assigned_to=agent).count()
+            self.assertEqual(open_tickets, agent.agent_profile.max_tickets)
+            self.assertEqual(AgentWorkload.objects.get(agent=agent).open_tickets, open_tickets)
+        self.assertEqual(Ticket.objects.filter(assigned_to__isnull=True).count(), 16 - 7)
@@ -0,0 +1,115 @@
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.models import ActivityEvent
+from tickets.models import Tag, Ticket, TicketHistory
+
+User = get_user_model()
+
+
+@override_settings(TICKET_BULK_BATCH_SIZE=2)
+class TicketBulkActionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(
+            username='bulkstaff',
+            email='bulkstaff@example.com',
+            password='password123',
+            user_type='agent',
+            is_staff=True
+        )
+        cls.agent = User.objects.create_user(
+            username='bulkagent',
+            email='bulkagent@example.com',
+            password='password123',
+            user_type='agent'
+        )
+        cls.customer = User.objects.create_user(
+            username='bulkcustomer',
+            email='bulkcustomer@example.com',
+            password='password123',
+            user_type='customer'
+        )
+        cls.tickets = [
+            Ticket.objects.create(
+                title=f'Outage ticket {i}',
+                description='Branch network is down',
+                status=Ticket.Status.NEW,
+                branch=Ticket.Branch.DOUALA if i < 4 else Ticket.Branch.SIEGE,
+                created_by=cls.customer,
+            )
+            for i in range(5)
+        ]
+        cls.tag = Tag.objects.create(name='outage')
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+        mail.outbox = []
+
+    def post(self, action, value, tickets=None, **data):
+        data.update({'action': action, 'value': value})
+        if tickets is not None:
+            data['ticket_ids'] = [ticket.pk for ticket in tickets]
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('tickets:ticket-bulk-action'), data)
+
+    def test_close_selected_tickets(self):
+        selected = self.tickets[:3]
+        response = self.post('status', Ticket.Status.CLOSED, selected)
+        self.assertEqual(response.status_code, 302)
+
+        closed = Ticket.objects.filter(status=Ticket.Status.CLOSED)
+        self.assertEqual(set(closed), set(selected))
+        self.assertFalse(closed.filter(closed_at__isnull=True).exists())
+        self.assertEqual(TicketHistory.objects.filter(field_changed='status').count(), 3)
+        self.assertEqual(ActivityEvent.objects.filter(verb=ActivityEvent.Verb.STATUS_CHANGED).count(), 3)
+
+        # One email for the requester, listing the three tickets
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['bulkcustomer@example.com'])
+        for ticket in selected:
+            self.assertIn(f'#{ticket.pk}', mail.outbox[0].body)
+
+    def test_assign_all_matching_tickets(self):
+        """select_all applies the action to every ticket matching the list filters"""
+        self.post('assign', self.agent.pk, select_all='1', filter_query='branch=douala')
+
+        assigned = Ticket.objects.filter(assigned_to=self.agent)
+        self.assertEqual(assigned.count(), 4)
+        self.assertFalse(assigned.exclude(branch=Ticket.Branch.DOUALA).exists())
+        # New tickets are opened when assigned
+        self.assertFalse(assigned.exclude(status=Ticket.Status.OPEN).exists())
+        recipients = sorted(message.to[0] for message in mail.outbox)
+        self.assertEqual(recipients, ['bulkagent@example.com', 'bulkcustomer@example.com'])
+
+    def test_add_tag_and_priority(self):
+        self.tickets[0].tags.add(self.tag)
+        self.post('tag', self.tag.pk, self.tickets[:2])
+        self.post('priority', Ticket.Priority.CRITICAL, self.tickets[:2])
+
+        self.assertEqual(self.tag.tickets.count(), 2)
+        # Only the ticket that did not have the tag yet has a history entry
+        self.assertEqual(TicketHistory.objects.filter(field_changed='tags').count(), 1)
+        self.assertEqual(Ticket.objects.filter(priority=Ticket.Priority.CRITICAL).count(), 2)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_invalid_value_changes_nothing(self):
+        self.post('status', 'unknown', self.tickets)
+        self.post('assign', self.customer.pk, self.tickets)
+        self.assertFalse(Ticket.objects.exclude(status=Ticket.Status.NEW).exists())
+        self.assertFalse(Ticket.objects.filter(assigned_to__isnull=False).exists())
+        self.assertFalse(TicketHistory.objects.exists())
+
+    @override_settings(TICKET_BULK_BATCH_TIMEOUT=-1)
+    def test_slow_batch_rolls_back_the_action(self):
+        self.post('status', Ticket.Status.CLOSED, self.tickets)
+        self.assertFalse(Ticket.objects.filter(status=Ticket.Status.CLOSED).exists())
+        self.assertFalse(TicketHistory.objects.exists())
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_customers_cannot_use_bulk_actions(self):
+        self.client.force_login(self.customer)
+        self.post('status', Ticket.Status.CLOSED, self.tickets)
+        self.assertFalse(Ticket.objects.filter(status=Ticket.Status.CLOSED).exists())
@@ -0,0 +1,118 @@
+import csv
+import io
+import zipfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from tickets.models import Category, Ticket
+
+User = get_user_model()
+
+
+class TicketExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agent = User.objects.create_user(
+            username='exportagent',
+            email='exportagent@example.com',
+            password='password123',
+            first_name='Export',
+            last_name='Agent',
+            user_type='agent',
+            is_staff=True
+        )
+        cls.customer = User.objects.create_user(
+            username='exportcustomer',
+            email='exportcustomer@example.com',
+            password='password123',
+            user_type='customer'
+        )
+        cls.category = Category.objects.create(name='Network', description='Network issues')
+        cls.open_ticket = Ticket.objects.create(
+            title='Printer & "scanner" <offline>',
+            description='Export test',
+            status=Ticket.Status.OPEN,
+            branch=Ticket.Branch.DOUALA,
+            category=cls.category,
+            created_by=cls.customer,
+            assigned_to=cls.agent,
+        )
+        cls.new_ticket = Ticket.objects.create(
+            title='VPN access',
+            description='Export test',
+            status=Ticket.Status.NEW,
+            branch=Ticket.Branch.SIEGE,
+            created_by=cls.agent,
+        )
+
+    def export(self, format, **params):
+        response = self.client.get(reverse('tickets:ticket-export', args=[format]), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def read_csv(self, **params):
+        content = self.export('csv', **params).decode('utf-8-sig')
+        return list(csv.reader(io.StringIO(content)))
+
+    def test_csv_uses_list_filters(self):
+        self.client.force_login(self.agent)
+        rows = self.read_csv(status=Ticket.Status.OPEN)
+        self.assertEqual(rows[0][:3], ['ID', 'Title', 'Status'])
+        self.assertEqual(len(rows), 2)
+        row = dict(zip(rows[0], rows[1]))
+        self.assertEqual(row['ID'], str(self.open_ticket.pk))
+        self.assertEqual(row['Title'], self.open_ticket.title)
+        self.assertEqual(row['Category'], 'Network')
+        self.assertEqual(row['Assigned to'], 'Export Agent <exportagent@example.com>')
+
+        self.assertEqual(len(self.read_csv()), 3)
+
+    def test_customers_export_their_own_tickets(self):
+        self.client.force_login(self.customer)
+        rows = self.read_csv()
+        self.assertEqual([row[0] for row in rows[1:]], [str(self.open_ticket.pk)])
+
+    def test_xlsx_workbook(self):
+        self.client.force_login(self.agent)
+        content = self.export('xlsx', branch=Ticket.Branch.DOUALA)
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertIn('xl/workbook.xml', archive.namelist())
+            sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(sheet.count('<row>'), 2)
+        self.assertIn('Printer &amp; "scanner" &lt;offline&gt;', sheet)
+        self.assertNotIn('VPN access', sheet)
+
+    def test_formulas_are_escaped_in_csv(self):
+        formula = Ticket.objects.create(
+            title='=HYPERLINK("http://example.com","Open")',
+            description='Export test',
+            branch=Ticket.Branch.BAFOUSSAM,
+            created_by=User.objects.create_user(
+                username='formulacustomer',
+                email='formula@example.com',
+                password='password123',
+                first_name='@SUM(1+1)',
+                user_type='customer'
+            ),
+        )
+        self.client.force_login(self.agent)
+        rows = self.read_csv(branch=Ticket.Branch.BAFOUSSAM)
+        row = dict(zip(rows[0], rows[1]))
+        self.assertEqual(row['Title'], "'" + formula.title)
+        self.assertEqual(row['Created by'], "'@SUM(1+1) <formula@example.com>")
+
+        content = self.export('xlsx', branch=Ticket.Branch.BAFOUSSAM)
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        # Inline strings of a workbook are never evaluated: kept as typed
+        self.assertIn('>=HYPERLINK(', sheet)
+        self.assertNotIn("'=HYPERLINK(", sheet)
+
+    def test_unknown_format(self):
+        self.client.force_login(self.agent)
+        response = self.client.get(reverse('tickets:ticket-export', args=['pdf']))
+        self.assertEqual(response.status_code, 404)
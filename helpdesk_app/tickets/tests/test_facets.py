@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from tickets.facets import get_facet_counts
+from tickets.filters import get_filters
+from tickets.models import Ticket, Category
+
+User = get_user_model()
+
+
+class TicketFacetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(
+            username='facetcustomer',
+            email='facet@example.com',
+            password='password123',
+            user_type='customer'
+        )
+        cls.agent = User.objects.create_user(
+            username='facetagent',
+            email='facetagent@example.com',
+            password='password123',
+            user_type='agent',
+            is_staff=True
+        )
+        cls.network = Category.objects.create(name='Network')
+        for status, branch in [
+            (Ticket.Status.NEW, Ticket.Branch.SIEGE),
+            (Ticket.Status.NEW, Ticket.Branch.DOUALA),
+            (Ticket.Status.OPEN, Ticket.Branch.DOUALA),
+        ]:
+            Ticket.objects.create(
+                title='Facet ticket',
+                description='Counted in facets',
+                status=status,
+                branch=branch,
+                category=cls.network,
+                created_by=cls.customer,
+            )
+    
+    def setUp(self):
+        cache.clear()
+    
+    def counts(self, user, **params):
+        return get_facet_counts(user, get_filters(params))
+    
+    def test_counts_for_every_facet(self):
+        counts = self.counts(self.agent)
+        self.assertEqual(counts['status'], {Ticket.Status.NEW: 2, Ticket.Status.OPEN: 1})
+        self.assertEqual(counts['branch'], {Ticket.Branch.SIEGE: 1, Ticket.Branch.DOUALA: 2})
+        self.assertEqual(counts['category'], {self.network.pk: 3})
+    
+    def test_a_filter_does_not_restrict_its_own_counts(self):
+        counts = self.counts(self.agent, status=Ticket.Status.NEW, branch=Ticket.Branch.DOUALA)
+        # Status options are counted within Douala, branch options within new tickets
+        self.assertEqual(counts['status'], {Ticket.Status.NEW: 1, Ticket.Status.OPEN: 1})
+        self.assertEqual(counts['branch'], {Ticket.Branch.SIEGE: 1, Ticket.Branch.DOUALA: 1})
+        self.assertEqual(counts['priority'], {Ticket.Priority.MEDIUM: 1})
+    
+    def test_counts_are_cached_until_tickets_change(self):
+        self.counts(self.agent)
+        with self.assertNumQueries(0):
+            self.counts(self.agent)
+        
+        Ticket.objects.create(
+            title='New one',
+            description='Invalidates the facets',
+            branch=Ticket.Branch.SIEGE,
+            created_by=self.customer,
+        )
+        self.assertEqual(self.counts(self.agent)['status'][Ticket.Status.NEW], 3)
+    
+    def test_list_shows_counts(self):
+        self.client.force_login(self.agent)
+        response = self.client.get(reverse('tickets:ticket-list'))
+        self.assertIn((Ticket.Status.NEW, Ticket.Status.NEW.label, 2), response.context['status_choices'])
+        self.assertContains(response, 'Network (3)')
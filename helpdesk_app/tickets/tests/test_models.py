@@ -1,7 +1,20 @@
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.core import mail
+from django.core.exceptions import ValidationError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from django.contrib.auth import get_user_model
-from tickets.models import Ticket, Category, Tag, SLA
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from comments.models import Comment
+from tickets.models import Ticket, Category, CategoryClosure, Department, Tag, SLA, TicketDailyStats, TicketHistory, TicketStatsDirtyDate
+from tickets.tasks import refresh_ticket_stats
 
 User = get_user_model()
 
@@ -116,6 +129,78 @@ class CategoryModelTest(TestCase):
         self.assertEqual(self.parent_category.subcategories.first(), self.child_category)
 
 
+class CategoryTreeTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.hardware = Category.objects.create(name='Hardware')
+        cls.printers = Category.objects.create(name='Printers', parent=cls.hardware)
+        cls.toner = Category.objects.create(name='Toner', parent=cls.printers)
+        cls.software = Category.objects.create(name='Software')
+
+    def paths(self):
+        return set(CategoryClosure.objects.values_list('ancestor__name', 'descendant__name', 'depth'))
+
+    def test_closure_is_maintained_on_create(self):
+        self.assertEqual(self.paths(), {
+            ('Hardware', 'Hardware', 0), ('Printers', 'Printers', 0), ('Toner', 'Toner', 0),
+            ('Software', 'Software', 0), ('Hardware', 'Printers', 1), ('Printers', 'Toner', 1),
+            ('Hardware', 'Toner', 2),
+        })
+        with self.assertNumQueries(1):
+            self.assertEqual(set(self.hardware.get_descendants()), {self.printers, self.toner})
+        with self.assertNumQueries(1):
+            self.assertEqual(list(self.toner.get_ancestors(include_self=True)), [self.hardware, self.printers, self.toner])
+        self.assertEqual([node['name'] for node in self.toner.breadcrumbs()], ['Hardware', 'Printers', 'Toner'])
+
+    def test_move_subtree(self):
+        printers = Category.objects.get(pk=self.printers.pk)
+        printers.parent = self.software
+        printers.save()
+        self.assertEqual(list(self.toner.get_ancestors()), [self.software, printers])
+        self.assertFalse(self.hardware.get_descendants().exists())
+        self.assertEqual([node['name'] for node in self.toner.breadcrumbs()], ['Software', 'Printers', 'Toner'])
+
+        hardware = Category.objects.get(pk=self.hardware.pk)
+        hardware.parent = self.toner
+        hardware.save()
+        self.assertEqual(list(hardware.get_ancestors()), [self.software, printers, self.toner])
+
+    def test_cycles_are_refused(self):
+        hardware = Category.objects.get(pk=self.hardware.pk)
+        hardware.parent = self.toner
+        with self.assertRaises(ValidationError):
+            hardware.full_clean()
+        with self.assertRaises(ValidationError):
+            hardware.save()
+        self.assertEqual(set(self.hardware.get_descendants()), {self.printers, self.toner})
+
+    def test_delete_keeps_children_as_roots(self):
+        self.printers.delete()
+        self.assertEqual(list(Category.objects.get(pk=self.toner.pk).get_ancestors()), [])
+        self.assertEqual(list(self.hardware.get_descendants()), [])
+
+    def test_str_uses_cached_tree(self):
+        toner = Category.objects.get(pk=self.toner.pk)
+        str(toner)
+        with self.assertNumQueries(0):
+            self.assertEqual(str(toner), 'Printers > Toner')
+
+    def test_tickets_of_subcategories_are_filtered(self):
+        from tickets.filters import apply_ticket_filters, get_filters
+
+        user = User.objects.create_user(username='treeuser', password='password123', is_staff=True)
+        for category in (self.hardware, self.toner, self.software):
+            Ticket.objects.create(title=category.name, description='Tree', category=category, created_by=user)
+        filters = get_filters({'category': str(self.printers.pk)})
+        tickets = apply_ticket_filters(Ticket.objects.all(), filters)
+        self.assertEqual([ticket.title for ticket in tickets], ['Toner'])
+
+        from tickets.facets import get_facet_counts
+        counts = get_facet_counts(user, get_filters({}))['category']
+        self.assertEqual(counts[self.hardware.pk], 2)
+        self.assertEqual(counts[self.printers.pk], 1)
+
+
 class SLAModelTest(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -153,4 +238,246 @@ class SLAModelTest(TestCase):
         self.assertEqual(self.sla.get_resolution_time(Ticket.Priority.LOW), 72)
         self.assertEqual(self.sla.get_resolution_time(Ticket.Priority.MEDIUM), 48)
         self.assertEqual(self.sla.get_resolution_time(Ticket.Priority.HIGH), 24)
-        self.assertEqual(self.sla.get_resolution_time(Ticket.Priority.CRITICAL), 8)
\ No newline at end of file
+        self.assertEqual(self.sla.get_resolution_time(Ticket.Priority.CRITICAL), 8)
+
+class TicketActivityTrackingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(
+            username='activitycustomer',
+            email='activity-customer@example.com',
+            password='password123',
+            user_type='customer'
+        )
+        cls.agent = User.objects.create_user(
+            username='activityagent',
+            email='activity-agent@example.com',
+            password='password123',
+            user_type='agent'
+        )
+        cls.ticket_type = ContentType.objects.get_for_model(Ticket)
+
+    def setUp(self):
+        self.ticket = Ticket.objects.create(
+            title='Activity Ticket',
+            description='Tracking comment activity',
+            created_by=self.customer
+        )
+
+    def add_comment(self, author):
+        return Comment.objects.create(
+            content_type=self.ticket_type,
+            object_id=self.ticket.pk,
+            author=author,
+            text='A comment'
+        )
+
+    def test_customer_comment_is_not_a_response(self):
+        """Comments from the requester only count as activity"""
+        comment = self.add_comment(self.customer)
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.comment_count, 1)
+        self.assertEqual(self.ticket.last_activity_at, comment.created_at)
+        self.assertIsNone(self.ticket.first_response_at)
+
+    def test_first_agent_comment_sets_first_response(self):
+        """Only the first staff reply is recorded as the first response"""
+        first = self.add_comment(self.agent)
+        second = self.add_comment(self.agent)
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.comment_count, 2)
+        self.assertEqual(self.ticket.first_response_at, first.created_at)
+        self.assertEqual(self.ticket.first_responder, self.agent)
+        self.assertEqual(self.ticket.last_activity_at, second.created_at)
+
+        second.delete()
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.comment_count, 1)
+
+    def test_backfill_command(self):
+        """The backfill command rebuilds the columns from existing comments"""
+        self.add_comment(self.customer)
+        reply = self.add_comment(self.agent)
+        Ticket.objects.filter(pk=self.ticket.pk).update(
+            comment_count=0, last_activity_at=None, first_response_at=None, first_responder=None
+        )
+
+        call_command('backfill_ticket_activity', batch_size=1, stdout=StringIO())
+
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.comment_count, 2)
+        self.assertEqual(self.ticket.first_response_at, reply.created_at)
+        self.assertEqual(self.ticket.first_responder, self.agent)
+        self.assertEqual(self.ticket.last_activity_at, reply.created_at)
+
+
+class TicketDailyStatsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(
+            username='statscustomer',
+            email='stats@example.com',
+            password='password123',
+            user_type='customer'
+        )
+        cls.category = Category.objects.create(name='Network')
+    
+    def create_ticket(self, **kwargs):
+        return Ticket.objects.create(
+            title='Stats ticket',
+            description='Counted in the daily statistics',
+            branch=Ticket.Branch.SIEGE,
+            priority=Ticket.Priority.HIGH,
+            category=self.category,
+            created_by=self.customer,
+            **kwargs
+        )
+    
+    def refresh(self):
+        call_command('refresh_ticket_stats', stdout=StringIO())
+    
+    def test_refresh_only_rebuilds_dirty_days(self):
+        """Saving a ticket marks its day, the command rebuilds and clears it"""
+        self.create_ticket()
+        self.create_ticket(due_date=timezone.now() + timedelta(days=1))
+        today = timezone.localdate()
+        self.assertTrue(TicketStatsDirtyDate.objects.filter(date=today).exists())
+        
+        self.refresh()
+        
+        self.assertFalse(TicketStatsDirtyDate.objects.exists())
+        row = TicketDailyStats.objects.get(date=today)
+        self.assertEqual(row.branch, Ticket.Branch.SIEGE)
+        self.assertEqual(row.category, self.category)
+        self.assertEqual(row.created_count, 2)
+        self.assertEqual(row.due_count, 1)
+        self.assertEqual(row.resolved_count, 0)
+    
+    def test_resolution_moves_between_days(self):
+        """Changing the resolution date also refreshes the day it was moved from"""
+        ticket = self.create_ticket()
+        created = timezone.now() - timedelta(days=2)
+        Ticket.objects.filter(pk=ticket.pk).update(created_at=created)
+        ticket = Ticket.objects.get(pk=ticket.pk)
+        yesterday = timezone.now() - timedelta(days=1)
+        ticket.status = Ticket.Status.RESOLVED
+        ticket.resolved_at = yesterday
+        ticket.due_date = yesterday - timedelta(hours=1)
+        ticket.save()
+        self.refresh()
+        
+        row = TicketDailyStats.objects.get(date=timezone.localdate(yesterday))
+        self.assertEqual(row.resolved_count, 1)
+        self.assertGreater(row.resolution_seconds, 0)
+        self.assertEqual(TicketDailyStats.objects.get(date=timezone.localdate(created)).breached_count, 1)
+        
+        ticket = Ticket.objects.get(pk=ticket.pk)
+        ticket.resolved_at = timezone.now()
+        ticket.save()
+        self.refresh()
+        
+        self.assertFalse(TicketDailyStats.objects.filter(date=timezone.localdate(yesterday)).exists())
+        self.assertEqual(TicketDailyStats.objects.get(date=timezone.localdate()).resolved_count, 1)
+    
+    def test_backfill_and_scheduled_refresh(self):
+        """The migration marks every day since the first ticket, the periodic task builds them"""
+        backfill = import_module('tickets.migrations.0010_backfill_ticket_stats')
+        
+        ticket = self.create_ticket()
+        created = timezone.now() - timedelta(days=3)
+        Ticket.objects.filter(pk=ticket.pk).update(created_at=created)
+        TicketStatsDirtyDate.objects.all().delete()
+        
+        backfill.mark_every_day_dirty(apps, None)
+        self.assertEqual(TicketStatsDirtyDate.objects.count(), 4)
+        refresh_ticket_stats.delay()
+        
+        self.assertFalse(TicketStatsDirtyDate.objects.exists())
+        self.assertEqual(TicketDailyStats.objects.get(date=timezone.localdate(created)).created_count, 1)
+    
+    def test_full_rebuild(self):
+        ticket = self.create_ticket()
+        Ticket.objects.filter(pk=ticket.pk).update(created_at=timezone.now() - timedelta(days=3))
+        
+        call_command('refresh_ticket_stats', full=True, stdout=StringIO())
+        
+        self.assertEqual(TicketDailyStats.objects.count(), 1)
+        self.assertEqual(
+            TicketDailyStats.objects.get().date,
+            timezone.localdate(timezone.now() - timedelta(days=3))
+        )
+
+
+class TicketChangeTrackingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(
+            username='trackcustomer',
+            email='trackcustomer@example.com',
+            password='password123',
+            user_type='customer'
+        )
+        cls.agent = User.objects.create_user(
+            username='trackagent',
+            email='trackagent@example.com',
+            password='password123',
+            first_name='Track',
+            last_name='Agent',
+            user_type='agent'
+        )
+        cls.department = Department.objects.create(name='IT')
+        cls.ticket = Ticket.objects.create(
+            title='Tracked ticket',
+            description='Change tracking',
+            created_by=cls.customer,
+        )
+    
+    def setUp(self):
+        self.ticket = Ticket.objects.get(pk=self.ticket.pk)
+        mail.outbox = []
+    
+    def test_unchanged_ticket_is_not_written(self):
+        self.ticket.title = 'Tracked ticket'
+        with self.assertNumQueries(0):
+            self.ticket.save(changed_by=self.agent)
+        self.assertFalse(TicketHistory.objects.exists())
+    
+    def test_only_changed_fields_are_written(self):
+        self.ticket.set_status(Ticket.Status.RESOLVED)
+        self.ticket.department = self.department
+        with CaptureQueriesContext(connection) as queries:
+            self.ticket.save(changed_by=self.agent)
+        
+        update = next(query['sql'] for query in queries if query['sql'].startswith('UPDATE "tickets_ticket"'))
+        self.assertIn('"status"', update)
+        self.assertIn('"resolved_at"', update)
+        self.assertNotIn('"description"', update)
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "tickets_tickethistory"')]
+        self.assertEqual(len(inserts), 1)
+        
+        history = {entry.field_changed: entry for entry in self.ticket.history.all()}
+        self.assertEqual(set(history), {'status', 'department'})
+        self.assertEqual((history['status'].old_value, history['status'].new_value), ('New', 'Resolved'))
+        self.assertEqual((history['department'].old_value, history['department'].new_value), ('None', 'IT'))
+        
+        # The snapshot follows the save
+        self.assertEqual(self.ticket.get_changes(), {})
+    
+    def test_assignment_notifies_agent_and_customer(self):
+        self.ticket.assign(self.agent)
+        self.ticket.save(changed_by=self.agent)
+        recipients = sorted(message.to[0] for message in mail.outbox)
+        self.assertEqual(recipients, ['trackagent@example.com', 'trackcustomer@example.com'])
+        self.assertEqual(
+            self.ticket.history.get(field_changed='assigned_to').new_value,
+            str(self.agent)
+        )
+    
+    def test_save_keeps_concurrent_counter_updates(self):
+        """A save only writes its own changes, not stale copies of other columns"""
+        Ticket.objects.filter(pk=self.ticket.pk).update(comment_count=3)
+        self.ticket.priority = Ticket.Priority.HIGH
+        self.ticket.save()
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.comment_count, 3)
+        self.assertEqual(self.ticket.priority, Ticket.Priority.HIGH)
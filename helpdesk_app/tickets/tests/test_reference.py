@@ -0,0 +1,128 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from tickets.models import Category, Department, SubDepartment, Ticket
+from tickets.reference import clear_reference, get_reference
+
+User = get_user_model()
+
+REFERENCE_TABLES = ('tickets_category', 'tickets_department', 'tickets_subdepartment', 'tickets_tag')
+
+
+class ReferenceDataTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agent = User.objects.create_user(
+            username='referenceagent',
+            email='referenceagent@example.com',
+            password='password123',
+            user_type='agent',
+            is_staff=True
+        )
+        cls.hardware = Category.objects.create(name='Hardware')
+        cls.printers = Category.objects.create(name='Printers', parent=cls.hardware)
+        cls.department = Department.objects.create(name='IT')
+        cls.subdepartment = SubDepartment.objects.create(name='Support', department=cls.department)
+        cls.ticket = Ticket.objects.create(
+            title='Printer jam',
+            description='Paper stuck',
+            category=cls.printers,
+            department=cls.department,
+            subdepartment=cls.subdepartment,
+            created_by=cls.agent,
+        )
+
+    def setUp(self):
+        # Rolled back rows of other tests must not be served from memory
+        clear_reference()
+        self.client.force_login(self.agent)
+
+    def reference_queries(self, url):
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [
+            query['sql'] for query in queries.captured_queries
+            if any(f'"{table}"' in query['sql'] for table in REFERENCE_TABLES)
+        ]
+
+    def test_forms_and_list_do_not_query_reference_data(self):
+        for url in (
+            reverse('tickets:ticket-create'),
+            reverse('tickets:ticket-update', args=[self.ticket.pk]),
+            reverse('tickets:ticket-list'),
+            reverse('tickets:get-subcategories', args=[self.hardware.pk]),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.reference_queries(url), [])
+
+    def test_update_resolves_posted_ids_from_reference_data(self):
+        url = reverse('tickets:ticket-update', args=[self.ticket.pk])
+        data = {
+            'title': 'Printer jam', 'description': 'Paper stuck', 'category': self.hardware.pk,
+            'department': self.department.pk, 'subdepartment': self.subdepartment.pk,
+        }
+        self.client.post(url, data)
+        data['category'] = self.printers.pk
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.post(url, data).status_code, 302)
+        # Tags are read to index the ticket
+        self.assertFalse([
+            query['sql'] for query in queries.captured_queries
+            if any(f'FROM "{table}"' in query['sql'] for table in REFERENCE_TABLES[:3])
+        ])
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.category, self.printers)
+        self.assertEqual(self.ticket.subdepartment, self.subdepartment)
+        change = self.ticket.history.get(field_changed='category', new_value=str(self.printers))
+        self.assertEqual(change.old_value, str(self.hardware))
+
+        # An unknown id keeps the category, an empty one drops the subdepartment
+        data.update(category='nope', subdepartment='')
+        self.client.post(url, data)
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.category, self.printers)
+        self.assertIsNone(self.ticket.subdepartment)
+
+    def test_changes_are_seen_on_the_next_request(self):
+        url = reverse('tickets:get-subcategories', args=[self.hardware.pk])
+        self.assertEqual([row['name'] for row in self.client.get(url).json()], ['Printers'])
+
+        Category.objects.create(name='Scanners', parent=self.hardware)
+        self.assertEqual([row['name'] for row in self.client.get(url).json()], ['Printers', 'Scanners'])
+
+    def test_list_counts_do_not_touch_shared_instances(self):
+        response = self.client.get(reverse('tickets:ticket-list'))
+        counts = {category.name: category.ticket_count for category in response.context['categories']}
+        self.assertEqual(counts, {'Hardware': 1, 'Printers': 1})
+        self.assertFalse(any(hasattr(category, 'ticket_count') for category in get_reference('categories')))
+
+    def test_reference_tree(self):
+        url = reverse('tickets:reference-tree')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('must-revalidate', response['Cache-Control'])
+        data = response.json()
+        self.assertEqual(data['categories'], [
+            [self.hardware.pk, None, 'Hardware'], [self.printers.pk, self.hardware.pk, 'Printers'],
+        ])
+        self.assertEqual(data['subdepartments'], [[self.subdepartment.pk, self.department.pk, 'Support']])
+
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # The per-parent endpoints share the version of the tree
+        subcategories = reverse('tickets:get-subcategories', args=[self.hardware.pk])
+        self.assertEqual(self.client.get(subcategories, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Saving without a change keeps the content, and the ETag
+        self.department.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.department.name = 'Information Technology'
+        self.department.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['departments'], [[self.department.pk, 'Information Technology']])
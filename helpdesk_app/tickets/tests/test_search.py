@@ -0,0 +1,117 @@
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from comments.models import Comment
+from tickets.models import Ticket, Tag
+from tickets.search import add_snippets, clear_index, search_tickets
+
+User = get_user_model()
+
+
+class TicketSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(
+            username='searchcustomer',
+            email='search@example.com',
+            password='password123',
+            user_type='customer'
+        )
+        cls.agent = User.objects.create_user(
+            username='searchagent',
+            email='searchagent@example.com',
+            password='password123',
+            user_type='agent',
+            is_staff=True
+        )
+        cls.printer = cls.create_ticket('Printer jammed', 'The printer on the third floor is jammed')
+        cls.email = cls.create_ticket('Email not syncing', 'Outlook does not receive new messages')
+        cls.vpn = cls.create_ticket('Remote access', 'Cannot connect from home, printer works fine')
+
+    @classmethod
+    def create_ticket(cls, title, description):
+        return Ticket.objects.create(
+            title=title,
+            description=description,
+            branch=Ticket.Branch.SIEGE,
+            created_by=cls.customer,
+        )
+
+    def search(self, query):
+        return list(search_tickets(Ticket.objects.all(), query).order_by('-rank', '-id'))
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(self.search('printer'), [self.printer, self.vpn])
+        self.assertEqual(self.search('outlook messages'), [self.email])
+        self.assertEqual(self.search('nothing-like-this'), [])
+
+    def test_tags_and_public_comments_are_indexed(self):
+        tag = Tag.objects.create(name='hardware')
+        self.email.tags.add(tag)
+        self.assertEqual(self.search('hardware'), [self.email])
+
+        ticket_type = ContentType.objects.get_for_model(Ticket)
+        Comment.objects.create(
+            content_type=ticket_type, object_id=self.vpn.pk, author=self.agent, text='Reset the firewall rule'
+        )
+        Comment.objects.create(
+            content_type=ticket_type, object_id=self.printer.pk, author=self.agent,
+            text='Internal firewall note', is_internal=True
+        )
+        self.assertEqual(self.search('firewall'), [self.vpn])
+
+    def test_only_text_changes_reindex(self):
+        ticket = Ticket.objects.get(pk=self.email.pk)
+        ticket.set_status(Ticket.Status.OPEN)
+        with CaptureQueriesContext(connection) as queries:
+            ticket.save()
+        self.assertFalse([query for query in queries if 'tickets_ticket_fts' in query['sql']])
+
+        ticket.title = 'Calendar not syncing'
+        ticket.save()
+        self.assertEqual(self.search('calendar'), [self.email])
+
+    def test_snippets_are_escaped_and_highlighted(self):
+        ticket = self.create_ticket('Broken <script>', 'The <b>keyboard</b> stopped working')
+        [result] = add_snippets(search_tickets(Ticket.objects.filter(pk=ticket.pk), 'keyboard'), 'keyboard')
+        self.assertIn('<mark>keyboard</mark>', result.snippet)
+        self.assertIn('&lt;b&gt;', result.snippet)
+
+    def test_ticket_list_search(self):
+        self.client.force_login(self.agent)
+        response = self.client.get(reverse('tickets:ticket-list'), {'q': 'printer', 'page_size': 1})
+        self.assertEqual(list(response.context['tickets']), [self.printer])
+
+        response = self.client.get(reverse('tickets:ticket-list'), {
+            'q': 'printer', 'page_size': 1, 'after': response.context['page'].next_cursor
+        })
+        self.assertEqual(list(response.context['tickets']), [self.vpn])
+
+    def test_rebuild_command(self):
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('jammed'), [self.printer])
+
+    def test_migration_backfills_the_index(self):
+        backfill = import_module('tickets.migrations.0011_backfill_search_index').backfill_search_index
+        self.email.tags.add(Tag.objects.create(name='mailbox'))
+        Comment.objects.create(
+            content_type=ContentType.objects.get_for_model(Ticket), object_id=self.vpn.pk,
+            author=self.agent, text='Reset the firewall rule'
+        )
+        # Tickets created before the search index
+        clear_index()
+        self.assertEqual(self.search('jammed'), [])
+
+        backfill(apps, connection.schema_editor())
+        self.assertEqual(self.search('jammed'), [self.printer])
+        self.assertEqual(self.search('mailbox'), [self.email])
+        self.assertEqual(self.search('firewall'), [self.vpn])
@@ -0,0 +1,102 @@
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from core.models import ActivityEvent
+from tickets.models import Category, Department, SubDepartment, Ticket, TicketHistory
+from tickets.services import TicketValidationError, create_ticket
+from tickets.signals import ticket_created
+
+User = get_user_model()
+
+
+class CreateTicketTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(
+            username='servicecustomer',
+            email='servicecustomer@example.com',
+            password='password123',
+            user_type='customer'
+        )
+        cls.agent = User.objects.create_user(
+            username='serviceagent',
+            email='serviceagent@example.com',
+            password='password123',
+            user_type='agent'
+        )
+        cls.category = Category.objects.create(name='Hardware', description='Hardware issues')
+        cls.department = Department.objects.create(name='IT')
+        cls.subdepartment = SubDepartment.objects.create(name='Support', department=cls.department)
+        cls.other_department = Department.objects.create(name='Finance')
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        mail.outbox = []
+
+    def data(self, **values):
+        data = {
+            'title': 'Broken screen',
+            'description': 'The screen stays black',
+            'branch': Ticket.Branch.DOUALA,
+            'priority': Ticket.Priority.HIGH,
+            'category': str(self.category.pk),
+            'department': str(self.department.pk),
+            'subdepartment': str(self.subdepartment.pk),
+        }
+        data.update(values)
+        return data
+
+    def test_ticket_is_created_once(self):
+        announced = []
+
+        def receiver(sender, ticket, **kwargs):
+            announced.append(ticket.pk)
+
+        ticket_created.connect(receiver)
+        self.addCleanup(ticket_created.disconnect, receiver)
+
+        files = [SimpleUploadedFile(f'photo{i}.jpg', b'data') for i in range(2)]
+        with override_settings(MEDIA_ROOT=self.media_root):
+            with self.captureOnCommitCallbacks(execute=True):
+                ticket = create_ticket(self.customer, self.data(), files)
+
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.category, self.category)
+        self.assertEqual(ticket.subdepartment, self.subdepartment)
+        self.assertEqual(ticket.attachments.count(), 2)
+        self.assertEqual(
+            sorted(TicketHistory.objects.filter(ticket=ticket).values_list('field_changed', flat=True)),
+            ['department', 'status', 'subdepartment']
+        )
+        self.assertEqual(ActivityEvent.objects.filter(ticket=ticket, verb=ActivityEvent.Verb.CREATED).count(), 1)
+
+        # One announcement after commit: one email to the agents, one to the creator
+        self.assertEqual(announced, [ticket.pk])
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_invalid_data_creates_nothing(self):
+        cases = [
+            self.data(title=''),
+            self.data(priority='urgent'),
+            self.data(category='999999'),
+            self.data(department=str(self.other_department.pk)),
+        ]
+        for data in cases:
+            with self.subTest(data=data):
+                with self.assertRaises(TicketValidationError):
+                    create_ticket(self.customer, data)
+        self.assertFalse(Ticket.objects.exists())
+        self.assertFalse(TicketHistory.objects.exists())
+
+    def test_optional_fields(self):
+        ticket = create_ticket(self.customer, {'title': 'Question', 'description': 'How do I...'})
+        self.assertEqual(ticket.branch, Ticket.Branch.SIEGE)
+        self.assertEqual(ticket.priority, Ticket.Priority.MEDIUM)
+        self.assertIsNone(ticket.category)
+        self.assertEqual(ticket.history.count(), 1)
@@ -0,0 +1,108 @@
+import json
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import AgentProfile
+from tickets.models import Category, Ticket, TicketHistory
+from tickets.simulation import SimAgent, SimTicket, generate_dataset, load_history, replay
+
+User = get_user_model()
+
+HOUR = 3600
+
+
+class AssignmentReplayTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(
+            username='replaycustomer',
+            email='replaycustomer@example.com',
+            password='password123',
+            user_type='customer'
+        )
+        cls.agent = User.objects.create_user(
+            username='replayagent',
+            email='replayagent@example.com',
+            password='password123',
+            user_type='agent'
+        )
+        cls.network = Category.objects.create(name='Network')
+        AgentProfile.objects.create(user=cls.agent, max_tickets=1).expertise.add(cls.network)
+
+    def test_strategies(self):
+        # One network expert and one generalist, one slot each
+        agents = [SimAgent(0, 1, 1, {10}), SimAgent(1, 2, 1, ())]
+        paths = {None: [], 10: [10]}
+        tickets = [
+            SimTicket(1, 0, 10, Ticket.Priority.MEDIUM, 2 * HOUR),
+            SimTicket(2, 0, 10, Ticket.Priority.MEDIUM, 2 * HOUR),
+            SimTicket(3, HOUR, 10, Ticket.Priority.LOW, 2 * HOUR),
+            SimTicket(4, HOUR, 10, Ticket.Priority.CRITICAL, 2 * HOUR),
+        ]
+        results = {result['strategy']: result for result in replay(tickets, agents, paths)}
+
+        current = results['current']
+        self.assertEqual(current['assigned'], 4)
+        self.assertEqual(current['expert_share'], 0.5)
+        # The critical ticket takes the slot of the expert freed at 2h, the
+        # low one waits for the slower generalist until 3h
+        self.assertEqual(current['wait_p90_hours'], 2)
+        self.assertEqual(sorted(current['handled'].values()), [2, 2])
+        self.assertEqual(results['round-robin']['handled'], {1: 2, 2: 2})
+
+    def test_synthetic_dataset_is_seeded(self):
+        tickets, agents, paths = generate_dataset(2000, agent_count=10, category_count=10, seed=3)
+        self.assertEqual(generate_dataset(2000, agent_count=10, category_count=10, seed=3)[0], tickets)
+        results = replay(tickets, agents, paths)
+        self.assertEqual(len(results), 4)
+        for result in results:
+            self.assertEqual(result['assigned'], 2000)
+        self.assertEqual(replay(tickets, agents, paths), results)
+
+    def test_history_loads_available_agents_only(self):
+        for username, user_type, available in (
+            ('replayadmin', 'admin', True),
+            ('replayaway', 'agent', False),
+        ):
+            user = User.objects.create_user(
+                username=username, email=f'{username}@example.com', password='password123', user_type=user_type
+            )
+            AgentProfile.objects.create(user=user, availability_status=available)
+        retired = User.objects.create_user(
+            username='replayretired', email='replayretired@example.com', password='password123',
+            user_type='agent', is_active=False
+        )
+        AgentProfile.objects.create(user=retired)
+
+        tickets, agents, paths, waits = load_history()
+        self.assertEqual([agent.pk for agent in agents], [self.agent.agent_profile.pk])
+        self.assertEqual(agents[0].expertise, {self.network.pk})
+
+    def test_command_replays_history(self):
+        now = timezone.now()
+        for hours in (0, 1, 2):
+            ticket = Ticket.objects.create(
+                title='Link down', description='No network', created_by=self.customer, category=self.network
+            )
+            created = now - timedelta(hours=10 - hours)
+            TicketHistory.objects.create(
+                ticket=ticket, user=self.agent, field_changed='assigned_to', new_value=self.agent.username
+            )
+            TicketHistory.objects.filter(ticket=ticket).update(timestamp=created + timedelta(minutes=30))
+            Ticket.objects.filter(pk=ticket.pk).update(created_at=created, resolved_at=created + timedelta(hours=1))
+
+        output = StringIO()
+        call_command('replay_assignment', '--strategy', 'current', '--json', stdout=output)
+        result, = json.loads(output.getvalue())['results']
+        self.assertEqual(result['assigned'], 3)
+        self.assertEqual(result['wait_p99_hours'], 0)
+
+        output = StringIO()
+        call_command('replay_assignment', stdout=output)
+        self.assertIn('Recorded waits (hours): p50 0.5', output.getvalue())
+        self.assertIn('expertise-weighted', output.getvalue())
@@ -0,0 +1,196 @@
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core.metrics import DashboardMetrics
+
+from tickets.models import SLA, Category, Department, Ticket
+from tickets.reference import clear_reference
+from tickets.sla import BusinessCalendar, find_sla, flag_breaches
+from tickets.stats import rebuild_all, refresh_dirty_days
+
+User = get_user_model()
+
+HOUR = 3600
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class BusinessCalendarTest(TestCase):
+    # 8:00 to 17:00 on weekdays; Wednesday 2025-01-01 is a holiday
+    calendar = BusinessCalendar(time(8), time(17), range(5), [date(2025, 1, 1)], dt_timezone.utc)
+
+    def test_add(self):
+        friday = utc(2025, 1, 3, 15)
+        self.assertEqual(self.calendar.add(friday, HOUR), utc(2025, 1, 3, 16))
+        # Over the weekend
+        self.assertEqual(self.calendar.add(friday, 4 * HOUR), utc(2025, 1, 6, 10))
+        # From outside business hours, over the holiday
+        self.assertEqual(self.calendar.add(utc(2024, 12, 31, 20), HOUR), utc(2025, 1, 2, 9))
+        self.assertEqual(self.calendar.add(utc(2025, 1, 4, 12), 9 * HOUR), utc(2025, 1, 6, 17))
+
+    def test_seconds_between(self):
+        self.assertEqual(self.calendar.seconds_between(utc(2025, 1, 3, 15), utc(2025, 1, 6, 10)), 4 * HOUR)
+        self.assertEqual(self.calendar.seconds_between(utc(2025, 1, 4, 9), utc(2025, 1, 5, 18)), 0)
+        self.assertEqual(self.calendar.seconds_between(utc(2025, 1, 6, 10), utc(2025, 1, 3, 15)), 0)
+
+
+class SLAEngineTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create_user(
+            username='slacustomer',
+            email='slacustomer@example.com',
+            password='password123',
+            user_type='customer'
+        )
+        cls.staff = User.objects.create_user(
+            username='slastaff',
+            email='slastaff@example.com',
+            password='password123',
+            user_type='agent',
+            is_staff=True
+        )
+        cls.network = Category.objects.create(name='Network')
+        cls.vpn = Category.objects.create(name='VPN', parent=cls.network)
+        cls.finance = Department.objects.create(name='Finance')
+        cls.default = SLA.objects.create(name='Default', business_hours_only=False)
+        cls.network_sla = SLA.objects.create(
+            name='Network', category=cls.network, business_hours_only=False,
+            response_time_medium=2, resolution_time_medium=10, response_time_high=1, resolution_time_high=4
+        )
+        cls.finance_sla = SLA.objects.create(name='Finance', department=cls.finance, business_hours_only=False)
+
+    def setUp(self):
+        # Rolled back policies must not be served from memory, here or to later tests
+        clear_reference()
+        self.addCleanup(clear_reference)
+
+    def ticket(self, **fields):
+        return Ticket.objects.create(title='Link down', description='No network', created_by=self.customer, **fields)
+
+    def assertDeadlines(self, ticket, response_hours, resolution_hours, paused=0):
+        ticket.refresh_from_db()
+        # A new ticket is stamped with its creation time just after its deadlines
+        start = ticket.created_at + timedelta(seconds=paused)
+        second = timedelta(seconds=1)
+        self.assertAlmostEqual(ticket.response_due_at, start + timedelta(hours=response_hours), delta=second)
+        self.assertAlmostEqual(ticket.due_date, start + timedelta(hours=resolution_hours), delta=second)
+
+    def test_policy(self):
+        # A category (or a parent) comes before a department
+        self.assertEqual(find_sla(self.vpn.pk, self.finance.pk, Ticket.Priority.LOW), self.network_sla)
+        self.assertEqual(find_sla(None, self.finance.pk, Ticket.Priority.LOW), self.finance_sla)
+        self.assertEqual(find_sla(None, None, Ticket.Priority.LOW), self.default)
+        critical = SLA.objects.create(name='Critical', priority=Ticket.Priority.CRITICAL)
+        self.assertEqual(find_sla(None, None, Ticket.Priority.CRITICAL), critical)
+
+    def test_deadlines_follow_the_priority(self):
+        ticket = self.ticket(category=self.vpn)
+        self.assertEqual(ticket.sla, self.network_sla)
+        self.assertDeadlines(ticket, 2, 10)
+
+        ticket.priority = Ticket.Priority.HIGH
+        ticket.save()
+        self.assertDeadlines(ticket, 1, 4)
+
+        # Other changes keep the deadlines, even when the policy changed since
+        self.network_sla.resolution_time_high = 6
+        self.network_sla.save()
+        ticket.title = 'VPN down'
+        ticket.save()
+        self.assertDeadlines(ticket, 1, 4)
+
+    def test_clock_paused_while_waiting(self):
+        ticket = self.ticket(category=self.network)
+        ticket.set_status(Ticket.Status.WAITING)
+        ticket.save()
+        self.assertIsNotNone(ticket.sla_paused_at)
+
+        ticket.sla_paused_at -= timedelta(hours=3)
+        ticket.set_status(Ticket.Status.OPEN)
+        ticket.save()
+        ticket.refresh_from_db()
+        self.assertIsNone(ticket.sla_paused_at)
+        self.assertAlmostEqual(ticket.sla_paused_seconds, 3 * HOUR, delta=1)
+        self.assertDeadlines(ticket, 2, 10, paused=ticket.sla_paused_seconds)
+
+    def test_bulk_priority_change(self):
+        tickets = [self.ticket(category=self.network) for _ in range(2)]
+        self.client.force_login(self.staff)
+        data = {'action': 'priority', 'value': Ticket.Priority.HIGH, 'ticket_ids': [ticket.pk for ticket in tickets]}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('tickets:ticket-bulk-action'), data)
+        for ticket in tickets:
+            self.assertDeadlines(ticket, 1, 4)
+
+    def test_breaches(self):
+        late = self.ticket()
+        unanswered = self.ticket()
+        waiting = self.ticket(status=Ticket.Status.WAITING)
+        answered = self.ticket(first_response_at=timezone.now())
+        past = timezone.now() - timedelta(minutes=1)
+        Ticket.objects.filter(pk=late.pk).update(due_date=past)
+        Ticket.objects.filter(pk__in=[unanswered.pk, waiting.pk, answered.pk]).update(response_due_at=past)
+
+        self.assertEqual(flag_breaches(), 2)
+        self.assertEqual(
+            set(Ticket.objects.filter(sla_breach=True).values_list('pk', flat=True)), {late.pk, unanswered.pk}
+        )
+        self.assertEqual(flag_breaches(), 0)
+
+        # Tickets created before the policies get their deadlines
+        Ticket.objects.update(sla=None, due_date=None, response_due_at=None)
+        call_command('check_sla_breaches', '--recompute', stdout=StringIO())
+        self.assertDeadlines(answered, 12, 48)
+
+    def test_flagged_breaches_stay_in_the_statistics(self):
+        ticket = self.ticket(priority=Ticket.Priority.HIGH)
+        Ticket.objects.filter(pk=ticket.pk).update(due_date=timezone.now() - timedelta(minutes=1))
+        rebuild_all()
+        # Counted live while unflagged
+        self.assertEqual(DashboardMetrics().sla_compliance_by_priority()[Ticket.Priority.HIGH], 0)
+        updated_at = Ticket.objects.get(pk=ticket.pk).updated_at
+
+        self.assertEqual(flag_breaches(), 1)
+        # then by the rollup of its day
+        refresh_dirty_days()
+        self.assertEqual(DashboardMetrics().sla_compliance_by_priority()[Ticket.Priority.HIGH], 0)
+        self.assertGreater(Ticket.objects.get(pk=ticket.pk).updated_at, updated_at)
+
+    def test_migration_backfills_existing_tickets(self):
+        backfill = import_module('tickets.migrations.0012_backfill_sla_deadlines').backfill_sla_deadlines
+        SLA.objects.create(name='Critical', priority=Ticket.Priority.CRITICAL, business_hours_only=True)
+        clear_reference()
+        tickets = [
+            self.ticket(category=self.vpn),
+            self.ticket(department=self.finance, priority=Ticket.Priority.HIGH),
+            self.ticket(priority=Ticket.Priority.CRITICAL),
+            self.ticket(status=Ticket.Status.WAITING),
+        ]
+        resolved = self.ticket(status=Ticket.Status.RESOLVED)
+        expected = {
+            ticket.pk: (ticket.sla_id, ticket.response_due_at, ticket.due_date)
+            for ticket in Ticket.objects.filter(pk__in=[ticket.pk for ticket in tickets])
+        }
+        # Tickets created before the SLA engine
+        Ticket.objects.update(sla=None, response_due_at=None, due_date=None, sla_paused_at=None)
+
+        backfill(apps, None)
+        second = timedelta(seconds=1)
+        for ticket in Ticket.objects.filter(pk__in=expected):
+            sla_id, response_due_at, due_date = expected[ticket.pk]
+            self.assertEqual(ticket.sla_id, sla_id)
+            self.assertAlmostEqual(ticket.response_due_at, response_due_at, delta=second)
+            self.assertAlmostEqual(ticket.due_date, due_date, delta=second)
+        self.assertIsNotNone(Ticket.objects.get(pk=tickets[3].pk).sla_paused_at)
+        self.assertIsNone(Ticket.objects.get(pk=resolved.pk).sla_id)
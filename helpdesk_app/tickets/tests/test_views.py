@@ -1,4 +1,4 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from tickets.models import Ticket, Category
@@ -114,4 +114,71 @@ class TicketViewTest(TestCase):
         self.assertEqual(response.status_code, 302)  # Redirect after successful creation
         
         # Check that the ticket was created
-        self.assertTrue(Ticket.objects.filter(title='New Test Ticket').exists())
\ No newline at end of file
+        self.assertTrue(Ticket.objects.filter(title='New Test Ticket').exists())
+
+
+class TicketListPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agent = User.objects.create_user(
+            username='pageagent',
+            email='pageagent@example.com',
+            password='password123',
+            user_type='agent',
+            is_staff=True
+        )
+        cls.tickets = [
+            Ticket.objects.create(
+                title=f'Paged ticket {i}',
+                description='Pagination test',
+                status=Ticket.Status.NEW if i % 2 else Ticket.Status.OPEN,
+                branch=Ticket.Branch.SIEGE,
+                created_by=cls.agent,
+            )
+            for i in range(7)
+        ]
+    
+    def setUp(self):
+        self.client.force_login(self.agent)
+    
+    def get_page(self, **params):
+        response = self.client.get(reverse('tickets:ticket-list'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.context
+    
+    def test_next_and_previous_pages(self):
+        """Pages follow (-created_at, -id) without overlap in both directions"""
+        newest_first = [ticket.pk for ticket in reversed(self.tickets)]
+        
+        first = self.get_page(page_size=3)
+        self.assertEqual([ticket.pk for ticket in first['tickets']], newest_first[:3])
+        self.assertIsNone(first['page'].previous_cursor)
+        
+        second = self.get_page(page_size=3, after=first['page'].next_cursor)
+        self.assertEqual([ticket.pk for ticket in second['tickets']], newest_first[3:6])
+        
+        last = self.get_page(page_size=3, after=second['page'].next_cursor)
+        self.assertEqual([ticket.pk for ticket in last['tickets']], newest_first[6:])
+        self.assertIsNone(last['page'].next_cursor)
+        
+        back = self.get_page(page_size=3, before=last['page'].previous_cursor)
+        self.assertEqual([ticket.pk for ticket in back['tickets']], newest_first[3:6])
+    
+    def test_filters_are_kept_on_page_links(self):
+        context = self.get_page(page_size=2, status=Ticket.Status.NEW)
+        self.assertEqual(len(context['tickets']), 2)
+        self.assertIn('status=new', context['filter_query'])
+        self.assertEqual(context['total_count'], 3)
+        self.assertTrue(context['total_is_exact'])
+    
+    @override_settings(TICKET_LIST_MAX_PAGE_SIZE=4, TICKET_LIST_EXACT_COUNT_LIMIT=5)
+    def test_page_size_is_bounded(self):
+        context = self.get_page(page_size=500)
+        self.assertEqual(len(context['tickets']), 4)
+        # Above the exact limit the total is only an estimate
+        self.assertFalse(context['total_is_exact'])
+    
+    def test_invalid_cursor_shows_first_page(self):
+        context = self.get_page(after='garbage')
+        self.assertEqual(len(context['tickets']), 7)
+
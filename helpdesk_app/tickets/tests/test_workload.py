@@ -0,0 +1,135 @@
+from importlib import import_module
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from accounts.models import AgentProfile
+from tickets.assignment import find_available_agent
+from tickets.models import AgentWorkload, Category, Ticket
+from tickets.workload import reconcile_workloads
+
+User = get_user_model()
+
+
+class AgentWorkloadTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(
+            username='workloadstaff',
+            email='workloadstaff@example.com',
+            password='password123',
+            user_type='agent',
+            is_staff=True
+        )
+        cls.veteran = User.objects.create_user(
+            username='veteran',
+            email='veteran@example.com',
+            password='password123',
+            user_type='agent'
+        )
+        cls.newcomer = User.objects.create_user(
+            username='newcomer',
+            email='newcomer@example.com',
+            password='password123',
+            user_type='agent'
+        )
+        cls.customer = User.objects.create_user(
+            username='workloadcustomer',
+            email='workloadcustomer@example.com',
+            password='password123',
+            user_type='customer'
+        )
+        for agent in (cls.veteran, cls.newcomer):
+            AgentProfile.objects.create(user=agent)
+        cls.network = Category.objects.create(name='Network')
+        cls.vpn = Category.objects.create(name='VPN', parent=cls.network)
+
+    def ticket(self, **fields):
+        return Ticket.objects.create(title='Link down', description='No network', created_by=self.customer, **fields)
+
+    def workload(self, agent):
+        workload = AgentWorkload.objects.filter(agent=agent).first()
+        return (workload.open_tickets, workload.high_tickets) if workload else (0, 0)
+
+    def test_counters_follow_the_tickets(self):
+        ticket = self.ticket(assigned_to=self.veteran, priority=Ticket.Priority.HIGH)
+        self.assertEqual(self.workload(self.veteran), (1, 1))
+
+        ticket.priority = Ticket.Priority.LOW
+        ticket.save()
+        self.assertEqual(self.workload(self.veteran), (1, 0))
+
+        ticket.assigned_to = self.newcomer
+        ticket.save()
+        self.assertEqual(self.workload(self.veteran), (0, 0))
+        self.assertEqual(self.workload(self.newcomer), (1, 0))
+
+        ticket.set_status(Ticket.Status.CLOSED)
+        ticket.save()
+        self.assertEqual(self.workload(self.newcomer), (0, 0))
+
+        ticket.set_status(Ticket.Status.OPEN)
+        ticket.save()
+        ticket.delete()
+        self.assertEqual(self.workload(self.newcomer), (0, 0))
+
+    def test_bulk_actions(self):
+        tickets = [self.ticket(priority=Ticket.Priority.HIGH) for _ in range(3)]
+        self.client.force_login(self.staff)
+        data = {'action': 'assign', 'value': self.veteran.pk, 'ticket_ids': [ticket.pk for ticket in tickets]}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('tickets:ticket-bulk-action'), data)
+        self.assertEqual(self.workload(self.veteran), (3, 3))
+
+        data = {'action': 'status', 'value': Ticket.Status.RESOLVED, 'ticket_ids': [tickets[0].pk]}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('tickets:ticket-bulk-action'), data)
+        self.assertEqual(self.workload(self.veteran), (2, 2))
+
+    def test_reconcile(self):
+        self.ticket(assigned_to=self.veteran)
+        # Writes bypassing the signals leave the index behind
+        Ticket.objects.create(title='Old', description='Imported', created_by=self.customer)
+        Ticket.objects.filter(title='Old').update(assigned_to=self.newcomer, priority=Ticket.Priority.HIGH)
+        AgentWorkload.objects.filter(agent=self.veteran).update(open_tickets=7)
+
+        self.assertEqual(reconcile_workloads(), 2)
+        self.assertEqual(self.workload(self.veteran), (1, 0))
+        self.assertEqual(self.workload(self.newcomer), (1, 1))
+        self.assertEqual(reconcile_workloads(), 0)
+
+    def test_migration_counts_the_open_tickets(self):
+        populate = import_module('tickets.migrations.0008_agent_workload').populate_workloads
+        self.ticket(assigned_to=self.veteran, priority=Ticket.Priority.HIGH)
+        self.ticket(assigned_to=self.veteran, priority=Ticket.Priority.CRITICAL)
+        self.ticket(assigned_to=self.veteran, status=Ticket.Status.RESOLVED)
+        self.ticket(assigned_to=self.newcomer)
+        expected = list(AgentWorkload.objects.order_by('pk').values())
+
+        AgentWorkload.objects.all().delete()
+        populate(apps, None)
+        self.assertEqual(list(AgentWorkload.objects.order_by('pk').values()), expected)
+
+    def test_auto_assign_uses_open_tickets(self):
+        # A long closed history does not make the veteran look busy
+        for _ in range(3):
+            self.ticket(assigned_to=self.veteran, status=Ticket.Status.CLOSED)
+        self.ticket(assigned_to=self.newcomer)
+        ticket = self.ticket(category=self.vpn)
+        with self.assertNumQueries(1):
+            self.assertEqual(find_available_agent(ticket), self.veteran)
+
+        # Experts of a parent category come first, under their limit
+        self.newcomer.agent_profile.expertise.add(self.network)
+        self.assertEqual(find_available_agent(ticket), self.newcomer)
+        self.newcomer.agent_profile.max_tickets = 1
+        self.newcomer.agent_profile.save()
+        self.assertEqual(find_available_agent(ticket), self.veteran)
+
+        self.client.force_login(self.staff)
+        self.client.get(reverse('tickets:ticket-auto-assign', args=[ticket.pk]))
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.assigned_to, self.veteran)
+        self.assertEqual(self.workload(self.veteran), (1, 0))
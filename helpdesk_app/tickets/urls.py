@@ -9,11 +9,15 @@ urlpatterns = [
     path('', views.ticket_list, name='ticket-list'),
     path('<int:pk>/', views.ticket_detail, name='ticket-detail'),
     path('create/', views.ticket_create, name='ticket-create'),
+    path('bulk/', views.ticket_bulk_action, name='ticket-bulk-action'),
+    path('assign-backlog/', views.ticket_assign_backlog, name='ticket-assign-backlog'),
+    path('export/<str:format>/', views.ticket_export, name='ticket-export'),
     path('<int:pk>/update/', views.ticket_update, name='ticket-update'),
     path('<int:pk>/delete/', views.ticket_delete, name='ticket-delete'),
     path('<int:pk>/change-status/', views.ticket_change_status, name='ticket-change-status'),
     path('<int:pk>/assign/', views.ticket_assign, name='ticket-assign'),
     path('<int:pk>/auto-assign/', views.ticket_auto_assign, name='ticket-auto-assign'),
+    path('api/reference-tree/', views.reference_tree, name='reference-tree'),
     path('api/subcategories/<int:parent_id>/', views.get_subcategories, name='get-subcategories'),
     path('api/subdepartments/<int:department_id>/', views.get_subdepartments, name='get-subdepartments'),
 ]
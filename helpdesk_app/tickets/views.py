@@ -1,15 +1,32 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse, QueryDict, StreamingHttpResponse
+from django.utils import timezone
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, Count, F
-from django.db import models
-from .models import Ticket, Category, Tag, TicketAttachment, TicketHistory, Department, SubDepartment
+from django.db.models import Q, Count, F, Prefetch
+from django.db.models.functions import Coalesce
+from .models import Ticket, Tag, TicketAttachment, TicketHistory
 from accounts.models import User
 from django.utils.translation import gettext as _
 from django.contrib.contenttypes.models import ContentType
 from comments.models import Comment
 from django.http import JsonResponse
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from core.pagination import InvalidCursor, estimate_count, paginate
+from .filters import apply_ticket_filters, can_see_all_tickets, get_filters, visible_tickets
+from .search import add_snippets
+from .facets import get_facet_counts
+from .bulk import BULK_ACTIONS, BulkActionError, apply_bulk_action
+from .assignment import AssignmentConflict, assign_backlog, auto_assign
+from .export import export_rows, stream_csv, stream_xlsx
+from .services import TicketValidationError, create_ticket
+from .reference import annotated_copies, attach_reference, get_reference, reference_instance
+
+def with_counts(choices, counts):
+    """Choices as (value, label, number of tickets) for the list filters"""
+    return [(value, label, counts.get(value, 0)) for value, label in choices]
 
 @login_required
 def ticket_list(request):
@@ -17,90 +34,175 @@ def ticket_list(request):
     Display a list of tickets.
     For customers: Only shows their own tickets
     For agents/staff: Shows tickets based on filters
+    Tickets are paginated by cursor on (-created_at, -id), so every page
+    costs the same whatever the number of tickets.
     """
-    # Base queryset
-    tickets = Ticket.objects.all().select_related('created_by', 'assigned_to', 'category', 'department', 'subdepartment')
-    
-    # Filter by user type
-    if not request.user.is_staff and not hasattr(request.user, 'agent_profile'):
-        # Customer view - only their tickets
-        tickets = tickets.filter(created_by=request.user)
+    # Base queryset, restricted to the user's own tickets for customers
+    # (categories and departments come from the in-memory reference data)
+    tickets = visible_tickets(request.user).select_related('created_by', 'assigned_to')
     
     # Apply filters if provided
-    status_filter = request.GET.get('status')
-    if status_filter and status_filter != 'all':
-        tickets = tickets.filter(status=status_filter)
-    
-    branch_filter = request.GET.get('branch')
-    if branch_filter and branch_filter != 'all':
-        tickets = tickets.filter(branch=branch_filter)
-
-    priority_filter = request.GET.get('priority')
-    if priority_filter and priority_filter != 'all':
-        tickets = tickets.filter(priority=priority_filter)
-    
-    category_filter = request.GET.get('category')
-    if category_filter and category_filter.isdigit():
-        tickets = tickets.filter(category_id=category_filter)
-    
-    # Department filter
-    department_filter = request.GET.get('department')
-    if department_filter and department_filter.isdigit():
-        tickets = tickets.filter(department_id=department_filter)
-    
-    # Sub-department filter
-    subdepartment_filter = request.GET.get('subdepartment')
-    if subdepartment_filter and subdepartment_filter.isdigit():
-        tickets = tickets.filter(subdepartment_id=subdepartment_filter)
-    
-    # Search functionality
-    search_query = request.GET.get('q')
-    if search_query:
-        tickets = tickets.filter(
-            Q(title__icontains=search_query) |
-            Q(description__icontains=search_query)
+    filters = get_filters(request.GET)
+    tickets = apply_ticket_filters(tickets, filters)
+    
+    # Page size requested by the user, bounded by the settings
+    default_size = getattr(settings, 'TICKET_LIST_PAGE_SIZE', 25)
+    max_size = getattr(settings, 'TICKET_LIST_MAX_PAGE_SIZE', 100)
+    page_size = request.GET.get('page_size', '')
+    page_size = min(int(page_size), max_size) if page_size.isdigit() and int(page_size) > 0 else default_size
+    
+    # Search results are listed by relevance, other lists by creation date
+    ordering = ('-rank', '-id') if filters['q'] else ('-created_at', '-id')
+    try:
+        page = paginate(
+            tickets,
+            after_cursor=request.GET.get('after'),
+            before_cursor=request.GET.get('before'),
+            page_size=page_size,
+            ordering=ordering,
+        )
+    except InvalidCursor:
+        messages.error(request, _('Invalid page link, showing the first page.'))
+        page = paginate(tickets, page_size=page_size, ordering=ordering)
+    
+    for ticket in page.items:
+        attach_reference(ticket)
+    if filters['q']:
+        add_snippets(page.items, filters['q'])
+    
+    # Optional estimate of the number of matching tickets instead of an exact COUNT
+    total_count = total_is_exact = None
+    if getattr(settings, 'TICKET_LIST_SHOW_TOTAL', True):
+        total_count, total_is_exact = estimate_count(
+            tickets, exact_limit=getattr(settings, 'TICKET_LIST_EXACT_COUNT_LIMIT', 1000)
         )
     
-    # Get filter options
-    categories = Category.objects.all()
-    departments = Department.objects.all().prefetch_related('subdepartments')
+    # Current filters, kept on the previous/next links
+    query = request.GET.copy()
+    for param in ('after', 'before'):
+        query.pop(param, None)
+    
+    # Get filter options, with the number of matching tickets for each option
+    facets = get_facet_counts(request.user, filters)
+    # Reference data is shared by the process: the counts go on copies
+    categories = annotated_copies(get_reference('categories'), facets['category'])
+    departments = annotated_copies(get_reference('departments'), facets['department'])
+    for department in departments:
+        department.subdepartment_options = annotated_copies(
+            department.subdepartments.all(), facets['subdepartment']
+        )
     
     context = {
-        'tickets': tickets,
-        'status_choices': Ticket.Status.choices,
-        'branch_choices': Ticket.Branch.choices,
-        'priority_choices': Ticket.Priority.choices,
+        'tickets': page.items,
+        'page': page,
+        'page_size': page_size,
+        'filter_query': query.urlencode(),
+        'total_count': total_count,
+        'total_is_exact': total_is_exact,
+        'status_choices': with_counts(Ticket.Status.choices, facets['status']),
+        'branch_choices': with_counts(Ticket.Branch.choices, facets['branch']),
+        'priority_choices': with_counts(Ticket.Priority.choices, facets['priority']),
         'categories': categories,
         'departments': departments,
-        'current_status': status_filter,
-        'current_branch': branch_filter,
-        'current_priority': priority_filter,
-        'current_category': category_filter,
-        'current_department': department_filter,
-        'current_subdepartment': subdepartment_filter,
-        'search_query': search_query,
+        'current_status': filters['status'],
+        'current_branch': filters['branch'],
+        'current_priority': filters['priority'],
+        'current_category': filters['category'],
+        'current_department': filters['department'],
+        'current_subdepartment': filters['subdepartment'],
+        'search_query': filters['q'],
     }
     
+    # Options of the bulk actions form, for staff and agents
+    context['can_bulk_edit'] = can_see_all_tickets(request.user)
+    context['can_assign_backlog'] = request.user.is_staff or request.user.is_admin
+    if context['can_bulk_edit']:
+        context['bulk_agents'] = User.objects.filter(user_type=User.UserType.AGENT, is_active=True)
+        context['bulk_tags'] = get_reference('tags')
+    
     return render(request, 'tickets/ticket_list.html', context)
 
+@login_required
+def ticket_export(request, format):
+    """
+    Export the tickets matching the list filters as CSV or XLSX. The file
+    is streamed while the rows are read, whatever the number of tickets.
+    """
+    if format not in ('csv', 'xlsx'):
+        raise Http404
+    
+    filters = get_filters(request.GET)
+    tickets = apply_ticket_filters(visible_tickets(request.user), filters)
+    ordering = ('-rank', '-id') if filters['q'] else ('-created_at', '-id')
+    rows = export_rows(tickets, ordering=ordering)
+    
+    filename = f"tickets-{timezone.localdate():%Y%m%d}.{format}"
+    if format == 'xlsx':
+        response = StreamingHttpResponse(
+            stream_xlsx(rows),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+    else:
+        response = StreamingHttpResponse(stream_csv(rows), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@login_required
+def ticket_bulk_action(request):
+    """
+    Apply one action (assign, change status, change priority, add tag) to
+    the tickets selected on the list, or to every ticket matching the list
+    filters when select_all is set
+    """
+    filter_query = request.POST.get('filter_query', '')
+    list_url = reverse('tickets:ticket-list') + (f'?{filter_query}' if filter_query else '')
+    if request.method != 'POST':
+        return redirect(list_url)
+    
+    action = request.POST.get('action')
+    if not can_see_all_tickets(request.user) or (
+            action == 'assign' and not (request.user.is_staff or request.user.is_admin)):
+        messages.error(request, _("You don't have permission to change these tickets."))
+        return redirect(list_url)
+    
+    if request.POST.get('select_all'):
+        # Same selection as the list the action was submitted from
+        tickets = apply_ticket_filters(visible_tickets(request.user), get_filters(QueryDict(filter_query)))
+    else:
+        ids = [pk for pk in request.POST.getlist('ticket_ids') if pk.isdigit()]
+        tickets = visible_tickets(request.user).filter(pk__in=ids)
+    
+    if action not in BULK_ACTIONS:
+        messages.error(request, _("Unknown bulk action."))
+        return redirect(list_url)
+    
+    try:
+        count = apply_bulk_action(tickets, action, request.POST.get('value', ''), request.user)
+    except BulkActionError as error:
+        messages.error(request, str(error))
+    else:
+        messages.success(request, _("%(count)d ticket(s) updated.") % {'count': count})
+    return redirect(list_url)
+
 @login_required
 def ticket_detail(request, pk):
     """Display a single ticket with all its details and comments"""
 
     # For staff, get any ticket; for customers, only their own tickets
+    # Attachments come with their blob, for the thumbnails
+    tickets = Ticket.objects.select_related(
+        'created_by', 'assigned_to__workload', 'category', 'department', 'subdepartment'
+    ).prefetch_related(Prefetch('attachments', queryset=TicketAttachment.objects.select_related('blob')))
     if request.user.is_staff or hasattr(request.user, 'agent_profile'):
-        ticket = get_object_or_404(Ticket.objects.select_related(
-            'created_by', 'assigned_to', 'category', 'department', 'subdepartment'), pk=pk)
+        ticket = get_object_or_404(tickets, pk=pk)
     else:
-        ticket = get_object_or_404(Ticket.objects.select_related(
-            'created_by', 'assigned_to', 'category', 'department', 'subdepartment'), 
-            pk=pk, created_by=request.user)
+        ticket = get_object_or_404(tickets, pk=pk, created_by=request.user)
         
     ticket_type = ContentType.objects.get_for_model(Ticket)
     comments = Comment.objects.filter(
         content_type=ticket_type,
         object_id=ticket.id
-    ).select_related('author').prefetch_related('attachments')
+    ).select_related('author').prefetch_related('attachments__blob')
     
     # Non-staff can only see non-internal comments
     if not (request.user.is_staff or hasattr(request.user, 'agent_profile')):
@@ -114,8 +216,9 @@ def ticket_detail(request, pk):
         ).select_related(
             'agent_profile'
         ).prefetch_related(
-            'assigned_tickets',
             'agent_profile__expertise'
+        ).annotate(
+            open_tickets=Coalesce('workload__open_tickets', 0)
         ).order_by('first_name', 'last_name')
     
     # Get last edit information
@@ -133,24 +236,16 @@ def ticket_detail(request, pk):
 @login_required
 def ticket_create(request):
     
-    parent_categories = Category.objects.filter(parent__isnull=True)
-    categories = Category.objects.all()
-    departments = Department.objects.all().prefetch_related('subdepartments')
+    parent_categories = get_reference('parent_categories')
+    categories = get_reference('categories')
+    departments = get_reference('departments')
     
     if request.method == 'POST':
-        # Process the form data
-        title = request.POST.get('title')
-        description = request.POST.get('description')
-        category_id = request.POST.get('category')
-        branch = request.POST.get('branch')
-        priority = request.POST.get('priority')
-        office_door_number = request.POST.get('office_door_number')
-        department_id = request.POST.get('department')
-        subdepartment_id = request.POST.get('subdepartment')
-
-        # Validate required fields
-        if not title or not description:
-            messages.error(request, _("Please fill out all required fields."))
+        try:
+            ticket = create_ticket(request.user, request.POST, request.FILES.getlist('file'))
+        except TicketValidationError as error:
+            for message in error.errors:
+                messages.error(request, message)
             context = {
                 'parent_categories': parent_categories,
                 'categories': categories,
@@ -161,81 +256,6 @@ def ticket_create(request):
             }
             return render(request, 'tickets/ticket_create.html', context)
         
-        # Create the ticket
-        ticket = Ticket.objects.create(
-            title=title,
-            description=description,
-            branch=branch or Ticket.Branch.SIEGE,
-            priority=priority or Ticket.Priority.MEDIUM,
-            created_by=request.user,
-            status=Ticket.Status.NEW,
-            office_door_number=office_door_number,
-        )
-        
-        # Set category if provided
-        if category_id:
-            try:
-                category = Category.objects.get(id=category_id)
-                ticket.category = category
-                ticket.save()
-            except Category.DoesNotExist:
-                pass
-        
-        # Set department if provided
-        if department_id:
-            try:
-                department = Department.objects.get(id=department_id)
-                ticket.department = department
-                # Record in history
-                TicketHistory.objects.create(
-                    ticket=ticket,
-                    user=request.user,
-                    field_changed='department',
-                    old_value='',
-                    new_value=str(department)
-                )
-            except Department.DoesNotExist:
-                pass
-        
-        # Set subdepartment if provided
-        if subdepartment_id:
-            try:
-                subdepartment = SubDepartment.objects.get(id=subdepartment_id)
-                # Check if subdepartment belongs to selected department
-                if not department_id or subdepartment.department_id == int(department_id):
-                    ticket.subdepartment = subdepartment
-                    # Record in history
-                    TicketHistory.objects.create(
-                        ticket=ticket,
-                        user=request.user,
-                        field_changed='subdepartment',
-                        old_value='',
-                        new_value=str(subdepartment)
-                    )
-            except SubDepartment.DoesNotExist:
-                pass
-        
-        ticket.save()
-        
-        # Handle file attachments
-        files = request.FILES.getlist('file')
-        for file in files:
-            TicketAttachment.objects.create(
-                ticket=ticket,
-                file=file,
-                uploaded_by=request.user,
-                description=file.name
-            )
-        
-        # Create ticket history entry
-        TicketHistory.objects.create(
-            ticket=ticket,
-            user=request.user,
-            field_changed='status',
-            old_value='',
-            new_value=ticket.get_status_display()
-        )
-        
         messages.success(request, _(f"Ticket #{ticket.id} created successfully."))
         return redirect('tickets:ticket-detail', pk=ticket.pk)
     
@@ -257,10 +277,11 @@ def ticket_update(request, pk):
         ticket = get_object_or_404(Ticket, pk=pk)
     else:
         ticket = get_object_or_404(Ticket, pk=pk, created_by=request.user)
+    attach_reference(ticket)
 
-    parent_categories = Category.objects.filter(parent__isnull=True)
-    categories = Category.objects.all()
-    departments = Department.objects.all().prefetch_related('subdepartments')
+    parent_categories = get_reference('parent_categories')
+    categories = get_reference('categories')
+    departments = get_reference('departments')
     
     if request.method == 'POST':
         # Process the form data
@@ -288,119 +309,40 @@ def ticket_update(request, pk):
             }
             return render(request, 'tickets/ticket_update.html', context)
         
-        # Track changes for history
-        changes = []
-        if ticket.title != title:
-            changes.append(('title', ticket.title, title))
-            ticket.title = title
-            
-        if ticket.description != description:
-            changes.append(('description', ticket.description, description))
-            ticket.description = description
-            
-        if ticket.office_door_number != office_door_number:
-            changes.append(('office_door_number', 
-                        ticket.office_door_number or _('None'), 
-                        office_door_number or _('None')))
-            ticket.office_door_number = office_door_number
-
-        old_category = ticket.category
-        if category_id and (not old_category or str(old_category.id) != category_id):
-            try:
-                new_category = Category.objects.get(id=category_id)
-                ticket.category = new_category
-                changes.append(('category', 
-                                str(old_category) if old_category else 'None', 
-                                str(new_category)))
-            except Category.DoesNotExist:
-                pass
-
+        ticket.title = title
+        ticket.description = description
+        ticket.office_door_number = office_door_number or None
+        
+        if category_id:
+            ticket.category = reference_instance('category_index', category_id) or ticket.category
+        
         # Department changes
-        old_department = ticket.department
-        if department_id and (not old_department or str(old_department.id) != department_id):
-            try:
-                new_department = Department.objects.get(id=department_id)
-                ticket.department = new_department
-                changes.append(('department', 
-                                str(old_department) if old_department else 'None', 
-                                str(new_department)))
-                
-                # If department changes, reset subdepartment unless it belongs to the new department
-                if ticket.subdepartment and ticket.subdepartment.department_id != new_department.id:
-                    old_subdept = ticket.subdepartment
-                    ticket.subdepartment = None
-                    changes.append(('subdepartment', 
-                                    str(old_subdept) if old_subdept else 'None', 
-                                    'None'))
-            except Department.DoesNotExist:
-                pass
-        elif not department_id and old_department:
-            # Removing department assignment
-            changes.append(('department', str(old_department), 'None'))
+        if department_id:
+            ticket.department = reference_instance('department_index', department_id) or ticket.department
+        else:
             ticket.department = None
-            
-            # Also remove subdepartment if department is removed
-            if ticket.subdepartment:
-                old_subdept = ticket.subdepartment
-                ticket.subdepartment = None
-                changes.append(('subdepartment', str(old_subdept), 'None'))
-
-        # Subdepartment changes
-        old_subdepartment = ticket.subdepartment
-        if subdepartment_id and (not old_subdepartment or str(old_subdepartment.id) != subdepartment_id):
-            try:
-                new_subdepartment = SubDepartment.objects.get(id=subdepartment_id)
-                # Make sure the subdepartment belongs to the selected department
-                if ticket.department and new_subdepartment.department_id == ticket.department.id:
-                    ticket.subdepartment = new_subdepartment
-                    changes.append(('subdepartment', 
-                                    str(old_subdepartment) if old_subdepartment else 'None', 
-                                    str(new_subdepartment)))
-            except SubDepartment.DoesNotExist:
-                pass
-        elif not subdepartment_id and old_subdepartment:
-            # Removing subdepartment assignment
-            changes.append(('subdepartment', str(old_subdepartment), 'None'))
+        
+        # The subdepartment must belong to the department
+        if subdepartment_id:
+            subdepartment = reference_instance('subdepartment_index', subdepartment_id)
+            if subdepartment and ticket.department_id and subdepartment.department_id == ticket.department_id:
+                ticket.subdepartment = subdepartment
+        else:
             ticket.subdepartment = None
-
-        if ticket.branch != branch:
-            changes.append(('branch', ticket.get_branch_display(), dict(Ticket.Branch.choices)[branch]))
+        if ticket.subdepartment_id and ticket.subdepartment.department_id != ticket.department_id:
+            ticket.subdepartment = None
+        
+        if branch in dict(Ticket.Branch.choices):
             ticket.branch = branch
-
-        if ticket.priority != priority:
-            changes.append(('priority', 
-                           ticket.get_priority_display(), 
-                           dict(Ticket.Priority.choices)[priority]))
+        if priority in dict(Ticket.Priority.choices):
             ticket.priority = priority
             
         # Status changes - only staff/agents can change status
-        if (request.user.is_staff or hasattr(request.user, 'agent_profile')) and status and ticket.status != status:
-            old_status_display = ticket.get_status_display()
-            ticket.status = status
-            new_status_display = dict(Ticket.Status.choices)[status]
-            changes.append(('status', old_status_display, new_status_display))
-            
-            # Update relevant timestamps based on status
-            from django.utils import timezone
-            now = timezone.now()
-            
-            if status == Ticket.Status.RESOLVED and not ticket.resolved_at:
-                ticket.resolved_at = now
-            elif status == Ticket.Status.CLOSED and not ticket.closed_at:
-                ticket.closed_at = now
-        
-        # Save the ticket
-        ticket.save()
+        if (request.user.is_staff or hasattr(request.user, 'agent_profile')) and status in dict(Ticket.Status.choices):
+            ticket.set_status(status)
         
-        # Record history for each change
-        for field, old_value, new_value in changes:
-            TicketHistory.objects.create(
-                ticket=ticket,
-                user=request.user,
-                field_changed=field,
-                old_value=old_value,
-                new_value=new_value
-            )
+        # Save the changed fields only, with one history row per change
+        ticket.save(changed_by=request.user)
         
         # Handle file attachments
         files = request.FILES.getlist('file')
@@ -461,31 +403,8 @@ def ticket_change_status(request, pk):
     if request.method == 'POST':
         new_status = request.POST.get('status')
         if new_status and new_status in dict(Ticket.Status.choices):
-            old_status = ticket.status
-            old_status_display = ticket.get_status_display()
-            
-            # Update the status
-            ticket.status = new_status
-            
-            # Update relevant timestamps
-            from django.utils import timezone
-            now = timezone.now()
-            
-            if new_status == Ticket.Status.RESOLVED and not ticket.resolved_at:
-                ticket.resolved_at = now
-            elif new_status == Ticket.Status.CLOSED and not ticket.closed_at:
-                ticket.closed_at = now
-            
-            ticket.save()
-            
-            # Record the change in history
-            TicketHistory.objects.create(
-                ticket=ticket,
-                user=request.user,
-                field_changed='status',
-                old_value=old_status_display,
-                new_value=dict(Ticket.Status.choices)[new_status]
-            )
+            ticket.set_status(new_status)
+            ticket.save(changed_by=request.user)
             
             messages.success(request, _(f"Ticket status updated to {dict(Ticket.Status.choices)[new_status]}."))
         else:
@@ -510,33 +429,9 @@ def ticket_assign(request, pk):
             try:
                 agent = User.objects.get(id=agent_id, user_type=User.UserType.AGENT)
                 
-                # Record the old assigned agent (if any)
-                old_agent = ticket.assigned_to
-                old_agent_str = str(old_agent) if old_agent else 'Unassigned'
-                
-                # Update the ticket
-                ticket.assigned_to = agent
-                ticket.status = Ticket.Status.OPEN  # Automatically set to open when assigned
-                ticket.save()
-                
-                # Record in history
-                TicketHistory.objects.create(
-                    ticket=ticket,
-                    user=request.user,
-                    field_changed='assigned_to',
-                    old_value=old_agent_str,
-                    new_value=str(agent)
-                )
-                
-                # Also record status change if it happened
-                if ticket.status != Ticket.Status.OPEN:
-                    TicketHistory.objects.create(
-                        ticket=ticket,
-                        user=request.user,
-                        field_changed='status',
-                        old_value=ticket.get_status_display(),
-                        new_value=dict(Ticket.Status.choices)[Ticket.Status.OPEN]
-                    )
+                # Assigned tickets are opened, each change is recorded in the history
+                ticket.assign(agent)
+                ticket.save(changed_by=request.user)
                 
                 messages.success(request, _(f"Ticket #{ticket.id} assigned to {agent.get_full_name() or agent.email}."))
             except User.DoesNotExist:
@@ -544,63 +439,30 @@ def ticket_assign(request, pk):
         else:
             # Unassign the ticket
             if ticket.assigned_to:
-                old_agent = str(ticket.assigned_to)
                 ticket.assigned_to = None
-                ticket.save()
-                
-                # Record in history
-                TicketHistory.objects.create(
-                    ticket=ticket,
-                    user=request.user,
-                    field_changed='assigned_to',
-                    old_value=old_agent,
-                    new_value='Unassigned'
-                )
+                ticket.save(changed_by=request.user)
                 
                 messages.success(request, _(f"Ticket #{ticket.id} has been unassigned."))
     
     return redirect('tickets:ticket-detail', pk=pk)
 
-def find_available_agent(ticket):
-    """
-    Find the most suitable agent for a ticket based on:
-    1. Expertise (matches ticket category)
-    2. Current workload (under max_tickets)
-    3. Availability status
-    
-    Returns None if no suitable agent is found.
-    """
-    # Start with all agents
-    agents_query = User.objects.filter(
-        user_type=User.UserType.AGENT,
-        agent_profile__availability_status=True
-    ).select_related('agent_profile')
-    
-    # If ticket has a category, prioritize agents with expertise
-    if ticket.category:
-        # First try agents with matching expertise
-        expert_agents = agents_query.filter(
-            agent_profile__expertise=ticket.category
-        ).annotate(
-            ticket_count=models.Count('assigned_tickets')
-        ).filter(
-            ticket_count__lt=models.F('agent_profile__max_tickets')
-        ).order_by('ticket_count')
-        
-        if expert_agents.exists():
-            return expert_agents.first()
-    
-    # If no expert agents or no category, find any available agent
-    available_agents = agents_query.annotate(
-        ticket_count=models.Count('assigned_tickets')
-    ).filter(
-        ticket_count__lt=models.F('agent_profile__max_tickets')
-    ).order_by('ticket_count')
-    
-    if available_agents.exists():
-        return available_agents.first()
+@login_required
+def ticket_assign_backlog(request):
+    """Assign every unassigned new ticket at once, matching the backlog to the available agents"""
+    if request.method != 'POST':
+        return redirect('tickets:ticket-list')
+    if not (request.user.is_staff or request.user.is_admin):
+        messages.error(request, _("You don't have permission to assign tickets."))
+        return redirect('tickets:ticket-list')
     
-    return None
+    plan = assign_backlog(request.user)
+    if plan:
+        messages.success(request, _("%(count)d ticket(s) assigned to %(agents)d agent(s).") % {
+            'count': len(plan), 'agents': len(set(plan.values()))
+        })
+    else:
+        messages.warning(request, _("No unassigned new tickets, or no available agents."))
+    return redirect('tickets:ticket-list')
 
 @login_required
 def ticket_auto_assign(request, pk):
@@ -612,50 +474,52 @@ def ticket_auto_assign(request, pk):
     
     ticket = get_object_or_404(Ticket, pk=pk)
     
-    # Find the best available agent
-    agent = find_available_agent(ticket)
+    # Find the best available agent and reserve its slot
+    try:
+        agent = auto_assign(ticket.pk, request.user)
+    except AssignmentConflict:
+        messages.warning(request, _("The ticket is being assigned by someone else, please try again."))
+        return redirect('tickets:ticket-detail', pk=pk)
     
     if agent:
-        # Record the old assigned agent (if any)
-        old_agent = ticket.assigned_to
-        old_agent_str = str(old_agent) if old_agent else 'Unassigned'
-        
-        # Update the ticket
-        ticket.assigned_to = agent
-        ticket.status = Ticket.Status.OPEN  # Automatically set to open when assigned
-        ticket.save()
-        
-        # Record in history
-        TicketHistory.objects.create(
-            ticket=ticket,
-            user=request.user,
-            field_changed='assigned_to',
-            old_value=old_agent_str,
-            new_value=str(agent)
-        )
-        
-        # Also record status change if it happened
-        if ticket.status != Ticket.Status.OPEN:
-            TicketHistory.objects.create(
-                ticket=ticket,
-                user=request.user,
-                field_changed='status',
-                old_value=ticket.get_status_display(),
-                new_value=dict(Ticket.Status.choices)[Ticket.Status.OPEN]
-            )
-        
         messages.success(request, _(f"Ticket #{ticket.id} automatically assigned to {agent.get_full_name() or agent.email}."))
     else:
         messages.warning(request, _("No available agents found. Please assign manually."))
     
     return redirect('tickets:ticket-detail', pk=pk)
 
+def reference_response(request, render):
+    """
+    Response of `render()` validated by the ETag of the reference tree: a
+    304 when the client already has the current version
+    """
+    etag = get_reference('tree')['etag']
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = render()
+    response['ETag'] = etag
+    # Browsers and proxies may keep it but revalidate it, which is one cheap 304
+    patch_cache_control(
+        response, public=True, must_revalidate=True,
+        max_age=getattr(settings, 'REFERENCE_TREE_MAX_AGE', 0),
+    )
+    return response
+
+def reference_tree(request):
+    """
+    API endpoint with the whole category and department hierarchy, loaded
+    once by the ticket forms instead of one call per dropdown change
+    """
+    return reference_response(request, lambda: HttpResponse(
+        get_reference('tree')['body'], content_type='application/json'
+    ))
+
 def get_subcategories(request, parent_id):
     """API endpoint to get subcategories for a parent category"""
-    subcategories = Category.objects.filter(parent_id=parent_id).values('id', 'name')
-    return JsonResponse(list(subcategories), safe=False)
+    subcategories = get_reference('subcategories').get(parent_id, ())
+    return reference_response(request, lambda: JsonResponse(list(subcategories), safe=False))
 
 def get_subdepartments(request, department_id):
     """API endpoint to get subdepartments for a department"""
-    subdepartments = SubDepartment.objects.filter(department_id=department_id).values('id', 'name')
-    return JsonResponse(list(subdepartments), safe=False)
\ No newline at end of file
+    subdepartments = get_reference('subdepartments').get(department_id, ())
+    return reference_response(request, lambda: JsonResponse(list(subdepartments), safe=False))
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""
+Per-agent workload index.
+
+AgentWorkload holds the number of open tickets assigned to each agent, in
+total and per priority, so that assignment reads a workload in one row
+instead of counting the agent's whole ticket history. Every change of a
+ticket's assignee, status or priority is turned into +1/-1 deltas on the
+(agent, priority) counters, applied with relative F() updates in the
+transaction of the change: ticket saves and deletions through signals,
+bulk actions explicitly. Automatic assignment reserves the agent's slot
+first, with reserve_slot. reconcile_workloads recounts everything from the
+ticket table, which repairs the drift left by writes that bypass both
+(raw updates, agent deletions).
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import AgentWorkload, Ticket
+
+# Statuses counting towards the workload of the assignee
+OPEN_STATUSES = (
+    Ticket.Status.NEW, Ticket.Status.OPEN, Ticket.Status.IN_PROGRESS, Ticket.Status.WAITING,
+)
+
+# Ticket fields a workload depends on
+WORKLOAD_FIELDS = frozenset({'assigned_to', 'status', 'priority'})
+
+PRIORITY_FIELDS = {priority: f'{priority}_tickets' for priority in Ticket.Priority.values}
+
+
+def workload_slot(assigned_to_id, status, priority):
+    """The (agent, priority) counter a ticket counts in, None when it does not count"""
+    if assigned_to_id is None or status not in OPEN_STATUSES or priority not in PRIORITY_FIELDS:
+        return None
+    return assigned_to_id, priority
+
+
+def ticket_slots(ticket, created=False):
+    """
+    Counters of `ticket` as loaded and as it is now: the loaded one is
+    None for a new ticket
+    """
+    values = ticket.__dict__
+    current = workload_slot(values.get('assigned_to_id'), values.get('status'), values.get('priority'))
+    loaded = getattr(ticket, '_loaded_values', None)
+    if created or loaded is None:
+        return None, current
+    previous = workload_slot(
+        loaded.get('assigned_to_id', values.get('assigned_to_id')),
+        loaded.get('status', values.get('status')),
+        loaded.get('priority', values.get('priority')),
+    )
+    return previous, current
+
+
+def workload_delta(previous, current):
+    """Counter of the changes moving a ticket from the `previous` to the `current` counter"""
+    delta = Counter()
+    if previous != current:
+        if previous is not None:
+            delta[previous] -= 1
+        if current is not None:
+            delta[current] += 1
+    return delta
+
+
+def apply_workload(delta):
+    """
+    Apply a Counter of {(agent id, priority): change} to the workload
+    rows, one UPDATE per agent, in agent order so that concurrent
+    transactions lock the rows in the same order
+    """
+    per_agent = defaultdict(Counter)
+    for (agent_id, priority), change in delta.items():
+        if change:
+            per_agent[agent_id][priority] += change
+    if not per_agent:
+        return
+    AgentWorkload.objects.bulk_create(
+        [AgentWorkload(agent_id=agent_id) for agent_id in per_agent], ignore_conflicts=True
+    )
+    for agent_id in sorted(per_agent):
+        changes = per_agent[agent_id]
+        AgentWorkload.objects.filter(agent_id=agent_id).update(
+            open_tickets=F('open_tickets') + sum(changes.values()),
+            **{PRIORITY_FIELDS[priority]: F(PRIORITY_FIELDS[priority]) + change
+               for priority, change in changes.items()},
+        )
+
+
+def reserve_slot(agent_id, priority, max_tickets):
+    """
+    Take one free slot of the agent for an open ticket of `priority`, with
+    an UPDATE conditional on the agent having room: the check and the
+    increment are one statement, so concurrent reservations cannot both
+    take the last slot. Returns the reserved counter, None when the agent
+    is full. The ticket saved with it must carry the counter as
+    `reserved_workload` so that its post_save does not count it twice.
+    """
+    AgentWorkload.objects.bulk_create([AgentWorkload(agent_id=agent_id)], ignore_conflicts=True)
+    field = PRIORITY_FIELDS[priority]
+    reserved = AgentWorkload.objects.filter(agent_id=agent_id, open_tickets__lt=max_tickets).update(
+        open_tickets=F('open_tickets') + 1, **{field: F(field) + 1}
+    )
+    return (agent_id, priority) if reserved else None
+
+
+def count_open_tickets():
+    """{agent id: {priority: open tickets}} counted from the ticket table"""
+    counts = defaultdict(dict)
+    rows = (
+        Ticket.objects.filter(assigned_to__isnull=False, status__in=OPEN_STATUSES)
+        .values('assigned_to', 'priority')
+        .annotate(count=Count('pk'))
+        .order_by()
+    )
+    for row in rows:
+        counts[row['assigned_to']][row['priority']] = row['count']
+    return counts
+
+
+def workload_values(priorities):
+    values = {field: priorities.get(priority, 0) for priority, field in PRIORITY_FIELDS.items()}
+    values['open_tickets'] = sum(priorities.values())
+    return values
+
+
+def reconcile_workloads():
+    """
+    Recount the workload of every agent from the ticket table; returns the
+    number of agents whose counters were wrong
+    """
+    now = timezone.now()
+    fixed = 0
+    with transaction.atomic():
+        # Locked before counting: a change whose delta is not applied yet
+        # waits for the recount and is then applied on top of it
+        existing = {
+            workload.agent_id: workload
+            for workload in AgentWorkload.objects.select_for_update().order_by('agent_id')
+        }
+        counts = count_open_tickets()
+        for agent_id in sorted(set(counts) | set(existing)):
+            values = workload_values(counts.get(agent_id, {}))
+            workload = existing.get(agent_id)
+            if workload is not None and all(getattr(workload, field) == value for field, value in values.items()):
+                continue
+            fixed += 1
+            AgentWorkload.objects.update_or_create(agent_id=agent_id, defaults=values)
+        AgentWorkload.objects.update(reconciled_at=now)
+    return fixed